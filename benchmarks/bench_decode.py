@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+'''
+Microbenchmark: compiled block decoder vs the per-register BinaryPayloadDecoder path
+'''
+import argparse
+import random
+import timeit
+
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadDecoder
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, ERROR_MAP, INTESISBOX_MAP, INTESIS_NULL, READ
+
+
+def sample_registers(seed=1):
+    """ Build a plausible 0-90 / 1000-1007 response, with nulls on unmapped registers """
+    rnd = random.Random(seed)
+    blocks = []
+    for block in DECODE_PLAN.blocks:
+        registers = []
+        for reg in range(block.address, block.address + block.count):
+            spec = INTESISBOX_MAP.get(reg)
+            if spec is None:
+                registers.append(INTESIS_NULL)
+            elif "values" in spec:
+                registers.append(rnd.choice(list(spec["values"])))
+            elif spec["type"] == "err":
+                registers.append(rnd.choice(list(ERROR_MAP)))
+            elif spec["type"] == "temp":
+                registers.append(rnd.randint(-150, 650) & 0xFFFF)
+            else:
+                registers.append(rnd.randint(0, 3000))
+        blocks.append(registers)
+    return blocks
+
+
+def legacy_decode(blocks, unit=10, byteorder=Endian.Big, wordorder=Endian.Big):
+    """ The pre-compiled decoding path: two decoders per register and five keys per name """
+    data = {}
+
+    def decoder(registers, start):
+        return BinaryPayloadDecoder.fromRegisters(registers[start:start + 1], byteorder=byteorder, wordorder=wordorder)
+
+    for block, registers in zip(DECODE_PLAN.blocks, blocks):
+        for reg in INTESISBOX_MAP:
+            if not (block.address <= reg < block.address + block.count) or not (INTESISBOX_MAP[reg]["access"] & READ):
+                continue
+            uid = reg - block.address
+            MAP = INTESISBOX_MAP[reg]
+            NAME = MAP["name"]
+            value = decoder(registers, uid).decode_16bit_uint()
+            if value == INTESIS_NULL:
+                data[NAME] = data[NAME + ".value"] = data[NAME + ".ovalue"] = data[NAME + ".mvalue"] = None
+                data[NAME + ".reg"] = reg
+                continue
+            if MAP["type"] == "temp":
+                value = float(decoder(registers, uid).decode_16bit_int() / unit)
+            elif MAP["type"] == "min":
+                value = decoder(registers, uid).decode_16bit_int() * 30
+            elif MAP["type"] == "err":
+                int_value = decoder(registers, uid).decode_16bit_int()
+                if int_value in ERROR_MAP:
+                    value = ERROR_MAP[int_value]["code"] + ": " + ERROR_MAP[int_value]["desc"]
+                else:
+                    value = "0: Unknown " + str(int_value)
+            else:
+                value = decoder(registers, uid).decode_16bit_int()
+            data[NAME + ".value"] = value
+            data[NAME + ".ovalue"] = value
+            data[NAME + ".reg"] = reg
+            value_map = MAP.get("values")
+            mvalue = value_map.get(value, value) if value_map else value
+            data[NAME] = mvalue
+            data[NAME + ".mvalue"] = mvalue
+    return data
+
+
+def compiled_decode(blocks, unit=10, byteorder=Endian.Big):
+    data = {}
+    for block, registers in zip(DECODE_PLAN.blocks, blocks):
+        for entry, value, mvalue in DECODE_PLAN.decode_block(block, registers, unit, byteorder):
+            data[entry.name] = mvalue
+            data[entry.name + ".value"] = value
+    return data
+
+
+def check(blocks):
+    legacy = legacy_decode(blocks)
+    compiled = compiled_decode(blocks)
+    for name, value in compiled.items():
+        if legacy[name] != value:
+            raise AssertionError(f"{name}: legacy={legacy[name]!r} compiled={value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare decode paths for one full poll response")
+    parser.add_argument("--number", type=int, default=2000, help="Decodes per measurement (default 2000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements, best is reported (default 5)")
+    args = parser.parse_args()
+
+    blocks = sample_registers()
+    check(blocks)
+    results = {}
+    for name, func in (("legacy", legacy_decode), ("compiled", compiled_decode)):
+        best = min(timeit.repeat(lambda: func(blocks), number=args.number, repeat=args.repeat))
+        results[name] = best / args.number
+        print(f"{name:<10}{results[name] * 1e6:10.1f} us/poll")
+    print(f"speedup   {results['legacy'] / results['compiled']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
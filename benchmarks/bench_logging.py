@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+'''
+Per-poll CPU with logging disabled: poll plus a read of every property, with and without trace mode
+
+    PYTHONPATH=. python benchmarks/bench_logging.py [--tree /path/to/other/checkout]
+
+Each mode runs in a fresh interpreter against the in-process fake device, best of --repeat
+runs is reported. --tree measures the same poll against another checkout, e.g. a git
+worktree of the commit before lazy debug logs (git worktree add /tmp/eager 9cbc5ce^).
+'''
+import argparse
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCHMARKS, os.pardir)
+
+WORKLOAD = """
+import logging
+import time
+
+from intesisbox import pa_aw_mbs
+
+from fakes import FakeClient
+
+logging.basicConfig(level=logging.WARNING)
+try:
+    aquarea = pa_aw_mbs.AquareaModbus(port="bench", client=FakeClient(), **({"trace": TRACE} if TRACE else {}))
+except TypeError:
+    # Checkouts without client injection build their pymodbus client in connect()
+    pa_aw_mbs.ModbusClient = lambda **kwargs: FakeClient()
+    aquarea = pa_aw_mbs.AquareaModbus(port="bench")
+aquarea.connect()
+aquarea.poll_data()
+properties = []
+for name in pa_aw_mbs.DECODE_PLAN.by_name:
+    if isinstance(getattr(type(aquarea), name, None), property):
+        try:
+            getattr(aquarea, name)
+        except KeyError:
+            # Error codes missing from ERROR_MAP of older checkouts
+            continue
+        properties.append(name)
+
+best = None
+for _ in range(REPEAT):
+    start = time.process_time()
+    for _ in range(POLLS):
+        aquarea.poll_data()
+        for name in properties:
+            getattr(aquarea, name)
+    elapsed = (time.process_time() - start) / POLLS
+    best = elapsed if best is None else min(best, elapsed)
+print(best, len(properties))
+"""
+
+
+def poll_cpu(tree, polls, repeat, trace=0):
+    """ Best of repeat runs of CPU seconds per poll_data and property reads in tree. Return (seconds, properties) """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join((os.path.abspath(tree), BENCHMARKS)))
+    code = f"POLLS = {polls}\nREPEAT = {repeat}\nTRACE = {trace}\n" + WORKLOAD
+    # Log lines a checkout still emits with DEBUG off are part of its cost: written, then discarded
+    out = subprocess.run([sys.executable, "-c", code], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    seconds, properties = out.split()
+    return float(seconds), int(properties)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-poll CPU of the logging modes with DEBUG off")
+    parser.add_argument("--polls", type=int, default=1000, help="Polls per run (default 1000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode, the best is reported (default 5)")
+    parser.add_argument("--tree", help="Another checkout to measure as well")
+    args = parser.parse_args()
+
+    results = {"lazy": poll_cpu(ROOT, args.polls, args.repeat), "trace": poll_cpu(ROOT, args.polls, args.repeat, trace=64)}
+    if args.tree:
+        results["other"] = poll_cpu(args.tree, args.polls, args.repeat)
+
+    for name, (seconds, properties) in results.items():
+        print(f"{name:<8}{seconds * 1e6:>10.1f} us/poll ({properties} properties read)")
+    if args.tree:
+        print(f"other / lazy: {results['other'][0] / results['lazy'][0]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
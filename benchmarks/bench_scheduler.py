@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+Bus occupancy of the tiered scheduler vs full polls at the fast signal period
+'''
+import argparse
+
+from intesisbox.pa_aw_mbs import AquareaModbus, BlockResult
+from intesisbox.scheduler import AquareaScheduler, DEFAULT_INTERVALS
+
+
+class CountingModbus(AquareaModbus):
+    """ AquareaModbus that records reads instead of touching a bus """
+
+    def __init__(self):
+        super().__init__()
+        self.reads = []
+        self.ticks = []
+
+    def poll_data(self, names=None, max_gap=None):
+        reads = [(address, count) for _, address, count in self.read_plan(names, max_gap)]
+        self.reads.extend(reads)
+        self.ticks.append(len(reads))
+        return self._poll_result([BlockResult(address, count, True, None, 0.0, 1) for address, count in reads], 0.0)
+
+
+def bus_seconds(reads, baudrate, turnaround):
+    """ Estimated RTU bus time: request, response, 3.5 char silences and device turnaround """
+    char = 11 / baudrate
+    total = 0.0
+    for _, count in reads:
+        total += (8 + 5 + 2 * count + 7) * char + turnaround
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bus occupancy over a simulated period")
+    parser.add_argument("--hours", type=float, default=1.0, help="Simulated time (default 1h)")
+    parser.add_argument("--baud", type=int, default=9600, help="Serial baudrate (default 9600)")
+    parser.add_argument("--turnaround", type=float, default=0.03, help="Device response latency in s (default 0.03)")
+    args = parser.parse_args()
+
+    period = DEFAULT_INTERVALS["telemetry"]
+    seconds = int(args.hours * 3600)
+
+    full = CountingModbus()
+    for now in range(0, seconds, period):
+        full.poll_data()
+
+    tiered = CountingModbus()
+    scheduler = AquareaScheduler(tiered)
+    for now in range(0, seconds):
+        scheduler.tick(now)
+
+    for name, aquarea in (("full", full), ("tiered", tiered)):
+        words = sum(count for _, count in aquarea.reads)
+        busy = bus_seconds(aquarea.reads, args.baud, args.turnaround)
+        print(f"{name:<8}{len(aquarea.reads):>8} reads{words:>10} words{busy:>10.1f} s on bus ({busy / seconds:.1%})"
+                f"{max(aquarea.ticks):>4} reads/poll at most")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+'''
+Memory comparison: AquareaSnapshot vs the legacy five-keys-per-register dict
+'''
+import argparse
+import gc
+import tracemalloc
+from array import array
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN
+from intesisbox.snapshot import AquareaSnapshot
+
+from bench_decode import legacy_decode, sample_registers
+
+
+def build_snapshot(blocks):
+    frame = DECODE_PLAN.null_frame()
+    for block, registers in zip(DECODE_PLAN.blocks, blocks):
+        frame[block.base:block.base + block.count] = array("H", registers)
+    return AquareaSnapshot(DECODE_PLAN, frame)
+
+
+def retained(build, count):
+    """ Bytes still allocated after building and keeping count polls """
+    samples = [sample_registers(seed) for seed in range(min(count, 64))]
+    gc.collect()
+    tracemalloc.start()
+    keep = [build(samples[i % len(samples)]) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retained memory of poll results")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 10000], help="Retained polls to measure (default 1 10000)")
+    args = parser.parse_args()
+
+    print(f"{'polls':>8}{'legacy dict':>16}{'snapshot':>16}{'ratio':>8}")
+    for count in args.counts:
+        legacy = retained(legacy_decode, count)
+        snapshot = retained(build_snapshot, count)
+        print(f"{count:>8}{legacy:>16,}{snapshot:>16,}{legacy / snapshot:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
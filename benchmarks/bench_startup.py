@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+'''
+Cold start of a cron style run: import time and a full read served by the bus owner daemon
+
+    PYTHONPATH=. python benchmarks/bench_startup.py [--tree /path/to/other/checkout]
+
+Each case runs in a fresh interpreter, best of --repeat runs is reported. --tree measures
+the same cases against another checkout (e.g. a git worktree of an older commit); compile
+both first (python -m compileall) when bytecode is not written on import.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from intesisbox.daemon import AquareaDaemon
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+HEAVY = ("pymodbus", "fasteners", "asyncio", "platform", "tempfile", "serial")
+
+CASES = {
+    "python": "pass",
+    "import": "import intesisbox.pa_aw_mbs",
+    "cached_read": ("from intesisbox.daemon import AquareaClient\n"
+                    "client = AquareaClient(SOCKET)\n"
+                    "client.connect()\n"
+                    "client.poll_data()\n"
+                    "client.get_all_valid_values()\n"
+                    "client.close()"),
+}
+
+REPORT = "\nimport sys\nprint(' '.join(name for name in HEAVY if name in sys.modules))"
+
+
+def run(code, tree, repeat):
+    """ Best wall time of repeat fresh interpreters running code. Return (seconds, heavy modules loaded) """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(tree))
+    best = None
+    loaded = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        loaded = out.strip()
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start of a cron style run")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per case, best is reported (default 10)")
+    parser.add_argument("--tree", help="Another checkout to measure as well")
+    args = parser.parse_args()
+
+    # Bus owner daemon on a fake device, the cached read never waits for a bus
+    aquarea = AquareaModbus(port="bench", client=FakeClient())
+    aquarea.connect()
+    aquarea.poll_data()
+    socket_path = os.path.join(tempfile.mkdtemp(), "aquarea.sock")
+    daemon = AquareaDaemon(aquarea, socket_path=socket_path, max_age=3600)
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+
+    trees = {"this": ROOT}
+    if args.tree:
+        trees["other"] = args.tree
+    prelude = f"HEAVY = {HEAVY!r}\nSOCKET = {socket_path!r}\n"
+    print(f"{'case':<14}" + "".join(f"{name:>12}" for name in trees) + "   heavy modules loaded")
+    for case, code in CASES.items():
+        row = f"{case:<14}"
+        loaded = []
+        for tree in trees.values():
+            seconds, heavy = run(prelude + code + REPORT, tree, args.repeat)
+            row += f"{seconds * 1000:>10.1f}ms"
+            loaded.append(heavy or "-")
+        print(row + "   " + " | ".join(loaded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+'''
+In-process fake PA-AW-MBS-1 for the benchmarks: no serial port, no bus timing
+'''
+import time
+
+from pymodbus.register_read_message import ReadHoldingRegistersResponse
+from pymodbus.register_write_message import WriteMultipleRegistersResponse, WriteSingleRegisterResponse
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, INTESIS_NULL
+
+from bench_decode import sample_registers
+
+
+class FakeClient:
+    """ Synchronous pymodbus client stand-in answering from a register image
+
+    latency adds that many seconds to every request, 0 measures the library alone.
+    """
+
+    def __init__(self, blocks=None, latency=0.0):
+        if blocks is None:
+            blocks = sample_registers()
+        self.registers = {}
+        for block, registers in zip(DECODE_PLAN.blocks, blocks):
+            self.registers.update(zip(range(block.address, block.address + block.count), registers))
+        self.latency = latency
+        self.requests = 0
+
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def __request(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.__request()
+        return ReadHoldingRegistersResponse([self.registers.get(reg, INTESIS_NULL) for reg in range(address, address + count)])
+
+    def write_register(self, address, value, unit=1, **kwargs):
+        self.__request()
+        self.registers[address] = value
+        return WriteSingleRegisterResponse(address, value)
+
+    def write_registers(self, address, values, unit=1, **kwargs):
+        self.__request()
+        self.registers.update(zip(range(address, address + len(values)), values))
+        return WriteMultipleRegistersResponse(address, len(values))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+'''
+Benchmark suite against an in-process fake device, results written as JSON
+
+    PYTHONPATH=. python benchmarks/suite.py --output run.json [--baseline previous.json]
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import timeit
+from array import array
+
+import pymodbus
+from pymodbus.register_read_message import ReadHoldingRegistersResponse
+
+from intesisbox.pa_aw_mbs import AquareaDevice, AquareaModbus, COMMAND_MAP, DECODE_PLAN
+from intesisbox.replay import frame_from_blocks, replay
+
+from bench_decode import sample_registers
+from fakes import FakeClient
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "examples")
+
+
+def measure(func, number, repeat):
+    """ Best of repeat timings of number calls. Return seconds per call """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def result(seconds, number, repeat, **extra):
+    data = {"per_op_us": round(seconds * 1e6, 3), "ops_per_s": round(1 / seconds, 1), "number": number, "repeat": repeat}
+    data.update(extra)
+    return data
+
+
+def connected(**kwargs):
+    aquarea = AquareaModbus(port="bench", client=FakeClient(), **kwargs)
+    aquarea.connect()
+    return aquarea
+
+
+def bench_poll(args):
+    """ poll_data end to end: lock, read plan, requests, frame and snapshot """
+    aquarea = connected()
+    return result(measure(aquarea.poll_data, args.number, args.repeat), args.number, args.repeat)
+
+
+def bench_decode(args):
+    """ Decode only, from the fixed read_holding_registers responses of a full poll """
+    responses = [ReadHoldingRegistersResponse(registers) for registers in sample_registers()]
+
+    def decode():
+        frame = array("H")
+        for rr in responses:
+            frame.extend(rr.registers)
+        return DECODE_PLAN.decode_frame(frame)
+
+    return result(measure(decode, args.number, args.repeat), args.number, args.repeat)
+
+
+def commands(count):
+    """ count (name, value) pairs cycling over the settable commands """
+    settable = []
+    for name, spec in COMMAND_MAP.items():
+        if "min" in spec:
+            settable.append((name, spec["min"]))
+        elif "values" in spec:
+            settable.append((name, next(iter(spec["values"]))))
+    return [settable[idx % len(settable)] for idx in range(count)]
+
+
+def bench_send(args):
+    """ set_value of N commands then send_cmd """
+    aquarea = connected()
+    batch = commands(args.commands)
+
+    def send():
+        for name, value in batch:
+            aquarea.set_value(name, value)
+        aquarea.send_cmd()
+
+    number = max(1, args.number // 10)
+    seconds = measure(send, number, args.repeat)
+    return result(seconds, number, args.repeat, commands=args.commands, per_command_us=round(seconds * 1e6 / args.commands, 3))
+
+
+def bench_valid_values(args):
+    """ get_all_valid_values on a polled snapshot """
+    aquarea = connected()
+    aquarea.poll_data()
+    return result(measure(aquarea.get_all_valid_values, args.number, args.repeat), args.number, args.repeat)
+
+
+def bench_properties(args):
+    """ Read every register property of a polled device, eager and lazy snapshots """
+    names = [name for name in DECODE_PLAN.by_name if isinstance(getattr(AquareaDevice, name, None), property)]
+    data = {}
+    for mode in ("eager", "lazy"):
+        aquarea = connected(lazy=mode == "lazy")
+        aquarea.poll_data()
+
+        def read():
+            for name in names:
+                getattr(aquarea, name)
+
+        seconds = measure(read, args.number, args.repeat)
+        data[mode] = {"per_property_ns": round(seconds * 1e9 / len(names), 1)}
+    return result(seconds, args.number, args.repeat, properties=len(names), **data)
+
+
+def bench_rtu_tcp(args):
+    """ read_holding_registers through the examples/rtu_tcp.py forwarder over loopback TCP """
+    try:
+        from pymodbus.client.sync import ModbusTcpClient
+        from pymodbus.server.sync import ModbusTcpServer
+    except ImportError as e:
+        return {"skipped": f"pymodbus 2.x synchronous server needed: {e}"}
+    sys.path.insert(0, EXAMPLES)
+    try:
+        import rtu_tcp
+    finally:
+        sys.path.remove(EXAMPLES)
+    server = ModbusTcpServer(rtu_tcp.build_context(FakeClient(), slave=1), address=("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ModbusTcpClient("127.0.0.1", port=server.server_address[1])
+    client.connect()
+    try:
+        count = DECODE_PLAN.blocks[0].count
+        number = max(1, args.number // 10)
+        seconds = measure(lambda: client.read_holding_registers(0, count, unit=1), number, args.repeat)
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    return result(seconds, number, args.repeat, registers=count)
+
+
+def bench_replay(args):
+    """ replay of recorded frames, lazy snapshots read for one value, then through a device with a callback """
+    frame = frame_from_blocks(sample_registers())
+    position = DECODE_PLAN.by_name["tank_water_temp"].position
+    frames = []
+    for idx in range(args.number * 10):
+        # The tank temperature changes every 10 frames, the rest of the frame stays
+        frame = array("H", frame)
+        frame[position] = 400 + idx // 10 % 100
+        frames.append((float(idx), frame))
+
+    def plain():
+        for snapshot in replay(frames):
+            snapshot["tank_water_temp"]
+
+    device = AquareaDevice(lazy=True)
+    device.on_change("tank_water_temp", lambda name, value, old: None)
+
+    def committed():
+        for snapshot in replay(frames, device=device):
+            pass
+
+    data = {}
+    for name, func in (("snapshots", plain), ("device", committed)):
+        seconds = measure(func, 1, args.repeat) / len(frames)
+        data[name] = {"per_frame_us": round(seconds * 1e6, 3), "frames_per_s": round(1 / seconds)}
+    return result(seconds, len(frames), args.repeat, **data)
+
+
+def bench_serialize(args):
+    """ Snapshot to JSON, MessagePack and bytes, against encoding get_all_valid_values() """
+    aquarea = connected()
+    aquarea.poll_data()
+    snapshot = aquarea.snapshot
+    cases = {
+        "json_dumps_valid_values": lambda: json.dumps(aquarea.get_all_valid_values()),
+        "to_json": snapshot.to_json,
+        "to_bytes": snapshot.to_bytes,
+    }
+    try:
+        import msgpack
+        cases["msgpack_packb_valid_values"] = lambda: msgpack.packb(aquarea.get_all_valid_values())
+        cases["to_msgpack"] = snapshot.to_msgpack
+    except ImportError:
+        pass
+    data = {name: round(measure(func, args.number, args.repeat) * 1e6, 3) for name, func in cases.items()}
+    seconds = data["to_json"] / 1e6
+    return result(seconds, args.number, args.repeat, per_op_us_by_encoder=data)
+
+
+BENCHMARKS = {
+    "poll_e2e": bench_poll,
+    "decode": bench_decode,
+    "send_cmd": bench_send,
+    "get_all_valid_values": bench_valid_values,
+    "properties": bench_properties,
+    "rtu_tcp": bench_rtu_tcp,
+    "replay": bench_replay,
+    "serialize": bench_serialize,
+}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pymodbus": pymodbus.__version__,
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against an in-process fake device")
+    parser.add_argument("--number", type=int, default=1000, help="Calls per measurement (default 1000, /10 for send_cmd and rtu_tcp)")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements, best is reported (default 5)")
+    parser.add_argument("--commands", type=int, default=20, help="Commands queued per send_cmd (default 20)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write the JSON results to this file (default stdout)")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+    report = {"meta": metadata(), "results": results}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        for name, data in results.items():
+            before = baseline.get(name, {}).get("per_op_us")
+            if before and "per_op_us" in data:
+                print(f"{name:<22}{before:>12.1f} -> {data['per_op_us']:>10.1f} us/op ({data['per_op_us'] / before:.2f}x)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
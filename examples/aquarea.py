@@ -197,10 +197,10 @@ def main():
         aquarea.connect()
         if aquarea.qsize > 0:
             log.info(f"Sending commands {aquarea.qsize}...")
-            aquarea.send_cmd()
-            aquarea.close()
-            time.sleep(5)
-            aquarea.connect()
+            # Wait for the device to apply the writes by reading back the written registers
+            for name, result in aquarea.send_cmd(verify=True).items():
+                log.info(f"{name}: ok = {result.ok}, settle time = {result.settle_time}")
+        # Everything is printed and published below, not only the registers read back
         log.info(f"Reading data...")
         aquarea.poll_data()
         log.info("Disconnecting...")
@@ -42,10 +42,9 @@ def cmd(aquarea):
     aquarea.connect()
     if aquarea.qsize > 0:
         log.debug(f"Sending commands {aquarea.qsize}...")
-        aquarea.send_cmd()
-        aquarea.close()
-        time.sleep(5)
-        aquarea.connect()
+        for name, result in aquarea.send_cmd(verify=True).items():
+            log.debug(f"{name}: ok = {result.ok}, settle time = {result.settle_time}")
+        # Publish the whole state, not only the registers read back
         aquarea.poll_data()
         aquarea.close()
 
@@ -23,9 +23,7 @@ import argparse
 # configure the service logging
 # --------------------------------------------------------------------------- # 
 import logging
-logging.basicConfig()
 log = logging.getLogger()
-log.setLevel(logging.DEBUG)
 
 def init_argparse() -> argparse.ArgumentParser:
     
@@ -40,6 +38,14 @@ def init_argparse() -> argparse.ArgumentParser:
     parser.add_argument('--version', action='version', version='%(prog)s v1.0')
     return parser
 
+def build_context(client, slave):
+    # If required to communicate with a specified client use unit=<unit_id>
+    # in RemoteSlaveContext
+    # For e.g to forward the requests to slave with unit address 1 use
+    # store = RemoteSlaveContext(client, unit=1)
+    store = RemoteSlaveContext(client, unit=slave)
+    return ModbusServerContext(slaves=store, single=True)
+
 def run_serial_forwarder(slave, device, baudrate, stopbits, port):
     # ----------------------------------------------------------------------- #
     # initialize the datastore(serial client)
@@ -49,12 +55,7 @@ def run_serial_forwarder(slave, device, baudrate, stopbits, port):
     client = ModbusClient(method='rtu', port=device, stopbits=stopbits, 
                     bytesize=8, parity='N', baudrate=baudrate, 
                     timeout=1, byteorder=Endian.Big, wordorder=Endian.Big)
-    # If required to communicate with a specified client use unit=<unit_id>
-    # in RemoteSlaveContext
-    # For e.g to forward the requests to slave with unit address 1 use
-    # store = RemoteSlaveContext(client, unit=1)
-    store = RemoteSlaveContext(client, unit=slave)
-    context = ModbusServerContext(slaves=store, single=True)
+    context = build_context(client, slave)
     print(f"PA-AW-MBS-1 RTU / TCP gateway")
     print(f"slave = {slave}, device = {device}, baudrate = {baudrate}, stopbits = {stopbits}, port={port}")
 
@@ -64,6 +65,8 @@ def run_serial_forwarder(slave, device, baudrate, stopbits, port):
     StartServer(context, address=("0.0.0.0", port))
 
 def main():
+    logging.basicConfig()
+    log.setLevel(logging.DEBUG)
     parser = init_argparse()
     args = parser.parse_args()
     run_serial_forwarder(slave=args.slave, device=args.device, baudrate=args.baud, stopbits=args.stop, port=args.port)
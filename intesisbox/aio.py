@@ -0,0 +1,269 @@
+'''
+PA-AW-MBS-1: asyncio interface on pymodbus async serial (RTU) and TCP clients
+'''
+import asyncio
+import contextlib
+import inspect
+import logging
+import time
+
+from .decoder import break_even_gap
+from .pa_aw_mbs import AquareaDevice, BIG, BlockResult, BusBusyError, BusLock, DECODE_PLAN, VERIFY_DEADLINE, _Verification, _illegal_function, retry_exceptions
+
+log = logging.getLogger(__name__)
+
+
+def async_retry_exceptions():
+    """ Errors of an awaited bus transaction worth another attempt """
+    return retry_exceptions() + (asyncio.TimeoutError,)
+
+
+def __getattr__(name):
+    # pymodbus is imported by the first connect, not by this module
+    if name == "ASYNC_RETRY_EXCEPTIONS":
+        return async_retry_exceptions()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class AsyncAquareaModbus(AquareaDevice):
+    """ asyncio counterpart of AquareaModbus: await connect(), poll_data() and send_cmd()
+
+    With host set the device is reached through a Modbus TCP gateway (e.g. examples/rtu_tcp.py),
+    otherwise over RTU on port. Serial access is serialized with the same inter-process lock
+    as AquareaModbus, acquired without blocking the event loop; lockwait bounds the wait for it
+    in seconds (BusBusyError is raised, 0 waits forever). Every bus operation is bounded
+    by timeout and can be cancelled: a cancelled poll publishes only the reads it completed.
+    """
+
+    def __init__(self, port='/dev/ttyUSB0', slave=1, stopbits=1, bytesize=8, parity='N', baudrate=9600,
+                    timeout=3, host=None, tcp_port=502, byteorder=BIG, wordorder=BIG, lockwait=0, unit=10,
+                    lazy=False, read_gap=None, multi_write=True, retry=None, breaker=None, trace=0, history=0, client=None):
+        if read_gap is None:
+            read_gap = break_even_gap(baudrate)
+        super().__init__(slave=slave, byteorder=byteorder, wordorder=wordorder, unit=unit, lazy=lazy, read_gap=read_gap, multi_write=multi_write, retry=retry, breaker=breaker, trace=trace, history=history)
+        self.__port = port
+        self.__stopbits = stopbits
+        self.__bytesize = bytesize
+        self.__parity = parity
+        self.__baudrate = baudrate
+        self.__timeout = timeout
+        self.__host = host
+        self.__tcp_port = tcp_port
+        self.__lockwait = lockwait
+        self.__client = client
+        self.__is_connected = False
+        self.__lock = None
+        # A TCP gateway serializes the serial side by itself
+        self.__flock = BusLock(port, lockwait) if host is None and client is None else None
+
+    @property
+    def lock_stats(self):
+        """ Bus lock acquisitions and time spent waiting for it (see BusLock.stats), None without lock """
+        return self.__flock.stats if self.__flock is not None else None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.__is_connected
+
+    async def connect(self, retry=None):
+        if self.__client is None:
+            self.__client = self.__make_client()
+        self._reset_retry_stats()
+        async with self.__bus():
+            result = self._account(await self._retry_policy(retry).acall(lambda: asyncio.wait_for(self.__client.connect(), self.__timeout),
+                                                                           failed=lambda connected: not connected, exceptions=async_retry_exceptions(),
+                                                                           name="connect"))
+            self.__is_connected = bool(result.value)
+        return self.__is_connected
+
+    async def close(self):
+        if self.__client is not None:
+            result = self.__client.close()
+            if inspect.isawaitable(result):
+                await result
+        self.__is_connected = False
+
+    async def poll_data(self, names=None, max_gap=None, timeout=None, retry=None):
+        """ Read data from Modbus and pull into internal variables (see AquareaModbus.poll_data)
+
+        timeout bounds the whole poll, lock wait and retries included. Return a PollResult
+        """
+        if not self.__is_connected:
+            return self._skipped_poll("not connected", names)
+        if not self.breaker.allow():
+            return self._skipped_poll("circuit open", names)
+        self._reset_retry_stats()
+        blocks = []
+        try:
+            await asyncio.wait_for(self.__poll(names, max_gap, self._retry_policy(retry), blocks), timeout)
+        except BusBusyError:
+            # A TimeoutError as well, but raised to the caller as lockwait says
+            self.breaker.abandon()
+            raise
+        except asyncio.TimeoutError:
+            if not blocks:
+                # A half open probe that did not complete a read is given back
+                self.breaker.abandon()
+                return self._skipped_poll("timeout", names)
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        return self._poll_result(blocks, time.time())
+
+    async def send_cmd(self, verify=False, deadline=VERIFY_DEADLINE, timeout=None, retry=None):
+        """ Send message Queue to Modbus device (see AquareaModbus.send_cmd)
+
+        timeout bounds the writes, the read-back is bounded by deadline
+        """
+        written = {}
+        policy = self._retry_policy(retry)
+        self._reset_retry_stats()
+        if self.__is_connected:
+            await asyncio.wait_for(self.__send(written, policy), timeout)
+            log.info("No more commnad to send")
+        if verify:
+            return await self.__verify(written, deadline, policy)
+
+    ''' ------------------------------------------------------------------------------------------------------------
+    Private methods
+    ------------------------------------------------------------------------------------------------------------ '''
+
+    def __make_client(self):
+        """Internal method to build a pymodbus (>= 3) async client"""
+        from pymodbus.client import AsyncModbusSerialClient, AsyncModbusTcpClient
+
+        if self.__host is not None:
+            return AsyncModbusTcpClient(self.__host, port=self.__tcp_port, timeout=self.__timeout)
+        # RTU is the default framer of the serial client (ModbusRtuFramer, Framer.RTU or FramerType.RTU by version)
+        return AsyncModbusSerialClient(port=self.__port, stopbits=self.__stopbits, bytesize=self.__bytesize,
+                                            parity=self.__parity, baudrate=self.__baudrate, timeout=self.__timeout)
+
+    @contextlib.asynccontextmanager
+    async def __bus(self):
+        """Internal context holding the bus, in process and between processes"""
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        start = time.monotonic()
+        deadline = start + self.__lockwait if self.__lockwait else None
+        try:
+            await asyncio.wait_for(self.__lock.acquire(), self.__lockwait or None)
+        except asyncio.TimeoutError:
+            raise self.__busy() from None
+        try:
+            if self.__flock is not None:
+                delay = 0.01
+                while not self.__flock.try_acquire():
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise self.__busy()
+                    await asyncio.sleep(delay if deadline is None else min(delay, deadline - time.monotonic()))
+                    delay = min(delay * 2, 0.1)
+                self.__flock.record(time.monotonic() - start)
+            try:
+                yield
+            finally:
+                if self.__flock is not None:
+                    self.__flock.release()
+        finally:
+            self.__lock.release()
+
+    def __busy(self):
+        """Internal BusBusyError of a bus wait longer than lockwait"""
+        if self.__flock is not None:
+            return self.__flock.timed_out(self.__lockwait)
+        return BusBusyError(f"Bus lock not acquired in {self.__lockwait} s")
+
+    async def __read(self, address, count, policy):
+        """Internal method to read holding registers. Return (registers or None on failure, error, attempts)"""
+        result = self._account(await policy.acall(lambda: self.__request(lambda: self.__client.read_holding_registers(address, count=count, slave=self.slave)),
+                                                  failed=lambda rr: rr.isError(), exceptions=async_retry_exceptions(),
+                                                  name="read %d-%d", name_args=(address, address + count - 1)))
+        rr = result.value
+        attempts = result.attempts
+        if rr is None or rr.isError():
+            log.error("Modbus Error: %s", rr)
+            return None, str(rr) if rr is not None else "no response", attempts
+        log.debug("registers %d-%d = %s", address, address + count - 1, rr.registers)
+        return rr.registers, None, attempts
+
+    async def __request(self, request):
+        """Internal method to await a pymodbus request bounded by timeout"""
+        return await asyncio.wait_for(request(), self.__timeout)
+
+    async def __poll(self, names, max_gap, policy, blocks):
+        """Internal method polling into frame, appending a BlockResult per read to blocks"""
+        reads = self.read_plan(names, max_gap)
+        async with self.__bus():
+            # Registers that are not (or cannot be) read keep the previous words
+            frame = self._new_frame()
+            try:
+                for block, address, count in reads:
+                    # Placeholder replaced once the read completes, left as is if cancelled
+                    blocks.append(BlockResult(address, count, False, "cancelled", None, 0))
+                    registers, error, attempts = await self.__read(address, count, policy)
+                    now = time.time()
+                    blocks[-1] = BlockResult(address, count, registers is not None, error, now, attempts)
+                    if registers is None:
+                        break
+                    self._store(frame, block, address, registers, now)
+            finally:
+                for block, address, count in reads[len(blocks):]:
+                    blocks.append(BlockResult(address, count, False, "not attempted after a failed read", None, 0))
+                if any(result.ok for result in blocks):
+                    self._commit(frame)
+
+    async def __send(self, written, policy):
+        async with self.__bus():
+            for idx, (address, values, words) in enumerate(self._take_writes(), 1):
+                written.update(zip(range(address, address + len(words)), words))
+                if self.multi_write and len(words) > 1:
+                    if await self.__write_registers(policy, idx, address, values, words):
+                        continue
+                for offset, (value, word) in enumerate(zip(values, words)):
+                    await self.__write_register(policy, idx, address + offset, value, word)
+
+    async def __write_register(self, policy, idx, reg, value, word):
+        log.debug("%d. Sending reg = %d, value = %s. payload = %d", idx, reg, value, word)
+        self._trace_write(reg, [word])
+        result = self._account(await policy.acall(lambda: self.__request(lambda: self.__client.write_register(reg, word, slave=self.slave)),
+                                                  failed=lambda rq: rq.isError(), exceptions=async_retry_exceptions(), name="write %d", name_args=(reg,)))
+        if not result.ok:
+            log.error("Cannot send address=%s, value=%s, unit=%s. Giving up after %d attempts", reg, value, self.slave, result.attempts)
+        return result.ok
+
+    async def __write_registers(self, policy, idx, address, values, words):
+        log.debug("%d. Sending regs = %d-%d, values = %s. payload = %s", idx, address, address + len(words) - 1, values, words)
+        self._trace_write(address, words)
+        result = self._account(await policy.acall(lambda: self.__request(lambda: self.__client.write_registers(address, words, slave=self.slave)),
+                                                  failed=lambda rq: rq.isError() and not _illegal_function(rq), exceptions=async_retry_exceptions(),
+                                                  name="write %d-%d", name_args=(address, address + len(words) - 1)))
+        if result.value is not None and _illegal_function(result.value):
+            self._disable_multi_write()
+            return False
+        if not result.ok:
+            log.error("Cannot send address=%s, values=%s, unit=%s. Giving up after %d attempts", address, values, self.slave, result.attempts)
+        return True
+
+    async def __verify(self, written, deadline, policy):
+        verification = _Verification(written, deadline)
+        delay = verification.next_delay()
+        while delay is not None:
+            await asyncio.sleep(delay)
+            if not self.__is_connected:
+                verification.failed(0, 0, "not connected")
+                break
+            observed = {}
+            async with self.__bus():
+                frame = self._new_frame()
+                bounded = verification.retry_policy(policy)
+                for block, address, count in DECODE_PLAN.read_ranges(verification.pending, self.read_gap):
+                    registers, error, _ = await self.__read(address, count, bounded)
+                    if registers is None:
+                        verification.failed(address, count, error)
+                        continue
+                    self._store(frame, block, address, registers)
+                    observed.update((reg, registers[reg - address]) for reg in verification.pending if address <= reg < address + count)
+                if observed:
+                    self._commit(frame, history=False)
+            verification.update(observed)
+            delay = verification.next_delay()
+        return verification.report()
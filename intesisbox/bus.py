@@ -0,0 +1,167 @@
+'''
+Several PA-AW-MBS-1 slaves daisy-chained on one RS-485 line
+'''
+import logging
+import time
+
+from .pa_aw_mbs import AquareaModbus, BusLock, client_class
+
+log = logging.getLogger(__name__)
+
+# Bits per character on the wire: start, 8 data, parity or second stop, stop
+CHAR_BITS = 11
+
+
+class _Member:
+    """ Scheduling state of one device of the bus """
+    __slots__ = ("aquarea", "interval", "weight", "names", "due", "vtime", "polls", "commands", "busy")
+
+    def __init__(self, aquarea, interval, weight, names):
+        self.aquarea = aquarea
+        self.interval = interval
+        self.weight = weight
+        self.names = names
+        self.due = 0.0
+        # Bus seconds used, divided by weight: the lowest goes first when several are ready
+        self.vtime = 0.0
+        self.polls = 0
+        self.commands = 0
+        self.busy = 0.0
+
+
+class AquareaBus:
+    """ One serial client and lock shared by AquareaModbus handles of different slaves
+
+    device() returns a handle with the usual property API. run() (or step()) interleaves
+    the handles: queued commands go first, then polls as they fall due every interval
+    seconds. Commands queued on a disconnected handle wait for it to be connected again. Among ready devices the one with the least bus time per weight goes next,
+    so equal weights give round-robin and a device of weight 2 gets twice the bus share
+    when the line is saturated. silence seconds (default 3.5 characters at baudrate)
+    separate the transactions of two devices.
+    """
+
+    def __init__(self, port='/dev/ttyUSB0', stopbits=1, bytesize=8, parity='N', baudrate=9600, timeout=3, write_timeout=2,
+                    lockwait=0, silence=None, client=None, clock=time.monotonic):
+        self.__port = port
+        self.__baudrate = baudrate
+        self.__timeout = timeout
+        self.__silence = silence if silence is not None else 3.5 * CHAR_BITS / baudrate
+        self.__clock = clock
+        if client is None:
+            client = client_class()(method='rtu', port=port, stopbits=stopbits, bytesize=bytesize, parity=parity,
+                                    baudrate=baudrate, timeout=timeout, writeTimeout=write_timeout)
+        self.__client = client
+        self.__lock = BusLock(port, lockwait)
+        self.__members = {}
+        self.__last_end = None
+        self.__start = None
+
+    @property
+    def port(self):
+        return self.__port
+
+    @property
+    def devices(self) -> dict:
+        """ Handles by slave ID """
+        return {slave: member.aquarea for slave, member in self.__members.items()}
+
+    @property
+    def lock_stats(self):
+        return self.__lock.stats
+
+    def device(self, slave, interval=60, weight=1, names=None, **kwargs):
+        """ Add slave, polled every interval seconds (names only, if set). Return its AquareaModbus handle
+
+        kwargs go to AquareaModbus (unit, lazy, retry, breaker, ...)
+        """
+        if slave in self.__members:
+            raise ValueError(f"Slave {slave} already on bus {self.__port}")
+        if weight <= 0:
+            raise ValueError("weight has to be positive")
+        aquarea = AquareaModbus(port=self.__port, slave=slave, baudrate=self.__baudrate, timeout=self.__timeout,
+                                client=self.__client, lock=self.__lock, **kwargs)
+        member = _Member(aquarea, interval, weight, names)
+        # A late comer starts level with the others instead of owning the bus until it catches up
+        member.vtime = min((other.vtime for other in self.__members.values()), default=0.0)
+        self.__members[slave] = member
+        return aquarea
+
+    def connect(self):
+        """ Open the line once and mark every handle connected. Return True on success """
+        connected = all([member.aquarea.connect() for member in self.__members.values()])
+        self.__start = self.__clock()
+        return connected
+
+    def close(self):
+        for member in self.__members.values():
+            member.aquarea.close()
+
+    def stats(self, now=None):
+        """ {slave: target and achieved polls per second, polls, commands, bus seconds} """
+        if now is None:
+            now = self.__clock()
+        elapsed = now - self.__start if self.__start is not None else 0.0
+        return {slave: {"target": 1 / member.interval if member.interval else None,
+                        "achieved": member.polls / elapsed if elapsed > 0 else 0.0,
+                        "polls": member.polls,
+                        "commands": member.commands,
+                        "bus_time": member.busy}
+                for slave, member in self.__members.items()}
+
+    def step(self, now=None):
+        """ Serve the next command or due poll. Return (slave, "send" or "poll", result), None when idle """
+        if now is None:
+            now = self.__clock()
+        members = list(self.__members.items())
+        # A disconnected handle keeps its commands queued until it is connected again
+        pending = [(member.vtime, slave) for slave, member in members if member.aquarea.qsize and member.aquarea.is_connected]
+        if pending:
+            slave = min(pending)[1]
+            return slave, "send", self.__serve(self.__members[slave], "send")
+        due = [(member.vtime, slave) for slave, member in members if member.due <= now and member.aquarea.breaker.remaining() == 0]
+        if not due:
+            return None
+        slave = min(due)[1]
+        member = self.__members[slave]
+        # Keep the cadence, without bursts to catch up after the bus was saturated
+        member.due = max(member.due + member.interval, now)
+        return slave, "poll", self.__serve(member, "poll")
+
+    def next_due(self, now=None):
+        """ Seconds until something is to be served """
+        if now is None:
+            now = self.__clock()
+        waits = []
+        for member in self.__members.values():
+            if member.aquarea.qsize and member.aquarea.is_connected:
+                return 0.0
+            waits.append(max(member.due - now, member.aquarea.breaker.remaining()))
+        return max(0.0, min(waits)) if waits else None
+
+    def run(self, stop=None):
+        """ Serve the devices forever (or until stop() returns True) """
+        while stop is None or not stop():
+            if self.step() is None:
+                time.sleep(self.next_due() or self.__silence)
+
+    def __serve(self, member, op):
+        if self.__last_end is not None:
+            wait = self.__silence - (self.__clock() - self.__last_end)
+            if wait > 0:
+                time.sleep(wait)
+        start = self.__clock()
+        try:
+            if op == "send":
+                result = member.aquarea.send_cmd()
+                member.commands += 1
+            else:
+                result = member.aquarea.poll_data(names=member.names)
+                if result.ok:
+                    member.polls += 1
+        finally:
+            self.__last_end = self.__clock()
+            busy = self.__last_end - start
+            member.busy += busy
+            member.vtime += busy / member.weight
+        log.debug("%s slave %d in %.3f s", op, member.aquarea.slave, busy)
+        return result
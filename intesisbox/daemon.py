@@ -0,0 +1,242 @@
+'''
+Bus owner daemon: a single process keeps the serial connection open and serves
+poll and command requests from local clients over a Unix domain socket.
+
+Protocol: one JSON object per line in each direction.
+  {"op": "poll", "names": [...] or null, "max_age": seconds or null}
+      -> {"ok": true, "timestamp": t, "raw": [words], "stamps": [read times] or null,
+          "result": [ok, timestamp, [[address, count, ok, error, timestamp, attempts], ...], skipped, [stale names]]
+                    or null when the cached snapshot was served}
+  {"op": "send", "writes": [[reg, value], ...], "verify": bool, "deadline": seconds}
+      -> {"ok": true, "results": [[reg, name, expected, observed, ok, settle_time, error], ...] or null}
+  errors -> {"ok": false, "error": "..."}
+'''
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from array import array
+
+from .decoder import READ_GAP
+from .pa_aw_mbs import (AquareaDevice, AquareaModbus, BIG, BlockResult, COMMAND_MAP, DECODE_PLAN, PollResult, VERIFY_DEADLINE,
+                        WriteResult, resolve_registers)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/run/aquarea.sock"
+
+# Seconds a snapshot is served to readers without polling the bus again
+DEFAULT_MAX_AGE = 10
+
+
+class AquareaDaemonError(Exception):
+    """ Error reported by the daemon for a client request """
+
+
+def check_writes(writes, unit):
+    """ Raise ValueError unless every [reg, word] of writes is a word a COMMAND_MAP command sends """
+    commands = {spec["reg"]: (name, spec) for name, spec in COMMAND_MAP.items()}
+    for reg, word in writes:
+        if reg not in commands:
+            raise ValueError(f"Register {reg} has no command")
+        name, spec = commands[reg]
+        if "values" in spec:
+            if word not in spec["values"].values():
+                raise ValueError(f"Value {word} for {name} has to be one of {sorted(spec['values'].values())}")
+            continue
+        # Range in decoded units, scaled as AquareaDevice does before queuing
+        scale = {"temp": unit, "min": 30}.get(spec["type"], 1)
+        if type(word) is not int or not spec["min"] * scale <= word <= spec["max"] * scale:
+            raise ValueError(f"Value {word} for {name} has to be in range [{spec['min'] * scale},{spec['max'] * scale}]")
+
+
+class AquareaDaemon:
+    """ Own an AquareaModbus and serve it on a Unix domain socket
+
+    A poll is answered from the current snapshot when every requested register was
+    read within max_age seconds, otherwise only the missing and stale ones are polled.
+    """
+
+    def __init__(self, aquarea, socket_path=DEFAULT_SOCKET, max_age=DEFAULT_MAX_AGE):
+        self.__aquarea = aquarea
+        self.__socket_path = socket_path
+        self.__max_age = max_age
+        # AquareaModbus is not thread safe: one bus operation at a time
+        self.__bus = threading.Lock()
+        self.__server = None
+
+    @property
+    def aquarea(self):
+        return self.__aquarea
+
+    def serve_forever(self):
+        if os.path.exists(self.__socket_path):
+            os.unlink(self.__socket_path)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = daemon.handle(json.loads(line))
+                    except Exception as e:
+                        log.exception("Request failed")
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+                    self.wfile.flush()
+
+        self.__server = socketserver.ThreadingUnixStreamServer(self.__socket_path, Handler)
+        self.__server.daemon_threads = True
+        log.info("Serving on %s", self.__socket_path)
+        try:
+            self.__server.serve_forever()
+        finally:
+            self.__server.server_close()
+            if os.path.exists(self.__socket_path):
+                os.unlink(self.__socket_path)
+
+    def shutdown(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+
+    def handle(self, request):
+        """ Serve a decoded request. Return the reply object """
+        op = request.get("op")
+        if op == "poll":
+            return self.__poll(request.get("names"), request.get("max_age"))
+        if op == "send":
+            return self.__send(request.get("writes", []), request.get("verify", False), request.get("deadline", VERIFY_DEADLINE))
+        raise ValueError(f"Unknown op {op}")
+
+    def __poll(self, names, max_age):
+        if max_age is None:
+            max_age = self.__max_age
+        result = None
+        regs = resolve_registers(names) if names is not None else DECODE_PLAN.by_reg
+        with self.__bus:
+            snapshot = self.__aquarea.snapshot
+            now = time.time()
+            # Judged per register: a selective poll leaves the others unread or old
+            stale = [DECODE_PLAN.by_reg[reg].name for reg in regs
+                        if snapshot is None or snapshot.is_stale(DECODE_PLAN.by_reg[reg].name, max_age, now)]
+            if stale:
+                self.__ensure_connected()
+                result = self.__aquarea.poll_data(names=stale)
+                snapshot = self.__aquarea.snapshot
+        if snapshot is None:
+            raise AquareaDaemonError(f"No data from the device: {result.skipped or result.blocks[0].error}")
+        return {"ok": True, "timestamp": snapshot.timestamp, "raw": snapshot.raw.tolist(),
+                "stamps": snapshot.stamps.tolist() if snapshot.stamps is not None else None, "result": result}
+
+    def __send(self, writes, verify, deadline):
+        # Rejected here with an error reply rather than by the device
+        check_writes(writes, self.__aquarea.unit)
+        with self.__bus:
+            self.__ensure_connected()
+            for reg, value in writes:
+                self.__aquarea._enqueue(reg, value)
+            results = self.__aquarea.send_cmd(verify=verify, deadline=deadline)
+        if results is not None:
+            results = [list(result) for result in results.values()]
+        return {"ok": True, "results": results}
+
+    def __ensure_connected(self):
+        if not self.__aquarea.is_connected:
+            self.__aquarea.connect()
+
+
+class AquareaClient(AquareaDevice):
+    """ Thin client of an AquareaDaemon with the AquareaModbus property API """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30, slave=1, byteorder=BIG, wordorder=BIG,
+                    unit=10, lazy=False, read_gap=READ_GAP, history=0):
+        super().__init__(slave=slave, byteorder=byteorder, wordorder=wordorder, unit=unit, lazy=lazy, read_gap=read_gap, history=history)
+        self.__socket_path = socket_path
+        self.__timeout = timeout
+        self.__sock = None
+        self.__file = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.__sock is not None
+
+    def connect(self):
+        self.__sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__sock.settimeout(self.__timeout)
+        self.__sock.connect(self.__socket_path)
+        self.__file = self.__sock.makefile("rwb")
+
+    def close(self):
+        if self.__sock is not None:
+            self.__file.close()
+            self.__sock.close()
+        self.__sock = None
+        self.__file = None
+
+    def poll_data(self, names=None, max_age=None):
+        """ Get the daemon snapshot, polled again by the daemon if older than max_age seconds
+
+        Return the PollResult of the daemon poll, skipped is "cached" when no poll was needed
+        """
+        reply = self.__request({"op": "poll", "names": names, "max_age": max_age})
+        stamps = array("d", reply["stamps"]) if reply["stamps"] is not None else None
+        self._commit(array("H", reply["raw"]), timestamp=reply["timestamp"], stamps=stamps)
+        if reply["result"] is None:
+            return PollResult(True, reply["timestamp"], (), "cached", ())
+        ok, timestamp, blocks, skipped, stale = reply["result"]
+        return PollResult(ok, timestamp, tuple(BlockResult(*block) for block in blocks), skipped, tuple(stale))
+
+    def send_cmd(self, verify=False, deadline=VERIFY_DEADLINE):
+        """ Send message Queue through the daemon (see AquareaModbus.send_cmd) """
+        writes = [[address + offset, value] for address, values, _ in self._take_writes() for offset, value in enumerate(values)]
+        reply = self.__request({"op": "send", "writes": writes, "verify": verify, "deadline": deadline})
+        if reply["results"] is None:
+            return None
+        return {result[1]: WriteResult(*result) for result in reply["results"]}
+
+    def __request(self, request):
+        connected = self.__sock is not None
+        if not connected:
+            self.connect()
+        try:
+            self.__file.write(json.dumps(request).encode() + b"\n")
+            self.__file.flush()
+            line = self.__file.readline()
+        finally:
+            if not connected:
+                self.close()
+        if not line:
+            raise AquareaDaemonError("Connection closed by the daemon")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise AquareaDaemonError(reply.get("error"))
+        return reply
+
+
+def init_argparse():
+    import argparse
+    parser = argparse.ArgumentParser(description="Aquarea PA-AW-MBS-1 bus owner daemon", add_help=True)
+    parser.add_argument("--device", help="Modbus serial device (default /dev/aquarea)", default="/dev/aquarea")
+    parser.add_argument("--slave", help="Modbus slave ID (default 2)", type=int, default=2)
+    parser.add_argument("--baud", choices=[2400, 4800, 9600, 19200], type=int, help="Serial baudrate (default 9600)", default=9600)
+    parser.add_argument("--socket", help=f"Unix socket path (default {DEFAULT_SOCKET})", default=DEFAULT_SOCKET)
+    parser.add_argument("--max-age", type=float, help=f"Seconds a snapshot is served without polling (default {DEFAULT_MAX_AGE})", default=DEFAULT_MAX_AGE)
+    return parser
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = init_argparse().parse_args()
+    aquarea = AquareaModbus(port=args.device, slave=args.slave, baudrate=args.baud, timeout=5, write_timeout=5)
+    aquarea.connect()
+    try:
+        AquareaDaemon(aquarea, socket_path=args.socket, max_age=args.max_age).serve_forever()
+    finally:
+        aquarea.close()
+
+
+if __name__ == "__main__":
+    main()
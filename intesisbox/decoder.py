@@ -0,0 +1,273 @@
+'''
+Compiled decode plan for PA-AW-MBS-1 holding register responses
+'''
+import struct
+import zlib
+from array import array
+from operator import itemgetter
+
+# Decoding kinds, resolved once from the INTESISBOX_MAP "type" field
+INT = 0
+TEMP = 1
+MIN = 2
+ERR = 3
+
+KINDS = {"int": INT, "temp": TEMP, "min": MIN, "err": ERR}
+
+# Maximum distance between two mapped registers that still share a read block
+BLOCK_GAP = 10
+
+# Bits of an RTU character: start, 8 data, parity (or second stop) and stop
+CHAR_BITS = 11
+
+# Fixed characters of a read transaction: 8 request bytes, 5 response overhead
+# bytes and the two 3.5 character silences
+READ_OVERHEAD_CHARS = 8 + 5 + 7
+
+# Seconds the device takes to answer a request
+TURNAROUND = 0.03
+
+
+def break_even_gap(baudrate=9600, turnaround=TURNAROUND):
+    """ Registers worth reading through rather than paying another transaction
+
+    A read costs its fixed characters plus the device turnaround, each register
+    read through costs 2 characters: holes up to the returned size are cheaper
+    to read than to skip.
+    """
+    char = CHAR_BITS / baudrate
+    return int((READ_OVERHEAD_CHARS * char + turnaround) / (2 * char))
+
+
+# Default number of unwanted registers read through to save a transaction (23 at 9600 baud)
+READ_GAP = break_even_gap()
+
+# Modbus limit of registers in a single read_holding_registers request
+MAX_READ = 125
+
+# Modbus limit of registers in a single write_multiple_registers request
+MAX_WRITE = 123
+
+
+class RegisterEntry:
+    """ A readable register compiled from an INTESISBOX_MAP entry """
+    __slots__ = ("reg", "name", "desc", "kind", "values", "offset", "position", "index")
+
+    def __init__(self, reg, spec, offset, position, index):
+        self.reg = reg
+        self.name = spec["name"]
+        self.desc = spec["desc"]
+        self.kind = KINDS.get(spec["type"], INT)
+        self.values = spec.get("values")
+        # Word offset inside the owning block
+        self.offset = offset
+        # Word position inside the concatenation of all blocks (the frame)
+        self.position = position
+        # Position of the entry inside the whole plan
+        self.index = index
+
+    def __repr__(self):
+        return f"RegisterEntry(reg={self.reg}, name={self.name!r})"
+
+
+class BlockPlan:
+    """ One read_holding_registers request and the entries it carries """
+    __slots__ = ("address", "count", "base", "entries", "pick", "_structs")
+
+    def __init__(self, address, count, base, entries):
+        self.address = address
+        self.count = count
+        # Position of the first block word inside the frame
+        self.base = base
+        self.entries = tuple(entries)
+        # Picks the entry words out of the block words in one call
+        self.pick = _picker(entry.offset for entry in self.entries)
+        self._structs = {}
+
+    def unpacker(self, byteorder):
+        """ Return the (pack, unpack) pair turning raw words into signed words """
+        structs = self._structs.get(byteorder)
+        if structs is None:
+            structs = (struct.Struct(f">{self.count}H"), struct.Struct(f"{byteorder}{self.count}h"))
+            self._structs[byteorder] = structs
+        return structs
+
+    def signed_words(self, registers, byteorder=">"):
+        """ Reinterpret the whole block as signed 16 bit words in a single unpack """
+        pack, unpack = self.unpacker(byteorder)
+        return unpack.unpack(pack.pack(*registers))
+
+    def __repr__(self):
+        return f"BlockPlan(address={self.address}, count={self.count}, entries={len(self.entries)})"
+
+
+class DecodePlan:
+    """ INTESISBOX_MAP compiled into read blocks with precomputed decoding rules """
+
+    def __init__(self, register_map, error_map, null, read_flag, max_gap=BLOCK_GAP):
+        self.null = null
+        # The null marker as seen through a signed 16 bit unpack
+        self.signed_null = null - 0x10000 if null & 0x8000 else null
+        self.errors = {code: f"{err['code']}: {err['desc']}" for code, err in error_map.items()}
+        self.blocks = tuple(self.__compile_blocks(register_map, read_flag, max_gap))
+        self.entries = tuple(entry for block in self.blocks for entry in block.entries)
+        self.by_name = {entry.name: entry for entry in self.entries}
+        self.by_reg = {entry.reg: entry for entry in self.entries}
+        self.frame_size = sum(block.count for block in self.blocks)
+        self.positions = tuple(entry.position for entry in self.entries)
+        self.pick = _picker(self.positions)
+        self.block_of = {address: block for block in self.blocks
+                            for address in range(block.address, block.address + block.count)}
+        self._structs = {}
+
+    def __compile_blocks(self, register_map, read_flag, max_gap):
+        regs = sorted(register_map)
+        ranges = []
+        for reg in regs:
+            if ranges and reg - ranges[-1][1] <= max_gap:
+                ranges[-1][1] = reg
+            else:
+                ranges.append([reg, reg])
+        index = 0
+        base = 0
+        for first, last in ranges:
+            entries = []
+            for reg in regs:
+                if first <= reg <= last and register_map[reg]["access"] & read_flag:
+                    entries.append(RegisterEntry(reg, register_map[reg], reg - first, base + reg - first, index))
+                    index += 1
+            yield BlockPlan(first, last - first + 1, base, entries)
+            base += last - first + 1
+
+    def read_ranges(self, registers, max_gap=READ_GAP, max_count=MAX_READ):
+        """ Merge registers into the fewest reads. Return a list of (block, address, count)
+
+        Holes of up to max_gap registers are read through (READ_GAP, the break-even
+        gap of 9600 baud, by default), reads never cross blocks nor exceed max_count.
+        """
+        ranges = []
+        for reg in sorted(set(registers)):
+            block = self.block_of.get(reg)
+            if block is None:
+                raise ValueError(f"Register {reg} is not part of any read block")
+            if ranges and ranges[-1][0] is block and reg - ranges[-1][2] - 1 <= max_gap and reg - ranges[-1][1] < max_count:
+                ranges[-1][2] = reg
+            else:
+                ranges.append([block, reg, reg])
+        return [(block, first, last - first + 1) for block, first, last in ranges]
+
+    def null_frame(self):
+        """ Return a frame with every word set to the null marker """
+        return array("H", [self.null]) * self.frame_size
+
+    def signed_frame(self, frame, byteorder=">"):
+        """ Reinterpret a whole frame as signed 16 bit words in a single unpack """
+        structs = self._structs.get(byteorder)
+        if structs is None:
+            structs = (struct.Struct(f">{self.frame_size}H"), struct.Struct(f"{byteorder}{self.frame_size}h"))
+            self._structs[byteorder] = structs
+        pack, unpack = structs
+        return unpack.unpack(pack.pack(*frame))
+
+    def decode_word(self, entry, word, unit=10):
+        """ Decode a signed word for entry. Return (value, mapped value) """
+        if word == self.signed_null:
+            return None, None
+        kind = entry.kind
+        if kind == TEMP:
+            value = float(word / unit)
+        elif kind == MIN:
+            value = word * 30
+        elif kind == ERR:
+            value = self.errors.get(word)
+            if value is None:
+                value = "0: Unknown " + str(word)
+        else:
+            value = word
+        values = entry.values
+        if values:
+            return value, values.get(value, value)
+        return value, value
+
+    @staticmethod
+    def device_word(raw, byteorder=">"):
+        """ The unsigned frame word raw as the device meant it, bytes swapped for byteorder "<" """
+        if byteorder == "<":
+            return ((raw & 0xFF) << 8) | (raw >> 8)
+        return raw
+
+    def decode_raw(self, entry, raw, unit=10, byteorder=">"):
+        """ Decode the unsigned frame word of entry. Return (value, mapped value) """
+        raw = self.device_word(raw, byteorder)
+        return self.decode_word(entry, raw - 0x10000 if raw & 0x8000 else raw, unit)
+
+    def decode_frame(self, frame, unit=10, byteorder=">"):
+        """ Decode every entry from a whole frame. Return (values, mapped values) ordered as entries """
+        words = self.pick(self.signed_frame(frame, byteorder))
+        return self.__decode(self.entries, words, unit)
+
+    def decode_block(self, block, registers, unit=10, byteorder=">"):
+        """ Decode every entry of block from its raw registers. Return a list of (entry, value, mapped value) """
+        words = block.pick(block.signed_words(registers, byteorder))
+        values, mvalues = self.__decode(block.entries, words, unit)
+        return list(zip(block.entries, values, mvalues))
+
+    def __decode(self, entries, words, unit):
+        null = self.signed_null
+        errors = self.errors
+        values = []
+        mvalues = []
+        for entry, word in zip(entries, words):
+            if word == null:
+                values.append(None)
+                mvalues.append(None)
+                continue
+            kind = entry.kind
+            if kind == INT:
+                value = word
+            elif kind == TEMP:
+                value = float(word / unit)
+            elif kind == MIN:
+                value = word * 30
+            else:
+                value = errors.get(word)
+                if value is None:
+                    value = "0: Unknown " + str(word)
+            values.append(value)
+            mapping = entry.values
+            mvalues.append(mapping.get(value, value) if mapping else value)
+        return tuple(values), tuple(mvalues)
+
+
+def _picker(positions):
+    """ Return a callable selecting positions from a sequence, always as a tuple """
+    positions = tuple(positions)
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda words: (words[position],)
+    if not positions:
+        return lambda words: ()
+    return itemgetter(*positions)
+
+
+def layout_crc(plan):
+    """ CRC of the read blocks of plan: frames are only exchanged between equal layouts """
+    return zlib.crc32(b"".join(struct.pack("<HH", block.address, block.count) for block in plan.blocks))
+
+
+def encode_words(values, byteorder=">"):
+    """ Turn 16 bit values into register words, the inverse of a signed block unpack """
+    count = len(values)
+    values = [((value + 0x8000) & 0xFFFF) - 0x8000 for value in values]
+    return list(struct.unpack(f">{count}H", struct.pack(f"{byteorder}{count}h", *values)))
+
+
+def write_runs(writes, max_count=MAX_WRITE):
+    """ Split {reg: value} into runs of adjacent registers. Return a list of (address, [values]) """
+    runs = []
+    for reg in sorted(writes):
+        if runs and reg == runs[-1][0] + len(runs[-1][1]) and len(runs[-1][1]) < max_count:
+            runs[-1][1].append(writes[reg])
+        else:
+            runs.append((reg, [writes[reg]]))
+    return runs
@@ -0,0 +1,204 @@
+'''
+Prometheus text exposition of the last PA-AW-MBS-1 snapshot over HTTP
+'''
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .decoder import ERR
+from .pa_aw_mbs import DECODE_PLAN
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_PORT = 9101
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _sample(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class MetricsRenderer:
+    """ Exposition text of snapshots, rendered again only when the raw words change
+
+    A gauge per readable register named prefix_<name>, help from the map desc plus
+    the value map. Error registers expose their raw code. Null registers are left out.
+    """
+
+    def __init__(self, plan, prefix="aquarea", labels=None):
+        self.plan = plan
+        self.prefix = prefix
+        self.__labels = "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else ""
+        self.__headers = {}
+        for entry in plan.entries:
+            desc = entry.desc
+            if entry.values:
+                desc += " (" + ", ".join(f"{key}={value}" for key, value in entry.values.items()) + ")"
+            metric = f"{prefix}_{entry.name}"
+            self.__headers[entry.name] = f"# HELP {metric} {_escape_help(desc)}\n# TYPE {metric} gauge\n{metric}{self.__labels} "
+        self.__cache = (None, b"")
+        self.renders = 0
+
+    @property
+    def labels(self) -> str:
+        return self.__labels
+
+    def render(self, snapshot):
+        """ Register metrics of snapshot as bytes, the previous text when its raw words did not change """
+        if snapshot is None:
+            return b""
+        # (raw words, text) replaced as a whole, scrapes and polls run in different threads
+        raw, body = self.__cache
+        if raw is not None and snapshot.raw == raw:
+            return body
+        lines = []
+        for entry in self.plan.entries:
+            if entry.kind == ERR:
+                word = self.plan.device_word(snapshot.raw[entry.position], snapshot.byteorder)
+                value = None if word == self.plan.null else word
+            else:
+                value = snapshot.value(entry.name)
+            if value is not None:
+                lines.append(self.__headers[entry.name] + _sample(value) + "\n")
+        body = "".join(lines).encode()
+        self.__cache = (snapshot.raw, body)
+        self.renders += 1
+        return body
+
+
+class AquareaExporter:
+    """ Poll aquarea every interval seconds in a thread and serve the last snapshot on /metrics
+
+    Scrapes never reach the bus: they get the register metrics rendered at the last
+    change plus a few gauges computed on the spot (snapshot age, last poll duration
+    and outcome). With interval None nothing is polled here, aquarea.snapshot is
+    exported as some other loop (e.g. AquareaScheduler or an AquareaClient) keeps it.
+    """
+
+    def __init__(self, aquarea, interval=15, host="", port=DEFAULT_PORT, prefix="aquarea", names=None, clock=time.time):
+        self.aquarea = aquarea
+        self.interval = interval
+        self.names = names
+        self.prefix = prefix
+        self.__clock = clock
+        self.__renderer = MetricsRenderer(DECODE_PLAN, prefix, {"slave": aquarea.slave})
+        self.__address = (host, port)
+        self.__server = None
+        self.__threads = []
+        self.__stop = threading.Event()
+        # Last poll: (PollResult, seconds it took), replaced as a whole by the poll thread
+        self.__last = (None, None)
+        self.polls = 0
+        self.failures = 0
+        self.scrapes = 0
+
+    @property
+    def port(self):
+        return self.__server.server_address[1] if self.__server is not None else self.__address[1]
+
+    @property
+    def renderer(self) -> MetricsRenderer:
+        return self.__renderer
+
+    def poll(self):
+        """ Poll once and record the outcome. Return the PollResult """
+        start = time.monotonic()
+        try:
+            result = self.aquarea.poll_data(names=self.names)
+        except Exception:
+            log.exception("Poll failed")
+            result = None
+        elapsed = time.monotonic() - start
+        self.polls += 1
+        if result is None or not result.ok:
+            self.failures += 1
+        self.__last = (result, elapsed)
+        # Rendered here rather than by the next scrape
+        self.__renderer.render(self.aquarea.snapshot)
+        return result
+
+    def metrics(self, now=None):
+        """ Whole exposition text as bytes """
+        if now is None:
+            now = self.__clock()
+        snapshot = self.aquarea.snapshot
+        body = self.__renderer.render(snapshot)
+        result, elapsed = self.__last
+        prefix = self.prefix
+        labels = self.__renderer.labels
+        gauges = [
+            (f"{prefix}_up", "1 if the last poll read every register", "gauge",
+                int(result.ok) if result is not None else int(snapshot is not None)),
+            (f"{prefix}_snapshot_age_seconds", "Seconds since the exported snapshot was polled", "gauge",
+                now - snapshot.timestamp if snapshot is not None else None),
+            (f"{prefix}_poll_duration_seconds", "Duration of the last poll", "gauge", elapsed),
+            (f"{prefix}_polls_total", "Polls made by the exporter", "counter", self.polls),
+            (f"{prefix}_poll_failures_total", "Exporter polls that missed some register", "counter", self.failures),
+            (f"{prefix}_metrics_renders_total", "Times the register metrics were rendered", "counter", self.__renderer.renders),
+        ]
+        if result is not None:
+            gauges.append((f"{prefix}_stale_registers", "Registers not read by the last poll", "gauge", len(result.stale)))
+        lines = []
+        for metric, help, kind, value in gauges:
+            if value is not None:
+                lines.append(f"# HELP {metric} {help}\n# TYPE {metric} {kind}\n{metric}{labels} {_sample(value)}\n")
+        return body + "".join(lines).encode()
+
+    def start(self):
+        """ Start the HTTP server (and the poll loop unless interval is None) in daemon threads """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                exporter.scrapes += 1
+                body = exporter.metrics()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                log.debug("%s " + format, self.address_string(), *args)
+
+        self.__stop.clear()
+        self.__server = ThreadingHTTPServer(self.__address, Handler)
+        self.__server.daemon_threads = True
+        self.__threads = [threading.Thread(target=self.__server.serve_forever, name="exporter-http", daemon=True)]
+        if self.interval is not None:
+            self.__threads.append(threading.Thread(target=self.__run, name="exporter-poll", daemon=True))
+        for thread in self.__threads:
+            thread.start()
+        log.info("Exporting metrics on port %d", self.port)
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+        for thread in self.__threads:
+            thread.join()
+        self.__server = None
+        self.__threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __run(self):
+        while not self.__stop.is_set():
+            start = time.monotonic()
+            self.poll()
+            self.__stop.wait(max(self.interval - (time.monotonic() - start), self.aquarea.breaker.remaining()))
@@ -0,0 +1,81 @@
+'''
+Concurrent polling of devices spread over several serial ports and gateways
+'''
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Outcome of AquareaFleet.poll: PollResult by device name, exceptions by device name,
+# {"seconds", "devices", "ok"} by bus and the wall clock seconds of the whole poll
+FleetResult = namedtuple("FleetResult", ["results", "errors", "buses", "seconds"])
+
+
+class AquareaFleet:
+    """ One worker thread per physical bus, devices of a bus polled one after the other
+
+    Devices are AquareaModbus instances (AquareaBus handles included). They are
+    grouped by bus: the serial port unless told otherwise, e.g. for a Modbus TCP
+    gateway client injected with client=.
+    """
+
+    def __init__(self):
+        self.__buses = {}
+        self.__devices = {}
+
+    @property
+    def devices(self) -> dict:
+        return dict(self.__devices)
+
+    @property
+    def buses(self) -> dict:
+        """ Device names by bus """
+        return {bus: list(names) for bus, names in self.__buses.items()}
+
+    def add(self, name, aquarea, bus=None):
+        """ Add aquarea as name, on bus (default its serial port) """
+        if name in self.__devices:
+            raise ValueError(f"Device {name} already in the fleet")
+        if bus is None:
+            bus = aquarea.port
+        self.__devices[name] = aquarea
+        self.__buses.setdefault(bus, []).append(name)
+        return aquarea
+
+    def connect(self):
+        """ Connect every device, buses in parallel. Return {name: connected} """
+        return self.__each(lambda aquarea: aquarea.connect())[0]
+
+    def close(self):
+        self.__each(lambda aquarea: aquarea.close())
+
+    def poll(self, names=None, max_gap=None):
+        """ poll_data every device (names and max_gap as AquareaModbus.poll_data). Return a FleetResult """
+        start = time.monotonic()
+        results, errors, buses = self.__each(lambda aquarea: aquarea.poll_data(names=names, max_gap=max_gap))
+        for bus, timing in buses.items():
+            timing["ok"] = sum(1 for name in self.__buses[bus] if name in results and results[name].ok)
+        return FleetResult(results, errors, buses, time.monotonic() - start)
+
+    def __each(self, operation):
+        """ Run operation on every device, one thread per bus. Return (results, errors, bus timings) """
+        results = {}
+        errors = {}
+        buses = {}
+
+        def worker(bus):
+            start = time.monotonic()
+            for name in self.__buses[bus]:
+                try:
+                    results[name] = operation(self.__devices[name])
+                except Exception as e:
+                    log.error("%s on %s: %r", name, bus, e)
+                    errors[name] = e
+            buses[bus] = {"seconds": time.monotonic() - start, "devices": len(self.__buses[bus])}
+
+        if self.__buses:
+            with ThreadPoolExecutor(max_workers=len(self.__buses), thread_name_prefix="fleet") as executor:
+                list(executor.map(worker, self.__buses))
+        return results, errors, buses
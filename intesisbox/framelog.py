@@ -0,0 +1,328 @@
+'''
+Append-only on-disk log of polled PA-AW-MBS-1 frames, read back through mmap
+'''
+import glob
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .decoder import layout_crc
+from .pa_aw_mbs import DECODE_PLAN
+from .snapshot import AquareaSnapshot
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"AQFL"
+VERSION = 1
+# magic, version, frame words, record bytes, index interval, block layout crc, padded to 64 bytes
+HEADER = struct.Struct("<4sHHHHI44x")
+# Record: float64 timestamp, the frame words, uint16 flags, padded to a multiple of 8 bytes
+STAMP = struct.Struct("<d")
+FLAG_OK = 1
+
+# One day at one poll every 10 seconds
+SEGMENT_RECORDS = 8640
+# Timestamps of one record out of INDEX_EVERY go to the sparse index
+INDEX_EVERY = 64
+
+SEGMENT_SUFFIX = ".frames"
+INDEX_SUFFIX = ".idx"
+
+_LITTLE = sys.byteorder == "little"
+
+
+def record_size(plan):
+    """ Bytes of one record: timestamp, frame words and flags, 8 byte aligned """
+    return (STAMP.size + 2 * plan.frame_size + 2 + 7) // 8 * 8
+
+
+class FrameLogWriter:
+    """ Append each poll (timestamp and raw frame) as a fixed size record to segment files
+
+    directory holds numbered segments of segment_records records each, with their
+    sparse time index (the timestamp of every index_every-th record) in a side file.
+    Records are written little endian with plain appends, flushed each time (and
+    fsynced with fsync=True). Timestamps never go backwards: an earlier one is
+    stored as the last one. Reopening a directory continues its last segment.
+    """
+
+    def __init__(self, directory, plan=DECODE_PLAN, segment_records=SEGMENT_RECORDS, index_every=INDEX_EVERY, fsync=False):
+        if segment_records <= 0 or index_every <= 0:
+            raise ValueError("segment_records and index_every have to be positive")
+        self.directory = directory
+        self.plan = plan
+        self.segment_records = segment_records
+        self.index_every = index_every
+        self.fsync = fsync
+        self.records = 0
+        self.__size = record_size(plan)
+        self.__pad = bytes(self.__size - STAMP.size - 2 * plan.frame_size - 2)
+        self.__header = HEADER.pack(MAGIC, VERSION, plan.frame_size, self.__size, index_every, layout_crc(plan))
+        self.__file = None
+        self.__index = None
+        self.__sequence = -1
+        self.__count = 0
+        self.__last = None
+        os.makedirs(directory, exist_ok=True)
+        self.__resume()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for f in (self.__file, self.__index):
+            if f is not None:
+                f.close()
+        self.__file = self.__index = None
+
+    def append(self, raw, timestamp, ok=True):
+        """ Write frame raw taken at timestamp; ok False flags a poll with failed reads """
+        if len(raw) != self.plan.frame_size:
+            raise ValueError(f"Frame of {len(raw)} words, {self.plan.frame_size} expected")
+        if self.__last is not None and timestamp < self.__last:
+            log.warning("Frame log timestamp %.3f before the last one %.3f, clamped", timestamp, self.__last)
+            timestamp = self.__last
+        if self.__file is None or self.__count >= self.segment_records:
+            self.__open(self.__sequence + 1)
+        words = array("H", raw)
+        if not _LITTLE:
+            words.byteswap()
+        self.__file.write(STAMP.pack(timestamp) + words.tobytes() + struct.pack("<H", FLAG_OK if ok else 0) + self.__pad)
+        if self.__count % self.index_every == 0:
+            self.__index.write(STAMP.pack(timestamp))
+            self.__flush(self.__index)
+        self.__flush(self.__file)
+        self.__count += 1
+        self.__last = timestamp
+        self.records += 1
+
+    def append_snapshot(self, snapshot, ok=True):
+        self.append(snapshot.raw, snapshot.timestamp, ok)
+
+    def append_poll(self, aquarea, result):
+        """ Log the snapshot of aquarea after poll_data returned result. Return False if nothing was read """
+        if result.skipped is not None or aquarea.snapshot is None or not any(block.ok for block in result.blocks):
+            return False
+        self.append_snapshot(aquarea.snapshot, result.ok)
+        return True
+
+    def __flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def __resume(self):
+        """ Continue the last segment, dropping a torn record left by a crash """
+        paths = _segment_paths(self.directory)
+        if not paths:
+            return
+        path = paths[-1]
+        segment = _Segment(path, self.plan)
+        try:
+            self.__count = segment.count
+            self.__last = segment.time(segment.count - 1) if segment.count else None
+            index = segment.index
+            index_every = segment.index_every
+        finally:
+            segment.close()
+        self.__sequence = _sequence(path)
+        if self.__count >= self.segment_records or index_every != self.index_every:
+            return
+        self.__file = open(path, "r+b")
+        self.__file.truncate(HEADER.size + self.__count * self.__size)
+        self.__file.seek(0, os.SEEK_END)
+        # Rewritten from the records, in case the crash left it ahead or torn
+        self.__index = open(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, "wb")
+        self.__index.write(index.tobytes())
+        self.__flush(self.__index)
+
+    def __open(self, sequence):
+        self.close()
+        base = os.path.join(self.directory, f"{sequence:08d}")
+        self.__file = open(base + SEGMENT_SUFFIX, "wb")
+        self.__file.write(self.__header)
+        self.__index = open(base + INDEX_SUFFIX, "wb")
+        self.__sequence = sequence
+        self.__count = 0
+        log.debug("Frame log segment %s", base)
+
+
+def _segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "[0-9]" * 8 + SEGMENT_SUFFIX)))
+
+
+def _sequence(path):
+    return int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+
+
+class _Segment:
+    """ One segment file mapped read only, with its records up to the last complete one """
+
+    def __init__(self, path, plan):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path}: truncated header")
+            magic, version, frame_size, size, self.index_every, crc = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a version {VERSION} frame log")
+            if frame_size != plan.frame_size or size != record_size(plan) or crc != layout_crc(plan):
+                raise ValueError(f"{path}: written with a different register layout")
+            self.size = size
+            self.words = size // 2
+            self.count = (os.fstat(f.fileno()).st_size - HEADER.size) // size
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        self.view = memoryview(self.mmap)[HEADER.size:HEADER.size + self.count * size] if self.count else memoryview(b"")
+        # Timestamps and words seen in place, one every record
+        self.stamps = self.view.cast("d")[::size // STAMP.size] if self.count else array("d")
+        self.index = array("d")
+        index_path = path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                data = f.read()
+            self.index.frombytes(data[:len(data) // 8 * 8])
+        expected = -(-self.count // self.index_every)
+        self.index_ok = len(self.index) == expected
+        if not self.index_ok:
+            log.debug("%s: rebuilding the sparse index", path)
+            self.index = self.build_index()
+
+    def build_index(self):
+        return array("d", self.stamps[::self.index_every])
+
+    def time(self, idx):
+        return self.stamps[idx]
+
+    def first(self):
+        return self.stamps[0] if self.count else None
+
+    def locate(self, timestamp, right=False):
+        """ Record position of timestamp (bisect_left, or bisect_right with right=True)
+
+        The sparse index narrows the search to index_every records, only those
+        pages of the mapping are touched.
+        """
+        bisect = bisect_right if right else bisect_left
+        slot = bisect(self.index, timestamp)
+        lo = max(0, (slot - 1) * self.index_every)
+        hi = min(self.count, slot * self.index_every + 1) if slot < len(self.index) else self.count
+        return bisect(self.stamps, timestamp, lo, hi)
+
+    def range(self, start, end):
+        first = 0 if start is None else self.locate(start)
+        last = self.count if end is None else self.locate(end, right=True)
+        return first, max(first, last)
+
+    def close(self):
+        for view in (self.stamps, self.view):
+            if isinstance(view, memoryview):
+                view.release()
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                # frames() views still held by the caller, unmapped once they are gone
+                pass
+            self.mmap = None
+
+
+class FrameLogReader:
+    """ Time range queries over a FrameLogWriter directory
+
+    Segments are mapped read only when the reader is opened (reopen it to see
+    later records). frames() yields zero-copy memoryviews of the mapped records,
+    valid until close(); column() and snapshots() return copies.
+    """
+
+    def __init__(self, directory, plan=DECODE_PLAN, unit=10, byteorder=">"):
+        self.directory = directory
+        self.plan = plan
+        self.unit = unit
+        self.byteorder = byteorder
+        self.__segments = [segment for segment in (_Segment(path, plan) for path in _segment_paths(directory)) if segment.count]
+        self.__firsts = [segment.first() for segment in self.__segments]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(segment.count for segment in self.__segments)
+
+    def __repr__(self):
+        return f"FrameLogReader({self.directory!r}, segments={len(self.__segments)}, records={len(self)})"
+
+    @property
+    def start(self):
+        """ Timestamp of the first record, None when empty """
+        return self.__firsts[0] if self.__segments else None
+
+    @property
+    def end(self):
+        """ Timestamp of the last record, None when empty """
+        if not self.__segments:
+            return None
+        last = self.__segments[-1]
+        return last.time(last.count - 1)
+
+    def close(self):
+        for segment in self.__segments:
+            segment.close()
+        self.__segments = []
+        self.__firsts = []
+
+    def __select(self, start, end):
+        """ Iterate over (segment, first, last) record ranges between start and end (inclusive) """
+        first = 0 if start is None else max(0, bisect_left(self.__firsts, start) - 1)
+        last = len(self.__segments) if end is None else bisect_right(self.__firsts, end)
+        for segment in self.__segments[first:last]:
+            begin, stop = segment.range(start, end)
+            if begin < stop:
+                yield segment, begin, stop
+
+    def frames(self, start=None, end=None):
+        """ Iterate over (timestamp, words, ok) between start and end, words a memoryview('H') into the mapping """
+        frame_size = self.plan.frame_size
+        for segment, begin, stop in self.__select(start, end):
+            words = segment.view.cast("H")
+            for idx in range(begin, stop):
+                base = idx * segment.words
+                raw = words[base + 4:base + 4 + frame_size]
+                if not _LITTLE:
+                    raw = array("H", raw)
+                    raw.byteswap()
+                yield segment.stamps[idx], raw, bool(words[base + 4 + frame_size] & FLAG_OK)
+
+    def times(self, start=None, end=None):
+        """ array('d') of the record timestamps between start and end """
+        result = array("d")
+        for segment, begin, stop in self.__select(start, end):
+            result.extend(segment.stamps[begin:stop])
+        return result
+
+    def column(self, name, start=None, end=None):
+        """ Return (timestamps, raw words) of register name between start and end, as arrays """
+        position = 4 + self.plan.by_name[name].position
+        times = array("d")
+        words = array("H")
+        for segment, begin, stop in self.__select(start, end):
+            times.extend(segment.stamps[begin:stop])
+            words.extend(segment.view.cast("H")[begin * segment.words + position:stop * segment.words:segment.words])
+        if not _LITTLE:
+            words.byteswap()
+        return times, words
+
+    def snapshots(self, start=None, end=None):
+        """ Iterate over lazy AquareaSnapshots between start and end """
+        for timestamp, raw, ok in self.frames(start, end):
+            yield AquareaSnapshot(self.plan, array("H", raw.tobytes()), self.unit, self.byteorder, timestamp=timestamp, lazy=True)
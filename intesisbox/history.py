@@ -0,0 +1,161 @@
+'''
+Fixed size in-memory history of polled PA-AW-MBS-1 frames
+'''
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .snapshot import AquareaSnapshot
+
+log = logging.getLogger(__name__)
+
+# 24 hours at one poll every 10 seconds
+DEFAULT_CAPACITY = 8640
+
+
+class _Times:
+    """ Read only sequence of the history timestamps, oldest first, for bisect """
+    __slots__ = ("times", "head", "count")
+
+    def __init__(self, times, head, count):
+        self.times = times
+        self.head = head
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        return self.times[(self.head + idx) % len(self.times)]
+
+
+class FrameHistory:
+    """ Ring buffer of the last capacity frames (raw words) and their timestamps
+
+    Storage is allocated once: capacity * plan.frame_size words in a single
+    array('H') plus an array('d') of timestamps, the oldest frame overwritten
+    when full. Timestamps never go backwards: a poll stamped before the last one
+    (wall clock stepped back) is stored at the time of the last one. Queries
+    work on the raw words; nothing is decoded until asked for.
+    """
+
+    def __init__(self, plan, capacity=DEFAULT_CAPACITY, unit=10, byteorder=">"):
+        if capacity <= 0:
+            raise ValueError("capacity has to be positive")
+        self.plan = plan
+        self.unit = unit
+        self.byteorder = byteorder
+        self.__size = plan.frame_size
+        self.__capacity = capacity
+        self.__words = array("H", bytes(2 * capacity * self.__size))
+        self.__times = array("d", bytes(8 * capacity))
+        # Slot of the oldest frame and number of frames held
+        self.__head = 0
+        self.__count = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    @property
+    def nbytes(self) -> int:
+        """ Bytes allocated for words and timestamps """
+        return self.__words.itemsize * len(self.__words) + self.__times.itemsize * len(self.__times)
+
+    def __len__(self):
+        return self.__count
+
+    def __repr__(self):
+        return f"FrameHistory(frames={self.__count}, capacity={self.__capacity})"
+
+    def clear(self):
+        self.__head = 0
+        self.__count = 0
+
+    def append(self, raw, timestamp):
+        """ Store a copy of frame raw taken at timestamp, dropping the oldest frame when full """
+        if len(raw) != self.__size:
+            raise ValueError(f"Frame of {len(raw)} words, {self.__size} expected")
+        if self.__count:
+            last = self.__times[(self.__head + self.__count - 1) % self.__capacity]
+            if timestamp < last:
+                log.warning("History timestamp %.3f before the last one %.3f, clamped", timestamp, last)
+                timestamp = last
+        if self.__count < self.__capacity:
+            slot = (self.__head + self.__count) % self.__capacity
+            self.__count += 1
+        else:
+            slot = self.__head
+            self.__head = (self.__head + 1) % self.__capacity
+        base = slot * self.__size
+        self.__words[base:base + self.__size] = raw
+        self.__times[slot] = timestamp
+
+    def append_snapshot(self, snapshot):
+        self.append(snapshot.raw, snapshot.timestamp)
+
+    def __range(self, start, end):
+        """ (first, last) history indexes, oldest 0, of the frames with start <= timestamp <= end """
+        times = _Times(self.__times, self.__head, self.__count)
+        first = 0 if start is None else bisect_left(times, start)
+        last = self.__count if end is None else bisect_right(times, end)
+        return first, max(first, last)
+
+    def __runs(self, first, last):
+        """ Slot ranges (at most two, the ring wraps) holding history indexes first to last """
+        if first >= last:
+            return []
+        begin = (self.__head + first) % self.__capacity
+        stop = begin + last - first
+        if stop <= self.__capacity:
+            return [(begin, stop)]
+        return [(begin, self.__capacity), (0, stop - self.__capacity)]
+
+    def times(self, start=None, end=None):
+        """ array('d') of the frame timestamps between start and end (inclusive), oldest first """
+        result = array("d")
+        for begin, stop in self.__runs(*self.__range(start, end)):
+            result.extend(self.__times[begin:stop])
+        return result
+
+    def column(self, name, start=None, end=None):
+        """ Return (timestamps, raw words) of register name between start and end, as arrays
+
+        The words are sliced out of the ring with a stride, no frame is decoded.
+        """
+        position = self.plan.by_name[name].position
+        size = self.__size
+        times = array("d")
+        words = array("H")
+        for begin, stop in self.__runs(*self.__range(start, end)):
+            times.extend(self.__times[begin:stop])
+            words.extend(self.__words[begin * size + position:stop * size:size])
+        return times, words
+
+    def values(self, name, start=None, end=None):
+        """ Return (timestamps, decoded values) of register name, None for null words """
+        entry = self.plan.by_name[name]
+        times, words = self.column(name, start, end)
+        decode = self.plan.decode_raw
+        # Few distinct words in a column: decode each of them once
+        decoded = {word: decode(entry, word, self.unit, self.byteorder)[0] for word in set(words)}
+        return times, [decoded[word] for word in words]
+
+    def frames(self, start=None, end=None):
+        """ Iterate over (timestamp, raw frame) between start and end, oldest first """
+        size = self.__size
+        for begin, stop in self.__runs(*self.__range(start, end)):
+            for slot in range(begin, stop):
+                yield self.__times[slot], self.__words[slot * size:(slot + 1) * size]
+
+    def snapshots(self, start=None, end=None):
+        """ Iterate over lazy AquareaSnapshots between start and end, oldest first """
+        for timestamp, raw in self.frames(start, end):
+            yield AquareaSnapshot(self.plan, raw, self.unit, self.byteorder, timestamp=timestamp, lazy=True)
+
+    def latest(self):
+        """ (timestamp, raw frame) of the newest frame, None when empty """
+        if not self.__count:
+            return None
+        slot = (self.__head + self.__count - 1) % self.__capacity
+        return self.__times[slot], self.__words[slot * self.__size:(slot + 1) * self.__size]
@@ -1,25 +1,23 @@
 '''
 PA-AW-MBS-1: Modbus RTU (EIA485) Interface for Panasonic Aquarea series (no H series) using pyModbus
 '''
-import pymodbus
-from pymodbus.pdu import ModbusRequest
-from pymodbus.client.sync import ModbusSerialClient as ModbusClient
-#initialize a serial RTU client instance
-from pymodbus.transaction import ModbusRtuFramer
-from pymodbus.constants import Endian
-from pymodbus.payload import BinaryPayloadDecoder
-from pymodbus.payload import BinaryPayloadBuilder
-
 from enum import Enum
-import fasteners, fasteners._utils
+from collections import deque, namedtuple
 import math
 import queue
-import sys
 import os
-import platform
+import re
+import sys
 import time
-import tempfile
+import threading
 import logging
+from array import array
+
+from .decoder import DecodePlan, READ_GAP, break_even_gap, encode_words, write_runs
+from .history import FrameHistory
+from .retry import CircuitBreaker, RetryPolicy
+from .schema import Register, accessors, command_map, register_map
+from .snapshot import AquareaSnapshot
 
 log = logging.getLogger(__name__)
 
@@ -35,98 +33,139 @@ READ_WRITE = 0x1 | 0x2
 
 VERSION = "0.5.5"
 
-INTESISBOX_MAP = {
+# send_cmd(verify=True): first read-back after VERIFY_DELAY, then doubling up to VERIFY_MAX_DELAY
+VERIFY_DELAY = 0.2
+VERIFY_MAX_DELAY = 2.0
+VERIFY_DEADLINE = 10.0
+
+# Outcome of a verified write. ok is None for write only registers (cannot be read back),
+# settle_time is the seconds from the write to the read-back reporting the new value,
+# error the last failed read-back of a register that did not settle
+WriteResult = namedtuple("WriteResult", ["reg", "name", "expected", "observed", "ok", "settle_time", "error"], defaults=(None,))
+
+# Outcome of poll_data: ok when every read succeeded, skipped tells why the bus was not
+# read at all (None otherwise), stale names the requested registers that were not refreshed
+PollResult = namedtuple("PollResult", ["ok", "timestamp", "blocks", "skipped", "stale"])
+
+# Outcome of a single read of poll_data, error is None on success
+BlockResult = namedtuple("BlockResult", ["address", "count", "ok", "error", "timestamp", "attempts"])
+
+# Raw bus traffic kept by trace mode: op is "read" or "write", words the raw register words
+TraceRecord = namedtuple("TraceRecord", ["timestamp", "op", "address", "words"])
+
+# Byte and word orders (pymodbus Endian.Big and Endian.Little)
+BIG = ">"
+LITTLE = "<"
+
+
+def struct_order(order):
+    """ BIG or LITTLE for order: one of them or a pymodbus Endian value (a string before 3.5, an enum after) """
+    order = getattr(order, "value", order)
+    if order in (BIG, "big"):
+        return BIG
+    if order in (LITTLE, "little"):
+        return LITTLE
+    raise ValueError(f"Byte and word order has to be BIG ('>'), LITTLE ('<') or Endian.Big/Little, not {order!r}")
+
+# Modbus exception code of a function the device does not implement
+ILLEGAL_FUNCTION = 0x01
+
+# The register map of the device, INTESISBOX_MAP, COMMAND_MAP, DECODE_PLAN and the
+# AquareaDevice properties are all generated from it
+REGISTERS = (
     # General System Control
-    0:  {"name": "system", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Power', "access": READ_WRITE},
-    1:  {"name": "otudoor_temp", "type": "temp", "desc": f'Outdoor temperature {DEG}', "access": READ},
-    2:  {"name": "water_out_temp", "type": "temp", "desc": f'Outgoing Water Temperature {DEG}', "access": READ},
-    3:  {"name": "water_in_temp", "type": "temp", "desc": f'Ingoing Water Temperature {DEG}', "access": READ},
-    4:  {"name": "mode", "values": {0: "None", 1: "Heat", 2: "Heat_Tank", 3: "Tank", 4: "Cool_Tank", 5: "Cool"}, "type": "int", "desc": 'Operating Mode', "access": READ_WRITE},
+    Register(0, "system", "int", 'Power', READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(1, "otudoor_temp", "temp", f'Outdoor temperature {DEG}', READ),
+    Register(2, "water_out_temp", "temp", f'Outgoing Water Temperature {DEG}', READ),
+    Register(3, "water_in_temp", "temp", f'Ingoing Water Temperature {DEG}', READ),
+    Register(4, "mode", "int", 'Operating Mode', READ_WRITE, values={0: "None", 1: "Heat", 2: "Heat_Tank", 3: "Tank", 4: "Cool_Tank", 5: "Cool"}, commands={"Heat": 1, "Heat_Tank": 2, "Tank": 3, "Cool_Tank": 4, "Cool": 5}),
     # Climate Configuration
-    10: {"name": "config_mode", "values": {0: "Off", 1: "Heat", 2: "Cool"}, "type": "int", "desc": 'Climate Mode (heat/cool)', "access": READ},
-    11: {"name": "working", "values": {0: "Normal", 1: "Eco", 2: "Powerful"}, "type": "int", "desc": 'Climate Working Mode', "access": READ_WRITE},
-    12: {"name": "heat_low_outdoor_set_temperature",  "type": "temp", "desc": f'Outdoor Temp for Heating at Low Water Temp {DEG}', "access": READ_WRITE},
-    13: {"name": "heat_high_outdoor_set_temperature", "type": "temp", "desc": f'Outdoor Temp for Heating at High Water Temp {DEG}', "access": READ_WRITE},
-    14: {"name": "heat_low_water_set_temperature", "type": "temp", "desc": f'Water Setpoint for Heating at Low Outdoor Temp {DEG}', "access": READ_WRITE},
-    15: {"name": "heat_high_water_set_temperature", "type": "temp", "desc": f'Water Setpoint for Heating at High Outdoor Temp {DEG}', "access": READ_WRITE},
-    16: {"name": "water_thermo_shift", "type": "temp", "desc": f'Water Current Thermoshift {DEG}', "access": READ_WRITE},
-    17: {"name": "heat_temperature_max", "type": "temp", "desc": f'Outdoor Temp for Heating off (Max) {DEG}', "access": READ_WRITE},
-    18: {"name": "heat_temperature_min", "values": {0: "Disabled", 1: "Enabled"}, "type": "int", "desc": 'Outdoor Temp for Heating off (Min) mode', "access": READ},
-    19: {"name": "heat_out_temp_min", "type": "temp", "desc": f'Outdoor Temp for Heating off (Min) {DEG}', "access": READ},
-    20: {"name": "heater_setpoint_temp", "type": "temp", "desc": f'Outdoor Temp for Heater On {DEG}', "access": READ},
-    21: {"name": "heater_capacity", "values": {0x55: "0 KW", 0x58: "3 KW", 0x5b: "6 KW", 0x5e: "9 KW"}, "type": "int", "desc": 'Heater Capacity Selection', "access": READ_WRITE},
-    22: {"name": "heater_max_capacity", "type": "int", "desc": 'Max Heater Capacity', "access": READ},
-    23: {"name": "cool_setpoint_temp", "type": "temp", "desc": f'Cooling Setpoint Temperature {DEG}', "access": READ_WRITE},
-    24: {"name": "heat_setpoint_temp", "type": "temp", "desc": f'Heating Setpoint Temperature {DEG}', "access": READ},
-    25: {"name": "auto_heat_to_cool_temp", "type": "temp", "desc": f'Auto Heat to Cool Temperature {DEG}', "access": READ},
-    26: {"name": "auto_cool_to_heat_temp", "type": "temp", "desc": f'Auto Cool to Heat Temperature {DEG}', "access": READ},
-    27: {"name": "auto_mode", "values": {0: "Off", 1: "Heat", 2: "Cool"}, "type": "int", "desc": 'Auto Config Mode', "access": READ},
+    Register(10, "config_mode", "int", 'Climate Mode (heat/cool)', READ, values={0: "Off", 1: "Heat", 2: "Cool"}),
+    Register(11, "working", "int", 'Climate Working Mode', READ_WRITE, values={0: "Normal", 1: "Eco", 2: "Powerful"}),
+    Register(12, "heat_low_outdoor_set_temperature", "temp", f'Outdoor Temp for Heating at Low Water Temp {DEG}', READ_WRITE, min=-15, max=15),
+    Register(13, "heat_high_outdoor_set_temperature", "temp", f'Outdoor Temp for Heating at High Water Temp {DEG}', READ_WRITE, min=-15, max=15),
+    Register(14, "heat_low_water_set_temperature", "temp", f'Water Setpoint for Heating at Low Outdoor Temp {DEG}', READ_WRITE, min=25, max=55),
+    Register(15, "heat_high_water_set_temperature", "temp", f'Water Setpoint for Heating at High Outdoor Temp {DEG}', READ_WRITE, min=25, max=55),
+    Register(16, "water_thermo_shift", "temp", f'Water Current Thermoshift {DEG}', READ_WRITE, min=-5, max=5),
+    Register(17, "heat_temperature_max", "temp", f'Outdoor Temp for Heating off (Max) {DEG}', READ_WRITE, min=5, max=35),
+    Register(18, "heat_temperature_min", "int", 'Outdoor Temp for Heating off (Min) mode', READ, values={0: "Disabled", 1: "Enabled"}),
+    Register(19, "heat_out_temp_min", "temp", f'Outdoor Temp for Heating off (Min) {DEG}', READ),
+    Register(20, "heater_setpoint_temp", "temp", f'Outdoor Temp for Heater On {DEG}', READ, min=-15, max=20),
+    Register(21, "heater_capacity", "int", 'Heater Capacity Selection', READ_WRITE, values={0x55: "0 KW", 0x58: "3 KW", 0x5B: "6 KW", 0x5E: "9 KW"}, commands={}),
+    Register(22, "heater_max_capacity", "int", 'Max Heater Capacity', READ),
+    Register(23, "cool_setpoint_temp", "temp", f'Cooling Setpoint Temperature {DEG}', READ_WRITE, min=5, max=20),
+    Register(24, "heat_setpoint_temp", "temp", f'Heating Setpoint Temperature {DEG}', READ),
+    Register(25, "auto_heat_to_cool_temp", "temp", f'Auto Heat to Cool Temperature {DEG}', READ),
+    Register(26, "auto_cool_to_heat_temp", "temp", f'Auto Cool to Heat Temperature {DEG}', READ),
+    Register(27, "auto_mode", "int", 'Auto Config Mode', READ, values={0: "Off", 1: "Heat", 2: "Cool"}),
     # Tank Configuration
-    30: {"name": "tank_mode", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Tank On/Off', "access": READ},
-    31: {"name": "tank_working", "values": {0: "Normal", 1: "Eco", 2: "Powerful"}, "type": "int", "desc": 'Tank Working Mode', "access": READ_WRITE},
-    32: {"name": "tank_water_temp", "type": "temp", "desc": f'Tank Water Temperature {DEG}', "access": READ},
-    33: {"name": "tank_setpoint_temp", "type": "temp", "desc": f'Tank Water Setpoint Temp {DEG}', "access": READ_WRITE},
-    34: {"name": "heat_interval", "type": "int", "desc": 'Heat-up Interval', "access": READ_WRITE},
-    35: {"name": "operation_interval", "type": "min", "desc": f'Operation Interval {MIN}', "access": READ_WRITE},
-    36: {"name": "booster_delay", "type": "int", "desc": 'Booster Delay Time', "access": READ_WRITE},
-    37: {"name": "sterilization_on", "type": "int", "desc": 'Sterilization On', "access": WRITE},
-    38: {"name": "tank_ster_temp", "type": "temp", "desc": f'Sterilization Boiling Temp {DEG}', "access": READ_WRITE},
-    39: {"name": "tank_ster_time", "type": "int", "desc": 'Sterilization Continuing Time', "access": READ},
+    Register(30, "tank_mode", "int", 'Tank On/Off', READ, values={0: "Off", 1: "On"}),
+    Register(31, "tank_working", "int", 'Tank Working Mode', READ_WRITE, values={0: "Normal", 1: "Eco", 2: "Powerful"}),
+    Register(32, "tank_water_temp", "temp", f'Tank Water Temperature {DEG}', READ),
+    Register(33, "tank_setpoint_temp", "temp", f'Tank Water Setpoint Temp {DEG}', READ_WRITE, min=40, max=75),
+    Register(34, "heat_interval", "int", 'Heat-up Interval', READ_WRITE, min=5, max=95),
+    Register(35, "operation_interval", "min", f'Operation Interval {MIN}', READ_WRITE, min=1, max=20),
+    Register(36, "booster_delay", "int", 'Booster Delay Time', READ_WRITE, min=20, max=95),
+    Register(37, "sterilization_on", "int", 'Sterilization On', WRITE, commands={"On": 0xAA}),
+    Register(38, "tank_ster_temp", "temp", f'Sterilization Boiling Temp {DEG}', READ_WRITE, min=40, max=75),
+    Register(39, "tank_ster_time", "int", 'Sterilization Continuing Time', READ),
     # Consumption
-    47: {"name": "heat_wh", "type": "int", "desc": f'Heat mode consumption {WH}', "access": READ},
-    48: {"name": "cool_wh", "type": "int", "desc": f'Cool mode consumption {WH}', "access": READ},
-    49: {"name": "tank_wh", "type": "int", "desc": f'Tank mode consumption {WH}', "access": READ},
+    Register(47, "heat_wh", "int", f'Heat mode consumption {WH}', READ),
+    Register(48, "cool_wh", "int", f'Cool mode consumption {WH}', READ),
+    Register(49, "tank_wh", "int", f'Tank mode consumption {WH}', READ),
     # Maintenance
-    50: {"name": "test_mode_1", "type": "int", "desc": 'Test mode 1', "access": WRITE},
-    51: {"name": "test_mode_2", "type": "int", "desc": 'Test Mode 2', "access": WRITE},
-    52: {"name": "error", "type": "err", "desc": 'Error', "access": READ},
-    53: {"name": "error_history", "type": "err", "desc": 'Historical Error', "access": READ},
-    54: {"name": "error_reset_1", "type": "int", "desc": 'Error Reset 1', "access": WRITE},
-    55: {"name": "error_reset_2", "type": "int", "desc": 'Error Reset 2', "access": WRITE},
-    56: {"name": "tank_warn", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Warning Tank Temp. Status', "access": READ},
-    57: {"name": "defrost", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Defrost Status', "access": READ},
-    58: {"name": "solar", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Solar Status', "access": READ},
-    59: {"name": "booster", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Booster Status', "access": READ},
-    60: {"name": "compressor", "type": "int", "desc": f'Compressor Frequency {HZ}', "access": READ},
-    61: {"name": "compressor_hour", "type": "int", "desc": 'Compressor Hours', "access": READ_WRITE},
-    62: {"name": "pump_down", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Pump Down', "access": READ},
-    63: {"name": "force_mode", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Force Mode', "access": READ_WRITE},
-    64: {"name": "force_deice", "type": "int", "desc": 'Force Deice', "access": WRITE},
-    65: {"name": "service", "values": {0x00: "Normal", 0x01: "Service pumpdown", 0x02: "Service pump"}, "type": "int", "desc": 'Service', "access": READ_WRITE},
-    66: {"name": "quiet", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Quiet Mode', "access": READ_WRITE},
-    67: {"name": "heater_when_heat", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Heater When Heat', "access": READ_WRITE},
-    68: {"name": "heater_status", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Heater Status', "access": READ},
-    69: {"name": "heater_mode", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Heater Mode', "access": READ},
-    70: {"name": "alarm_status", "values": {0: "No alarm", 1: "Alarm"}, "type": "int", "desc": 'Alarm Status', "access": READ},
-    71: {"name": "dry_concrete_temp", "type": "temp", "desc": 'Dry Concrete Temp', "access": READ},
-    72: {"name": "air_purge", "values": {0: "Off", 1: "On"}, "type": "int", "desc": 'Air Purge', "access": READ_WRITE},
-    73: {"name": "pump_speed", "type": "int", "desc": 'Pump Speed', "access": READ_WRITE},
-    74: {"name": "erp_operation", "type": "int", "desc": 'ERP Operation', "access": READ_WRITE},
-    75: {"name": "erp_param", "values": {0: "Hz", 1: "Td", 2: "FM", 3: "I1"}, "type": "int", "desc": 'ERP PArameters', "access": READ},
-    76: {"name": "erp_data", "type": "int", "desc": 'ERP Data', "access": READ},
-    77: {"name": "slow_fast_test", "values": {0: "Normal", 1: "Slow Time", 2: "Fast Time", 3: "Slow Day", 4: "Fast Day"}, "type": "int", "desc": '', "access": READ},
+    Register(50, "test_mode_1", "int", 'Test mode 1', WRITE, commands={"Go": 1}),
+    Register(51, "test_mode_2", "int", 'Test Mode 2', WRITE, commands={"Go": 1}),
+    Register(52, "error", "err", 'Error', READ),
+    Register(53, "error_history", "err", 'Historical Error', READ),
+    Register(54, "error_reset_1", "int", 'Error Reset 1', WRITE, commands={"Go": 1}),
+    Register(55, "error_reset_2", "int", 'Error Reset 2', WRITE, commands={"Go": 1}),
+    Register(56, "tank_warn", "int", 'Warning Tank Temp. Status', READ, values={0: "Off", 1: "On"}),
+    Register(57, "defrost", "int", 'Defrost Status', READ, values={0: "Off", 1: "On"}),
+    Register(58, "solar", "int", 'Solar Status', READ, values={0: "Off", 1: "On"}),
+    Register(59, "booster", "int", 'Booster Status', READ, values={0: "Off", 1: "On"}),
+    Register(60, "compressor", "int", f'Compressor Frequency {HZ}', READ),
+    Register(61, "compressor_hour", "int", 'Compressor Hours', READ_WRITE, min=0, max=65535),
+    Register(62, "pump_down", "int", 'Pump Down', READ, values={0: "Off", 1: "On"}),
+    Register(63, "force_mode", "int", 'Force Mode', READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(64, "force_deice", "int", 'Force Deice', WRITE, commands={"Off": 0, "On": 1}),
+    Register(65, "service", "int", 'Service', READ_WRITE, values={0: "Normal", 1: "Service pumpdown", 2: "Service pump"}),
+    Register(66, "quiet", "int", 'Quiet Mode', READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(67, "heater_when_heat", "int", 'Heater When Heat', READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(68, "heater_status", "int", 'Heater Status', READ, values={0: "Off", 1: "On"}),
+    Register(69, "heater_mode", "int", 'Heater Mode', READ, values={0: "Off", 1: "On"}),
+    Register(70, "alarm_status", "int", 'Alarm Status', READ, values={0: "No alarm", 1: "Alarm"}),
+    Register(71, "dry_concrete_temp", "temp", 'Dry Concrete Temp', READ),
+    Register(72, "air_purge", "int", 'Air Purge', READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(73, "pump_speed", "int", 'Pump Speed', READ_WRITE, min=1, max=7),
+    Register(74, "erp_operation", "int", 'ERP Operation', READ_WRITE, min=0, max=80),
+    Register(75, "erp_param", "int", 'ERP PArameters', READ, values={0: "Hz", 1: "Td", 2: "FM", 3: "I1"}),
+    Register(76, "erp_data", "int", 'ERP Data', READ),
+    Register(77, "slow_fast_test", "int", '', READ, values={0: "Normal", 1: "Slow Time", 2: "Fast Time", 3: "Slow Day", 4: "Fast Day"}),
     # Unit Configuration
-    80: {"name": "room_thermostat", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Room thermostat', "access": READ},
-    81: {"name": "tank_connection", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Tank Connection', "access": READ},
-    82: {"name": "solar_priority", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Solar Priority', "access": READ},
-    83: {"name": "heating_priority", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Heating Priority', "access": READ},
-    84: {"name": "cooling_priority", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Cooling Priority', "access": READ},
-    85: {"name": "sterilization", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Sterilization', "access": READ},
-    86: {"name": "base_pan_heater", "values": {0x55: "Type A", 0xAA: "Type B"}, "type": "int", "desc": 'Base Pan Heater', "access": READ},
-    87: {"name": "anti_freezing", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Anti freezing', "access": READ},
-    88: {"name": "booster_heater", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Booster Heater', "access": READ},
-    89: {"name": "cool_mode_selection", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Cool Mode Selected', "access": READ},
-    90: {"name": "base_pan_heater_selection", "values": {0x55: "Off", 0xAA: "On"}, "type": "int", "desc": 'Base Pan Heater Selected', "access": READ},
+    Register(80, "room_thermostat", "int", 'Room thermostat', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(81, "tank_connection", "int", 'Tank Connection', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(82, "solar_priority", "int", 'Solar Priority', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(83, "heating_priority", "int", 'Heating Priority', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(84, "cooling_priority", "int", 'Cooling Priority', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(85, "sterilization", "int", 'Sterilization', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(86, "base_pan_heater", "int", 'Base Pan Heater', READ, values={0x55: "Type A", 0xAA: "Type B"}),
+    Register(87, "anti_freezing", "int", 'Anti freezing', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(88, "booster_heater", "int", 'Booster Heater', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(89, "cool_mode_selection", "int", 'Cool Mode Selected', READ, values={0x55: "Off", 0xAA: "On"}),
+    Register(90, "base_pan_heater_selection", "int", 'Base Pan Heater Selected', READ, values={0x55: "Off", 0xAA: "On"}),
     # System Configuration
-    1000: {"name": "thermoshift_heat_eco", "type": "temp", "desc": f'Climate Preset Heat Thermoshift (ECO) {DEG}', "access": READ_WRITE},
-    1001: {"name": "thermoshift_heat_powerful", "type": "temp", "desc": f'Climate Preset Heat Thermoshift (POWERFUL) {DEG}', "access": READ_WRITE},
-    1002: {"name": "thermoshift_cool_eco", "type": "temp", "desc": f'Climate Preset Cool Thermoshift (ECO) {DEG}', "access": READ_WRITE},
-    1003: {"name": "thermoshift_cool_powerful", "type": "temp", "desc": f'Climate Preset Cool Thermoshift (POWERFUL) {DEG}', "access": READ_WRITE},
-    1004: {"name": "thermoshift_tank_eco", "type": "temp", "desc": f'Preset Tank Thermoshift (ECO) {DEG}', "access": READ_WRITE},
-    1005: {"name": "thermoshift_tank_powerful", "type": "temp", "desc": f'Preset Tank Thermoshift (POWERFUL) {DEG}', "access": READ_WRITE},
-    1006: {"name": "sync", "values": {0: "Off", 1: "Trigger"}, "type": "int", "desc": 'Sync', "access": READ_WRITE},
-    1007: {"name": "led", "values": {0: "Disabled", 1: "Enabled"}, "type": "int", "desc": 'LED', "access": READ_WRITE}
-}
+    Register(1000, "thermoshift_heat_eco", "temp", f'Climate Preset Heat Thermoshift (ECO) {DEG}', READ_WRITE, min=0, max=5),
+    Register(1001, "thermoshift_heat_powerful", "temp", f'Climate Preset Heat Thermoshift (POWERFUL) {DEG}', READ_WRITE, min=0, max=5),
+    Register(1002, "thermoshift_cool_eco", "temp", f'Climate Preset Cool Thermoshift (ECO) {DEG}', READ_WRITE, min=0, max=5),
+    Register(1003, "thermoshift_cool_powerful", "temp", f'Climate Preset Cool Thermoshift (POWERFUL) {DEG}', READ_WRITE, min=0, max=5),
+    Register(1004, "thermoshift_tank_eco", "temp", f'Preset Tank Thermoshift (ECO) {DEG}', READ_WRITE, min=0, max=10),
+    Register(1005, "thermoshift_tank_powerful", "temp", f'Preset Tank Thermoshift (POWERFUL) {DEG}', READ_WRITE, min=0, max=10),
+    Register(1006, "sync", "int", 'Sync', READ_WRITE, values={0: "Off", 1: "Trigger"}, commands={"Trigger": 1}),
+    Register(1007, "led", "int", 'LED', READ_WRITE, values={0: "Disabled", 1: "Enabled"})
+)
+
+INTESISBOX_MAP = register_map(REGISTERS)
 
 ERROR_MAP = {
       0 : { 'code': 'H00', 'desc': 'No abnormality detected'},
@@ -173,48 +212,179 @@ ERROR_MAP = {
   65535 : { 'code': 'N/A', 'desc': 'Communication error between PA-IntesisHome'}
 }
 
-COMMAND_MAP = {
-    "system":                            { "reg":  0, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "mode":                              { "reg":  4, "values": { "Heat": 1, "Heat_Tank": 2, "Tank": 3, "Cool_Tank": 4, "Cool": 5 }, "type": "int" },
-    "working":                           { "reg": 11, "values": { "Normal": 0, "Eco": 1, "Powerful": 2 }, "type": "int" },
-    "heat_low_outdoor_set_temperature":  { "reg": 12, "min": -15, "max": 15, "type": "temp" },
-    "heat_high_outdoor_set_temperature": { "reg": 13, "min": -15, "max": 15, "type": "temp" },
-    "heat_low_water_set_temperature":    { "reg": 14, "min": 25, "max": 55, "type": "temp" },
-    "heat_high_water_set_temperature":   { "reg": 15, "min": 25, "max": 55, "type": "temp" },
-    "water_thermo_shift":                { "reg": 16, "min": -5, "max": 5, "type": "temp" },
-    "heat_temperature_max":              { "reg": 17, "min": 5, "max": 35, "type": "temp" },
-    "heater_setpoint_temp":              { "reg": 20, "min": -15, "max": 20, "type": "temp" },
-    "cool_setpoint_temp":                { "reg": 23, "min": 5, "max": 20, "type": "temp" },
-    "tank_working":                      { "reg": 31, "values": { "Normal": 0, "Eco": 1, "Powerful": 2 }, "type": "int" },
-    "tank_setpoint_temp":                { "reg": 33, "min": 40, "max": 75, "type": "temp" },
-    "heat_interval":                     { "reg": 34, "min": 5, "max": 95, "type": "int" },
-    "operation_interval":                { "reg": 35, "min": 1, "max": 20, "type": "min" },
-    "booster_delay":                     { "reg": 36, "min": 20, "max": 95, "type": "int" },
-    "sterilization_on":                  { "reg": 37, "values": { "On": 0xAA }, "type": "int" },
-    "tank_ster_temp":                    { "reg": 38, "min": 40, "max": 75, "type": "temp" },
-    "test_mode_1":                       { "reg": 50, "values": { "Go": 1 }, "type": "int" },
-    "test_mode_2":                       { "reg": 51, "values": { "Go": 1 }, "type": "int" },
-    "error_reset_1":                     { "reg": 54, "values": { "Go": 1 }, "type": "int" },
-    "error_reset_2":                     { "reg": 55, "values": { "Go": 1 }, "type": "int" },
-    "compressor_hour":                   { "reg": 61, "min": 0, "max": 65535, "type": "int" },
-    "force_mode":                        { "reg": 63, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "force_deice":                       { "reg": 64, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "service":                           { "reg": 65, "values": { "Normal": 0x00, "Service pumpdown": 0x01, "Service pump": 0x02 }, "type": "int" },
-    "quiet":                             { "reg": 66, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "heater_when_heat":                  { "reg": 67, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "air_purge":                         { "reg": 72, "values": { "Off": 0, "On": 1 }, "type": "int" },
-    "pump_speed":                        { "reg": 73, "min": 1, "max": 7, "type": "int" },
-    "erp_operation":                     { "reg": 74, "min": 0, "max": 80, "type": "int" },
-    "thermoshift_heat_eco":              { "reg": 1000, "min": 0, "max": 5, "type": "temp" },
-    "thermoshift_heat_powerful":         { "reg": 1001, "min": 0, "max": 5, "type": "temp" },
-    "thermoshift_cool_eco":              { "reg": 1002, "min": 0, "max": 5, "type": "temp" },
-    "thermoshift_cool_powerful":         { "reg": 1003, "min": 0, "max": 5, "type": "temp" },
-    "thermoshift_tank_eco":              { "reg": 1004, "min": 0, "max": 10, "type": "temp" },
-    "thermoshift_tank_powerful":         { "reg": 1005, "min": 0, "max": 10, "type": "temp" },
-    "sync":                              { "reg": 1006, "values": { "Trigger": 1 }, "type": "int" },
-    "led":                               { "reg": 1007, "values": { "Disabled": 0, "Enabled": 1 }, "type": "int" }
+COMMAND_MAP = command_map(REGISTERS, WRITE)
+
+# Named register groups accepted by poll_data(names=...)
+REGISTER_GROUPS = {
+    "general":       (0, 1, 2, 3, 4),
+    "climate":       tuple(reg for reg in INTESISBOX_MAP if 10 <= reg <= 27),
+    "tank":          tuple(reg for reg in INTESISBOX_MAP if 30 <= reg <= 39),
+    "consumption":   (47, 48, 49),
+    "maintenance":   tuple(reg for reg in INTESISBOX_MAP if 50 <= reg <= 77),
+    "unit_config":   tuple(reg for reg in INTESISBOX_MAP if 80 <= reg <= 90),
+    "system_config": tuple(reg for reg in INTESISBOX_MAP if reg >= 1000),
+    # Fast changing sensors: temperatures, defrost, booster and compressor
+    "telemetry":     (1, 2, 3, 32, 57, 59, 60),
 }
 
+# INTESISBOX_MAP compiled once into read blocks (0-90 and 1000-1007)
+DECODE_PLAN = DecodePlan(INTESISBOX_MAP, ERROR_MAP, null=INTESIS_NULL, read_flag=READ)
+
+# pymodbus (and fasteners) are imported by the first connect, not by this module: a process
+# that never reaches the bus (e.g. an AquareaClient of the daemon) never loads them
+_retry_exceptions = None
+
+
+def retry_exceptions():
+    """ Errors of a bus transaction worth another attempt: OSError and ModbusException """
+    global _retry_exceptions
+    if _retry_exceptions is None:
+        from pymodbus.exceptions import ModbusException
+        _retry_exceptions = (OSError, ModbusException)
+    return _retry_exceptions
+
+
+def client_class():
+    """ pymodbus synchronous serial client class """
+    try:
+        from pymodbus.client.sync import ModbusSerialClient
+    except ImportError:
+        # pymodbus >= 3 (required by AsyncAquareaModbus)
+        from pymodbus.client import ModbusSerialClient
+    return ModbusSerialClient
+
+
+def __getattr__(name):
+    # Names once imported eagerly, resolved (and pymodbus imported) on first access
+    if name == "RETRY_EXCEPTIONS":
+        return retry_exceptions()
+    if name == "ModbusClient":
+        return client_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def bus_lock(port):
+    """ Inter-process lock serializing the access to the Modbus bus on port """
+    import fasteners
+    # Locking system initalization using fasteners library, one lock file per serial port:
+    # symlinks such as /dev/serial/by-id/... resolve to the device they name
+    port = os.path.realpath(port)
+    lock_file = 'aquarea-' + (re.sub(r'[^A-Za-z0-9_.]+', '-', port).strip('-') or 'default') + '.lock'
+    if sys.platform.startswith('linux'):
+        lock_path = '/run/lock/' + lock_file
+    else:
+        import tempfile
+        lock_path = tempfile.gettempdir() + '/' + lock_file
+    if not os.path.exists(lock_path):
+        with open(lock_path, 'w') as f:
+            f.close()
+    flock = fasteners.InterProcessReaderWriterLock(lock_path, logger=log)
+    return flock
+
+class BusBusyError(TimeoutError):
+    """ The bus lock could not be acquired within lockwait seconds """
+
+class BusLock:
+    """ bus_lock(port) with an acquisition timeout and lock-wait metrics
+
+    Every Modbus transaction needs the serial line for itself, reads included,
+    so the bus is always taken exclusively (as the fasteners write lock).
+    lockwait is the number of seconds a blocking acquire waits before raising
+    BusBusyError, 0 waits forever. Threads sharing a BusLock are serialized as well.
+    """
+
+    def __init__(self, port, lockwait=0):
+        self.__port = port
+        self.__lock_file = None
+        # File locks are per process: threads of this process queue here first
+        self.__tlock = threading.Lock()
+        self.__lockwait = lockwait
+        self.__stats = {"acquired": 0, "busy": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0, "wait_last": 0.0}
+
+    @property
+    def stats(self):
+        """ Acquisitions, busy (non-blocking) misses, timeouts and seconds spent waiting for the lock """
+        return dict(self.__stats)
+
+    @property
+    def __flock(self):
+        # Lock file opened by the first acquire
+        if self.__lock_file is None:
+            self.__lock_file = bus_lock(self.__port)
+        return self.__lock_file
+
+    def acquire(self, blocking=True):
+        """ Take the bus. Return False when not blocking and the bus is busy """
+        start = time.monotonic()
+        if blocking:
+            acquired = self.__tlock.acquire(timeout=self.__lockwait or -1)
+            if acquired:
+                timeout = self.__lockwait - (time.monotonic() - start) if self.__lockwait else None
+                acquired = self.__flock.acquire_write_lock(timeout=timeout)
+                if not acquired:
+                    self.__tlock.release()
+        else:
+            acquired = self.try_acquire()
+        if acquired:
+            self.record(time.monotonic() - start)
+        elif blocking:
+            raise self.timed_out(self.__lockwait)
+        else:
+            self.__stats["busy"] += 1
+        return acquired
+
+    def try_acquire(self):
+        """ Take the bus if free, without touching the metrics """
+        if not self.__tlock.acquire(blocking=False):
+            return False
+        if not self.__flock.acquire_write_lock(blocking=False):
+            self.__tlock.release()
+            return False
+        return True
+
+    def record(self, wait):
+        """ Account an acquisition that waited wait seconds """
+        stats = self.__stats
+        stats["acquired"] += 1
+        stats["wait_total"] += wait
+        stats["wait_last"] = wait
+        if wait > stats["wait_max"]:
+            stats["wait_max"] = wait
+
+    def timed_out(self, lockwait):
+        """ Account a blocking acquire given up after lockwait seconds, return its BusBusyError """
+        self.__stats["timeouts"] += 1
+        return BusBusyError(f"Bus lock not acquired in {lockwait} s")
+
+    def release(self):
+        self.__flock.release_write_lock()
+        self.__tlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def _illegal_function(response):
+    """ True when the device answered with an IllegalFunction exception """
+    return getattr(response, "exception_code", None) == ILLEGAL_FUNCTION
+
+def resolve_registers(names):
+    """ Return the readable registers of register names and REGISTER_GROUPS keys """
+    if isinstance(names, str):
+        names = [names]
+    regs = set()
+    for name in names:
+        if name in REGISTER_GROUPS:
+            regs.update(reg for reg in REGISTER_GROUPS[name] if reg in DECODE_PLAN.by_reg)
+        elif name in DECODE_PLAN.by_name:
+            regs.add(DECODE_PLAN.by_name[name].reg)
+        else:
+            raise ValueError(f"Unknown register or group {name}")
+    return regs
+
 class Mode(Enum):
     Nothing = 0
     Heat = 1
@@ -238,62 +408,97 @@ class ThreeWayValve(Enum):
     UNKNOWN = "Unknown"
 
 
-class AquareaModbus:
-
-    def __init__(self, port='/dev/ttyUSB0', slave=1, stopbits=1, bytesize=8, parity='N', baudrate=9600, 
-                    timeout=3, write_timeout=2, byteorder=Endian.Big, wordorder=Endian.Big, lockwait=0, retry=0, unit=10):
-
+class _Verification:
+    """ Read-back state of a verified send_cmd, shared by the sync and async transports """
+
+    def __init__(self, written, deadline):
+        self.written = written
+        self.deadline = deadline
+        self.start = time.monotonic()
+        self.pending = {reg: word for reg, word in written.items() if reg in DECODE_PLAN.by_reg}
+        self.observed = {}
+        self.results = {}
+        self.delay = VERIFY_DELAY
+        self.error = None
+
+    def next_delay(self):
+        """ Seconds to wait before the next read-back, None when done or out of time """
+        delay = self.delay
+        if not self.pending or time.monotonic() - self.start + delay > self.deadline:
+            return None
+        self.delay = min(delay * 2, VERIFY_MAX_DELAY)
+        return delay
+
+    def retry_policy(self, policy):
+        """ policy bounded by the time left before the deadline """
+        remaining = max(0.0, self.deadline - (time.monotonic() - self.start))
+        if policy.deadline is not None and policy.deadline < remaining:
+            return policy
+        return RetryPolicy(policy.attempts, policy.delay, policy.max_delay, policy.multiplier, policy.jitter, remaining)
+
+    def failed(self, address, count, error):
+        """ Record a read-back that failed, reported for the registers that do not settle """
+        log.warning("Read-back of %d-%d failed: %s", address, address + count - 1, error)
+        self.error = error
+
+    def update(self, observed):
+        """ Record words read back, settling the registers that report the written word """
+        self.observed.update(observed)
+        now = time.monotonic()
+        for reg in [reg for reg in self.pending if observed.get(reg) == self.pending[reg]]:
+            self.results[reg] = WriteResult(reg, INTESISBOX_MAP[reg]["name"], self.pending.pop(reg), observed[reg], True, now - self.start)
+
+    def report(self):
+        """ Return {name: WriteResult} for every written register """
+        for reg, word in self.written.items():
+            if reg not in self.results:
+                ok = False if reg in self.pending else None
+                self.results[reg] = WriteResult(reg, INTESISBOX_MAP[reg]["name"], word, self.observed.get(reg), ok, None,
+                                                self.error if ok is False else None)
+        log.debug("verify = %s", self.results)
+        return {result.name: result for result in self.results.values()}
+
+
+@accessors(REGISTERS, DECODE_PLAN, READ, WRITE)
+class AquareaDevice:
+    """ Register map, snapshot and command queue of a PA-AW-MBS-1, independent of the transport
+
+    Each register of REGISTERS is a property generated with the class: readable ones
+    return their mapped value in the current snapshot (None before the first poll),
+    the ones with a command queue the value set after checking its range or values.
+    """
+
+    def __init__(self, slave=1, byteorder=BIG, wordorder=BIG, unit=10, lazy=False, read_gap=READ_GAP, multi_write=True, retry=None, breaker=None, trace=0, history=0):
+        byteorder = struct_order(byteorder)
+        wordorder = struct_order(wordorder)
         self.__slave = slave
-        self.__port = port
-        self.__stopbits = stopbits
-        self.__bytesize = bytesize
-        self.__parity = parity
-        self.__baudrate = baudrate
-        self.__timeout = timeout
-        self.__write_timeout = write_timeout
         self.__byteorder = byteorder
         self.__wordorder = wordorder
         self.__unit = unit
-        self.__data = {}
+        # Lazy mode keeps raw words on poll and decodes each value on first access
+        self.__lazy = lazy
+        # Holes of up to read_gap registers are read through by selective polls
+        self.__read_gap = read_gap
+        # Adjacent registers are written with a single write_multiple_registers (FC16), FC6 otherwise
+        self.__multi_write = multi_write
+        self.__snapshot = None
+        self.__stamps = None
+        self.__changes = {}
+        # Change callbacks by register, None holds the ones for every register
+        self.__callbacks = {}
         self.__mq = queue.Queue()
-        self.__is_connected = False
-        self.__lockwait = lockwait
-        self.__retry = retry
-        self.__currtry = 0
-        self.__sport = None
-        log.debug("slave = %d, port = %s, stopbits = %d, bytesize = %d, parity = %s, baudrate = %d, timeout = %d, byteorder = %s, wordorder = %s, lockwait = %d, unit = %d" % (self.__slave, self.__port, self.__stopbits, self.__bytesize, self.__parity, self.__baudrate, self.__timeout, self.__byteorder, self.__wordorder, self.__lockwait, self.__unit))
-        self.__pid = os.getpid()
-        # Locking system initalization using fasteners library
-        self.__lock_file = 'aquarea.lock'
-        if platform.system() == 'Linux':
-            self.__lock_path = '/run/lock/' + self.__lock_file
+        # Bus I/O retry policy: a RetryPolicy, a number of retries or None for the default one
+        self.__retry = RetryPolicy.from_retry(retry)
+        self.__retry_stats = {"attempts": 0, "backoff": 0.0, "failures": 0}
+        # Polls of a device that keeps failing are skipped for a while
+        self.__breaker = breaker if breaker is not None else CircuitBreaker()
+        # Trace mode keeps the last trace raw reads and writes instead of logging them
+        self.__trace = deque(maxlen=trace) if trace else None
+        # Opt-in ring buffer of the last history frames (or a FrameHistory to share)
+        if isinstance(history, FrameHistory):
+            self.__history = history
         else:
-            self.__lock_path = tempfile.gettempdir() + '/' + self.__lock_file
-        if not os.path.exists(self.__lock_path):
-            with open(self.__lock_path, 'w') as f:
-                f.close()
-        self.__flock = fasteners.InterProcessReaderWriterLock(self.__lock_path, logger=log)
-        fasteners._utils.BLATHER = log.getEffectiveLevel()
-
-    def connect(self):
-        self.__client = ModbusClient(method='rtu', port=self.__port, stopbits=self.__stopbits, bytesize=self.__bytesize, 
-                                            parity=self.__parity, baudrate=self.__baudrate, timeout=self.__timeout, writeTimeout=self.__write_timeout,
-                                            unit=self.__slave)
-        with self.__flock.write_lock():
-            num_retry = 0
-            while (not self.__is_connected and num_retry <= 5):
-                try:
-                    num_retry += 1
-                    self.__is_connected = self.__client.connect()
-                except OSError:
-                    log.error("Error connecting {num_retry}")
-                    time.sleep(5)
-
-
-    def close(self):
-        with self.__flock.write_lock():
-            self.__client.close()
-        self.__is_connected = False
+            self.__history = FrameHistory(DECODE_PLAN, history, unit, byteorder) if history else None
 
     @property
     def version(self):
@@ -309,216 +514,77 @@ class AquareaModbus:
         return self.__mq.qsize()
 
     @property
-    def is_connected(self) -> bool:
-        return self.__is_connected
+    def byteorder(self):
+        return self.__byteorder
 
-    # 3.2.1 General System Control ****************************************************************************
     @property
-    def system(self):
-        """ [System On/Off] 0: Off 1: On [0-R/W] """
-        return self.__get_int_value("system")
-
-    @system.setter
-    def system(self, value):
-        self.__set_gen_mode("system", value)
+    def unit(self):
+        return self.__unit
 
     @property
-    def otudoor_temp(self):
-        """ [Outdoor Temperature] -127°C to 127°C (x1 or x10 values) [1-R] """
-        return self.__get_temp_value("otudoor_temp")
+    def changes(self) -> dict:
+        """ {name: value} of the registers whose raw word changed with the last poll """
+        return self.__changes
 
     @property
-    def water_out_temp(self):
-        """ [Outgoing Water Temperature] 0°C to 127°C (x1 or x10 values) [2-R] """
-        return self.__get_temp_value("water_out_temp")
+    def read_gap(self) -> int:
+        return self.__read_gap
 
     @property
-    def water_in_temp(self):
-        """ [Ingoing Water Temperature] 0°C to 127°C (x1 or x10 values) [3-R] """
-        return self.__get_temp_value("water_in_temp")
+    def multi_write(self) -> bool:
+        """ True when adjacent registers are written with write_multiple_registers (FC16) """
+        return self.__multi_write
 
     @property
-    def mode(self):
-        """ [Operating mode] 0: None 4, 1: Heat, 2: Heat/Tank, 3: Tank, 4: Cool/Tank, 5: Cool [4-R/W] """
-        return self.__get_int_value("mode")
-
-    @mode.setter
-    def mode(self, value):
-        self.__set_gen_mode("mode", value)
+    def lazy(self) -> bool:
+        return self.__lazy
 
-    # 3.2.2 Climate Configuration ****************************************************************************
     @property
-    def config_mode(self):
-        """ [Climate Operating mode] 0: Off, 1: Heat, 2: Cool [10-R] """
-        return self.__get_int_value("config_mode")
+    def retry(self) -> RetryPolicy:
+        return self.__retry
 
     @property
-    def working(self):
-        """ [Working Mode] 0: Normal, 1: Eco, 2: Powerful [11-R/W] """
-        return self.__get_int_value("working")
-
-    @working.setter
-    def working(self, value):
-        self.__set_gen_mode("working", value)
+    def trace(self) -> list:
+        """ TraceRecords of the last raw reads and writes, oldest first (empty unless trace mode is on) """
+        return list(self.__trace) if self.__trace is not None else []
 
     @property
-    def heat_low_outdoor_set_temperature(self):
-        """ [Outdoor Temp for Heating at Low Water Temp] -15°C to 15°C [12-R/W] """
-        return self.__get_temp_value("heat_low_outdoor_set_temperature")
-
-    @heat_low_outdoor_set_temperature.setter
-    def heat_low_outdoor_set_temperature(self, value):
-        self.__set_in_range_value("heat_low_outdoor_set_temperature", value)
+    def breaker(self) -> CircuitBreaker:
+        return self.__breaker
 
     @property
-    def heat_high_outdoor_set_temperature(self):
-        """ [Outdoor Temp for Heating at High Water Temp] -15°C to 15°C [13-R/W] """
-        return self.__get_temp_value("heat_high_outdoor_set_temperature")
-
-    @heat_high_outdoor_set_temperature.setter
-    def heat_high_outdoor_set_temperature(self, value):
-        self.__set_in_range_value("heat_high_outdoor_set_temperature", value)
+    def history(self) -> FrameHistory:
+        """ FrameHistory of the polled frames, None unless history is on """
+        return self.__history
 
     @property
-    def heat_low_water_set_temperature(self):
-        """ [Water Setpoint for Heating at Low Outdoor Temp] 25°C to 55°C [14-R/W] """
-        return self.__get_temp_value("heat_low_water_set_temperature")
-
-    @heat_low_water_set_temperature.setter
-    def heat_low_water_set_temperature(self, value):
-        self.__set_in_range_value("heat_low_water_set_temperature", value)
+    def retry_stats(self) -> dict:
+        """ Attempts, seconds of backoff and given up operations of the last connect, poll or send """
+        return dict(self.__retry_stats)
 
     @property
-    def heat_high_water_set_temperature(self):
-        """ [Water Setpoint for Heating at High Outdoor Temp] 25°C to 55°C [15-R/W] """
-        return self.__get_temp_value("heat_high_water_set_temperature")
+    def snapshot(self) -> AquareaSnapshot:
+        """ Last polled AquareaSnapshot, None before the first poll """
+        return self.__snapshot
 
-    @heat_high_water_set_temperature.setter
-    def heat_high_water_set_temperature(self, value):
-        self.__set_in_range_value("heat_high_water_set_temperature", value)
+    @staticmethod
+    def _getter(index):
+        """ Property getter of the plan entry at index: its mapped value in the current snapshot """
+        def get(self):
+            snapshot = self.__snapshot
+            return snapshot.at(index) if snapshot is not None else None
+        return get
 
-    @property
-    def water_thermo_shift(self):
-        """ [Water Current Thermoshift] -5°C to 5°C [16-R/W] """
-        return self.__get_temp_value("water_thermo_shift")
-
-    @water_thermo_shift.setter
-    def water_thermo_shift(self, value):
-        self.__set_in_range_value("water_thermo_shift", value)
-
-    @property
-    def heat_temperature_max(self):
-        """ [Outdoor Temp for Heating off (Max)] 5°C to 35°C (x1 or x10 values) [17-R/W] """
-        return self.__get_temp_value("heat_temperature_max")
-
-    @heat_temperature_max.setter
-    def heat_temperature_max(self, value):
-        self.__set_in_range_value("heat_temperature_max", value)
-
-    @property
-    def heater_setpoint_temp(self):
-        """ [Outdoor Temp for Heater On] -15°C to 20°C (x1 or x10 values) [20-R/W] """
-        return self.__get_temp_value("heater_setpoint_temp")
-
-    @heater_setpoint_temp.setter
-    def heater_setpoint_temp(self, value):
-        self.__set_in_range_value("heater_setpoint_temp", value)
-
-    @property
-    def cool_setpoint_temp(self):
-        """ [Cooling Setpoint Temperature] 5°C to 20°C (x1 or x10 values) [23-R/W] """
-        return self.__get_temp_value("cool_setpoint_temp")
-
-    @cool_setpoint_temp.setter
-    def cool_setpoint_temp(self, value):
-        self.__set_in_range_value("cool_setpoint_temp", value)
-
-    @property
-    def heat_setpoint_temp(self):
-        """ [Heating Setpoint Temperature] 20°C to 70°C (x1 or x10 values) [24-R] """
-        return self.__get_temp_value("heat_setpoint_temp")
-
-    # 3.2.3 Tank Configuration ****************************************************************************
-    @property
-    def tank_mode(self):
-        """ [Tank On/Off] 0: Off, 1: On [30-R] """
-        return self.__get_temp_value("tank_mode")
-
-    @property
-    def tank_working(self):
-        """ [Tank Working Mode] 0: Normal, 1: Eco, 2: Powerful [31-R/W] """
-        return self.__get_temp_value("tank_working")
-
-    @tank_working.setter
-    def tank_working(self, value):
-        self.__set_gen_mode("tank_working", value)
-
-    @property
-    def tank_water_temp(self):
-        """ [Water Temp] 0°C to 127°C (x1 or x10 values) [32-R] """
-        return self.__get_temp_value("tank_water_temp")
-
-    @property
-    def tank_setpoint_temp(self):
-        """ [Water Setpoint Temp] 40°C to 75°C (x1 or x10 values) [33-R/W] """
-        return self.__get_temp_value("tank_setpoint_temp")
-
-    @tank_setpoint_temp.setter
-    def tank_setpoint_temp(self, value):
-        self.__set_in_range_value("tank_setpoint_temp", value)
-
-    @property
-    def heat_interval(self):
-        """ [Heat-up Interval] 5 to 95 Min [34-R/W] """
-        return self.__get_int_value("heat_interval")
-
-    @property
-    def operation_interval(self):
-        """ [Operation Interval] 1 to 20, (1=30Min, 2=1h, 3:1h 30min, 20=10h) [35-R/W] """
-        return self.__get_int_value("operation_interval")
-
-    @property
-    def booster_delay(self):
-        """ [Booster Delay Time] 20 to 95 Min [36-R/W] """
-        return self.__get_int_value("booster_delay")
-
-    @property
-    def tank_ster_temp(self):
-        """ [Sterilization Boiling Temp] 40°C to 75°C (x1 or x10 values) [38-R/W] """
-        return self.__get_temp_value("tank_ster_temp")
-
-    # 3.2.4 Consumption ****************************************************************************
-    @property
-    def heat_wh(self):
-        """ [Heat mode consumption] 0 to 65535 Wh [47-R] """
-        return self.__get_temp_value("heat_wh")
-
-    @property
-    def cool_wh(self):
-        """ [Cool mode consumption] 0 to 65535 Wh [48-R] """
-        return self.__get_temp_value("cool_wh")
-
-    @property
-    def tank_wh(self):
-        """ [Tank mode consumption] 0 to 65535 Wh [49-R] """
-        return self.__get_temp_value("tank_wh")
-
-    # 3.2.5 Maintenance ****************************************************************************
-    @property
-    def error(self):
-        """ [Error Code from Indoor Unit] [52-R] """
-        error_code = self.__get_int_value("error")
-        remote_code = ERROR_MAP[error_code]["code"]
-        error_desc = ERROR_MAP[error_code]["desc"]
-        return ("%s: %s" % (remote_code, error_desc))
-
-    @property
-    def error_history(self):
-        """ [Error History Code from Indoor Unit] [53-R] """
-        error_code = self.__get_int_value("error_history")
-        remote_code = ERROR_MAP[error_code]["code"]
-        error_desc = ERROR_MAP[error_code]["desc"]
-        return ("%s: %s" % (remote_code, error_desc))
+    @staticmethod
+    def _setter(name):
+        """ Property setter of command name, validated against its range or values """
+        if "min" in COMMAND_MAP[name]:
+            def set(self, value):
+                self.__set_in_range_value(name, value)
+        else:
+            def set(self, value):
+                self.__set_gen_mode(name, value)
+        return set
 
     def error_reset_1(self, value):
         self.__set_gen_mode("error_reset_1", value)
@@ -526,482 +592,175 @@ class AquareaModbus:
     def error_reset_2(self, value):
         self.__set_gen_mode("error_reset_2", value)
 
-    @property
-    def tank_warn(self):
-        """ [Warning Tank Temp. Status] 0: off, 1: On [56-R] """
-        return self.__get_int_value("tank_warn")
-
-    @property
-    def defrost(self):
-        """ [Defrost Status] 0: off, 1: On [57-R] """
-        return self.__get_int_value("defrost")
-
-    @property
-    def solar(self):
-        """ [Solar Status] 0: off, 1: On [58-R] """
-        return self.__get_int_value("solar")
-
-    @property
-    def booster(self):
-        """ [Booster Status] 0: off, 1: On [59-R] """
-        return self.__get_int_value("booster")
-
-    @property
-    def compressor(self):
-        """ [Compressor Frequency] 0 to 255 Hz [60-R] """
-        return self.__get_int_value("compressor")
-
-    @property
-    def compressor_hour(self):
-        """ [Compressor Operating Hours] 0 to 65535 h [61-R/W] """
-        return self.__get_int_value("compressor_hour")
-
-    @property
-    def pump_down(self):
-        """ [Pump Down] 0:Off, 1: On [62-R] """
-        return self.__get_int_value("pump_down")
-
-    @property
-    def force_mode(self):
-        """ [Force Mode < 5sec] 0:Off, 1: On [63-R/W] """
-        return self.__get_int_value("force_mode")
-
-    @property
-    def service(self):
-        """ [Service SW Code] 0x00: Normal, 0x01: Service pumpdown, 0x02: Service pump [65-R/W] """
-        return self.__get_int_value("service")
-
-    @property
-    def quiet(self):
-        """ [Quiet Mode] 0:Off, 1: On [66-R/W] """
-        return self.__get_int_value("quiet")
-
-    @quiet.setter
-    def quiet(self, value):
-        self.__set_gen_mode("quiet", value)
-
-    @property
-    def heater_when_heat(self):
-        """ [Heater When Heat] 0:Off, 1: On [67-R/W] """
-        return self.__get_int_value("heater_when_heat")
-
-    @property
-    def heater_status(self):
-        """ [Heater Status] 0:Off, 1: On [68-R] """
-        return self.__get_int_value("heater_status")
-
-    @property
-    def heater_mode(self):
-        """ [Heater Mode] 0:Off, 1: On [69-R] """
-        return self.__get_int_value("heater_mode")
-
-    @property
-    def alarm_status(self):
-        """ [Heater Mode] 0: No alarm, 1: Alarm [70-R] """
-        return self.__get_int_value("alarm_status")
-
-    @property
-    def dry_concrete_temp(self):
-        """ [Dry Concrete Temperature] 25°C to 65°C (x1 or x10 values) [71-R] """
-        return self.__get_temp_value("dry_concrete_temp")
-
-    @property
-    def air_purge(self):
-        """ [Air Purge] 0:Off, 1: On [72-R/W] """
-        return self.__get_int_value("air_purge")
-
-    @property
-    def pump_speed(self):
-        """ [Pump Speed] 1 to 7 [73-R/W] """
-        return self.__get_int_value("pump_speed")
-
-    @property
-    def erp_operation(self):
-        """ [ERP Operation] 0: Normal, 1 to 80 [74-R/W] """
-        return self.__get_int_value("erp_operation")
-
-    @property
-    def erp_param(self):
-        """ [ERP PArameters] 0: Hz, 1: Td, 2: FM, 3: I1 [75-R] """
-        return self.__get_int_value("erp_param")
-
-    @property
-    def erp_data(self):
-        """ [ERP Data] 0: Normal, 1 to 80 [76-R] """
-        return self.__get_int_value("erp_data")
-
-    @property
-    def slow_fast_test(self):
-        """ [Slow/Fast test] 0: Normal, 1: Slow Time, 2: Fast Time, 3: Slow Day, 4: Fast Day [77-R] """
-        return self.__get_int_value("slow_fast_test")
-
-    # 3.2.6 Unit Configuration ****************************************************************************
-    @property
-    def room_thermostat(self):
-        """ [Room Thermostat] 0x55: Off, 0xAA: On [80-R] """
-        return self.__get_int_value("room_thermostat")
-
-    @property
-    def tank_connection(self):
-        """ [Tank Connection] 0x55: Off, 0xAA: On [81-R] """
-        return self.__get_int_value("tank_connection")
-
-    @property
-    def solar_priority(self):
-        """ [Solar Priority] 0x55: Off, 0xAA: On [82-R] """
-        return self.__get_int_value("solar_priority")
-
-    @property
-    def heating_priority(self):
-        """ [Heating Priority] 0x55: Off, 0xAA: On [83-R] """
-        return self.__get_int_value("heating_priority")
-
-    @property
-    def cooling_priority(self):
-        """ [Cooling Priority] 0x55: Off, 0xAA: On [84-R] """
-        return self.__get_int_value("cooling_priority")
-
-    @property
-    def sterilization(self):
-        """ [Sterilization] 0x55: Off, 0xAA: On [85-R] """
-        return self.__get_int_value("sterilization")
-
-    @property
-    def base_pan_heater(self):
-        """ [Base Pan Heater] 0x55: Off, 0xAA: On [86-R] """
-        return self.__get_int_value("base_pan_heater")
-
-    @property
-    def anti_freezing(self):
-        """ [Anti Freezing] 0x55: Off, 0xAA: On [87-R] """
-        return self.__get_int_value("anti_freezing")
-
-    @property
-    def booster_heater(self):
-        """ [Booster Heater] 0x55: Off, 0xAA: On [88-R] """
-        return self.__get_int_value("booster_heater")
-
-    @property
-    def cool_mode_selection(self):
-        """ [Cool Mode Selection] 0x55: Off, 0xAA: On [89-R] """
-        return self.__get_int_value("cool_mode_selection")
-
-    @property
-    def base_pan_heater_selection(self):
-        """ [Base Pan Heater Selection] 0x55: Off, 0xAA: On [90-R] """
-        return self.__get_int_value("base_pan_heater_selection")
-
-    # 3.2.7 System Configuration ****************************************************************************
-    @property
-    def thermoshift_heat_eco(self):
-        """ [Decrease Climate Preset Heat Thermoshift (ECO)] 0°C to 5°C (x1 or x10 values) [1000-R/W] """
-        return self.__get_temp_value("thermoshift_heat_eco")
-
-    @thermoshift_heat_eco.setter
-    def thermoshift_heat_eco(self, value):
-        self.__set_in_range_value("thermoshift_heat_eco", value)
-
-    @property
-    def thermoshift_heat_powerful(self):
-        """ [Increase Climate Preset Heat Thermoshift (POWERFUL)] 0°C to 5°C (x1 or x10 values) [1001-R/W] """
-        return self.__get_temp_value("thermoshift_heat_powerful")
-
-    @thermoshift_heat_powerful.setter
-    def thermoshift_heat_powerful(self, value):
-        self.__set_in_range_value("thermoshift_heat_powerful", value)
-
-    @property
-    def thermoshift_cool_eco(self):
-        """ [Decrease Climate Preset Cool Thermoshift (ECO)] 0°C to 5°C (x1 or x10 values) [1002-R/W] """
-        return self.__get_temp_value("thermoshift_cool_eco")
-
-    @thermoshift_cool_eco.setter
-    def thermoshift_cool_eco(self, value):
-        self.__set_in_range_value("thermoshift_cool_eco", value)
-
-    @property
-    def thermoshift_cool_powerful(self):
-        """ [Increase Climate Preset Cool Thermoshift (POWERFUL)] 0°C to 5°C (x1 or x10 values) [1003-R/W] """
-        return self.__get_temp_value("thermoshift_cool_powerful")
-    
-    @thermoshift_cool_powerful.setter
-    def thermoshift_cool_powerful(self, value):
-        self.__set_in_range_value("thermoshift_cool_powerful", value)
-
-    @property
-    def thermoshift_tank_eco(self):
-        """ [Decrease Climate Preset Tank Thermoshift (ECO)] 0°C to 10°C (x1 or x10 values) [1004-R/W] """
-        return self.__get_temp_value("thermoshift_tank_eco")
-
-    @thermoshift_tank_eco.setter
-    def thermoshift_tank_eco(self, value):
-        self.__set_in_range_value("thermoshift_tank_eco", value)
-
-    @property
-    def thermoshift_tank_powerful(self):
-        """ [Increase Climate Preset Tank Thermoshift (POWERFUL)] 0°C to 10°C (x1 or x10 values) [1005-R/W] """
-        return self.__get_temp_value("thermoshift_tank_powerful")
-
-    @thermoshift_tank_powerful.setter
-    def thermoshift_tank_powerful(self, value):
-        self.__set_in_range_value("thermoshift_tank_powerful", value)
-
-    @property
-    def sync(self):
-        """ [Trigger Synchronization] 1: Trigger [1006-R/W] """
-        return self.__get_int_value("sync")
-
-    @property
-    def led(self):
-        """ [LED Flashing enablement] 0: Disabled, 1: Enabled [1007-R/W] """
-        return self.__get_int_value("led")
-
-
-    def poll_data(self):
-        """ Read data from Modbus and pull into internal variables """
-        if self.__is_connected:
-            with self.__flock.write_lock():
-                rr = self.__client.read_holding_registers(address=0, count=91, unit=self.__slave)
-                if not rr.isError():
-                    log.debug("registers < 1000 = %s" % rr.registers)
-
-                    for reg in INTESISBOX_MAP:
-                        if reg < 1000 and (INTESISBOX_MAP[reg]["access"] & READ):
-                            self.__get_device_value(rr, reg)
-
-                    rr = self.__client.read_holding_registers(address=1000, count=8, unit=self.__slave)
-                    if not rr.isError():
-                        log.debug("registers >= 1000 = %s" % rr.registers)
-                        for reg in INTESISBOX_MAP:
-                            if reg >= 1000 and (INTESISBOX_MAP[reg]["access"] & READ):
-                                self.__get_device_value(rr, reg, offset=1000)
-                        log.debug("_data = %s" % self.__data)
-                else:
-                    # handle error, log?
-                    log.error(f"Modbus Error: {rr}")
-                    sys.exit(1)
+    def read_plan(self, names=None, max_gap=None):
+        """ Return the (block, address, count) reads needed to poll names """
+        if names is None:
+            return [(block, block.address, block.count) for block in DECODE_PLAN.blocks]
+        if max_gap is None:
+            max_gap = self.__read_gap
+        return DECODE_PLAN.read_ranges(resolve_registers(names), max_gap)
+
+    def on_change(self, name_or_group, callback):
+        """ Call callback(name, value, old_value) when a register changes
+
+        name_or_group: register name, REGISTER_GROUPS key, list of them or None for every register
+        """
+        if name_or_group is None:
+            regs = [None]
+        else:
+            regs = resolve_registers(name_or_group)
+        for reg in regs:
+            self.__callbacks.setdefault(reg, []).append(callback)
 
     def get_item_value(self, name, value):
         """ Get numeric value from name and string value """
-        data = None
         res = None
-        if name in self.__data:
-            data = self.__data.get(name+".value")
-            log.debug(f"data = {data}")
-            res = data
-            log.debug(f"{name}.{value} = {res}")
+        if self.__snapshot is not None and name in self.__snapshot:
+            res = self.__snapshot.value(name)
+            log.debug("%s.%s = %s", name, value, res)
         else:
-            log.debug(f"No data for {name},{value}")
+            log.debug("No data for %s,%s", name, value)
         return res
 
     def get_all_valid_values(self):
-        result = {}
-        for name in self.__data:
-            if name != None and not ("." in name) and self.__data[name] != None:
-                DATA = {}
-                DATA["value"] = self.__data[name]
-                DATA["desc"] = INTESISBOX_MAP[self.__data[name+".reg"]]["desc"]
-                log.debug("DATA = ")
-                log.debug(DATA)
-                result[name] = DATA
-        return result
+        if self.__snapshot is None:
+            return {}
+        return self.__snapshot.valid_values()
 
     def set_value(self, name, value):
         """Set the generic value by name"""
         if name in COMMAND_MAP:
             reg = COMMAND_MAP[name]["reg"]
-            log.debug(f"set_value({name}, {value}) -> reg = {reg}")
             has_range = bool("min" in COMMAND_MAP[name])
             has_values  = bool("values" in COMMAND_MAP[name])
-            log.debug(f"has_range = {has_range}, has_values = {has_values}")
+            log.debug("set_value(%s, %s) -> reg = %s, has_range = %s, has_values = %s", name, value, reg, has_range, has_values)
+            # Every command generated from REGISTERS has either a range or values
             if has_range:
                 self.__set_in_range_value(name, value)
-            elif has_values:
-                self.__set_gen_mode(name, value)
             else:
-                self._set_value(name, value)
+                self.__set_gen_mode(name, value)
         else:
             raise ValueError(f"Unkown comman={name}, value={value}")
 
-    def send_cmd(self):
-        """ Send message Queue to Modbus device """
-        """ TODO: retry until commands are all sent in case of exception """
-        if self.__is_connected:
-            with self.__flock.write_lock():
-                idx = 0
-                builder = BinaryPayloadBuilder(byteorder=self.__byteorder, wordorder=self.__wordorder)
-                while (self.__mq.qsize() != 0):
-                    REG = self.__mq.get()
-                    idx += 1
-                    reg = REG["reg"]
-                    value = REG["value"]
-                    finished = False
-                    loop = 1
-                    while not finished:
-                        builder.reset()
-                        builder.add_16bit_int(REG["value"])
-                        payload = builder.to_registers()
-                        log.debug(f"{idx}. Sending reg = {reg}, value = {value} on loop {loop}. payload = {payload[0]}")
-                        rq = self.__client.write_register(address=reg, value=payload[0], unit=self.__slave)
-                        if rq.isError():
-                            finished = False
-                            loop += 1
-                            log.error(f"Cannot send address={reg}, value={value}, unit={self.__slave}. Retrying {loop}")
-                            time.sleep(5)
-                        else:
-                            finished = True
-            log.info("No more commnad to send")
-
     ''' ------------------------------------------------------------------------------------------------------------
-    Private methods 
+    Transport helpers
     ------------------------------------------------------------------------------------------------------------ '''
 
-    def __get_device_value(self, instance, reg, offset=0):
-        """Internal method to load single register value"""
-        log.debug("reg = %d" % reg)
-        uid = reg - offset
-        if reg in INTESISBOX_MAP:
-            log.debug("INTESISBOX_MAP[%d] = %s" % (reg, INTESISBOX_MAP[reg]))
-            # If the value is null (32768), set as None
-            value = self.__get_data(instance, uid, 1)
-            log.debug("HEX value[%d] = 0x%x" % (reg, value))
-            log.debug(f"INTESISBOX_MAP[{reg}] = {INTESISBOX_MAP[reg]}")
-            MAP    = INTESISBOX_MAP[reg]
-            # Mapped value
-            NAME   = MAP["name"]
-            # Numeric value
-            VALUE  = NAME+".value"
-            # Original mapped value
-            MVALUE = NAME+".mvalue"
-            # Original value
-            OVALUE = NAME+".ovalue"
-            #log.debug(f"MAP({reg}) = {MAP}")
-            REG = NAME+".reg"
-            
-            if value == INTESIS_NULL:
-                self.__data[NAME]   = None
-                self.__data[VALUE]  = None
-                self.__data[OVALUE] = None
-                self.__data[MVALUE] = None
-                self.__data[REG] = reg
-                log.debug("NULL value[%d]" % reg)
-            else:
-                if MAP["type"] == "int":
-                    value = self.__get_int(instance, uid, 1)
-                    log.debug("int value[%d] = %d" % (reg, value))
-                elif MAP["type"] == "temp":
-                    value = self.__get_temp(instance, uid, 1)
-                    log.debug("temp value[%d] = %.1f" % (reg, value))
-                elif MAP["type"] == "min":
-                    value = self.__get_interval(self.__get_int(instance, uid, 1))
-                    log.debug("min value[%d] = %d" % (reg, value))
-                elif MAP["type"] == "err":
-                    log.debug("err value[%d] = %d" % (reg, value))
-                    int_value = self.__get_int(instance, uid, 1)
-                    log.debug("int value[%d] = %d" % (reg, int_value))
-                    if (int_value in ERROR_MAP):
-                        code = ERROR_MAP[int_value]["code"]
-                        desc = ERROR_MAP[int_value]["desc"]
-                    else:
-                        code = "0"
-                        desc = "Unknown " + str(int_value)
-                    value = code + ": " + desc
-                    log.debug("err value[%d] = %s" % (reg, value))
-                else:
-                    value = self.__get_int(instance, reg, 1)
-                    log.debug("unknown value[%d] = %d" % (reg, value))
-                
-                log.debug("VALUE = %s, OVALUE = %s, REG = %s, reg = %s, value = %s" % (str(VALUE), str(OVALUE), str(REG), str(reg), str(value)))
-                self.__data[VALUE] = value
-                self.__data[OVALUE] = value
-                self.__data[REG] = reg
-
-                # Translate known regs to configuration item names
-                value_map = MAP.get("values")
-                if value_map:
-                    mvalue = value_map.get(value, value)
-                    log.debug("value_map value[%d] = %s" % (reg, mvalue))
-                    self.__data[NAME] = mvalue
-                    self.__data[MVALUE] = mvalue
-                else:
-                    self.__data[NAME] = value
-                    self.__data[MVALUE] = value
-                    log.debug("generic value[%d] = %s" % (reg, value))
-            log.debug("_data[%d] = {name=%s, name.mvalue=%s, name.value=%s, name.ovalue=%s}" % 
-                (reg, self.__data[NAME], self.__data[MVALUE], self.__data[VALUE], self.__data[OVALUE]))
-        else:
-            # Log unknown UIDs
-            self.__data[f"unknown_reg_{reg}"] = None
-            self.__data[f"unknown_reg_{reg}"+".value"] = None
-            self.__data[f"unknown_reg_{reg}"+".reg"] = reg
-
-    def __get_temp(self, instance, start, count) -> float:
-        """Internal method to get temperature value from registers"""
-        if not instance.isError():
-            decoder = BinaryPayloadDecoder.fromRegisters(
-                instance.registers[start:(start+count)],
-                byteorder=self.__byteorder, wordorder=self.__wordorder
-            )   
-            return float(decoder.decode_16bit_int() / self.__unit)
-        else:
-            return INTESIS_NULL
-
-    def __get_int(self, instance, start, count) -> int:
-        """Internal method to get 16 bit signed integer value from registers"""
-        if not instance.isError():
-            decoder = BinaryPayloadDecoder.fromRegisters(
-                instance.registers[start:(start+count)],
-                byteorder=self.__byteorder, wordorder=self.__wordorder
-            )
-            value = decoder.decode_16bit_int()
-            log.debug(f"__get_int(start={start},count={count}) = {value}")
-            return value
+    def _new_frame(self):
+        """ Frame to read into: the words of the last snapshot, or nulls before the first poll """
+        snapshot = self.__snapshot
+        if snapshot is None:
+            self.__stamps = array("d", [0.0]) * DECODE_PLAN.frame_size
+            return DECODE_PLAN.null_frame()
+        if snapshot.stamps is not None:
+            self.__stamps = snapshot.stamps[:]
         else:
-            return INTESIS_NULL
-
-    def __get_data(self, instance, start, count):
-        """Internal method to get value from registers"""
-        if not instance.isError():
-            decoder = BinaryPayloadDecoder.fromRegisters(
-                instance.registers[start:(start+count)],
-                byteorder=self.__byteorder, wordorder=self.__wordorder
-            )
-            value = decoder.decode_16bit_uint()
-            return value
-        else:
-            return INTESIS_NULL
-
-    def __get_interval(self, value):
-        """Internal method to get calculate minute intervals"""
-        return value * 30
-
-    def __get_gen_value(self, name) -> str:
-        """Internal method for getting generic value"""
-        value = None
-        if name in self.__data:
-            value = self.__data.get(name)
-            log.debug(f"{name} = {value}")
-        else:
-            log.debug(f"No value for {name}")
-        return value
-
-    def __get_int_value(self, name) -> int:
-        """Internal method for getting int value"""
-        value = self.__get_gen_value(name)
-        if (isinstance(value, int)):
-            int_val = int(value)
-            return int_val
-        else:
-            return value
-
-    def __get_temp_value(self, name) -> float:
-        """Internal method for getting float value"""
-        value = self.__get_gen_value(name)
-        if (isinstance(value, float)):
-            float_val = float(value)
-            return float_val
+            self.__stamps = array("d", [snapshot.timestamp]) * DECODE_PLAN.frame_size
+        return snapshot.raw[:]
+
+    def _store(self, frame, block, address, registers, now=None):
+        """ Copy the registers read from address into frame, stamped with now """
+        start = block.base + address - block.address
+        count = len(registers)
+        words = array("H", registers)
+        frame[start:start + count] = words
+        if now is None:
+            now = time.time()
+        self.__stamps[start:start + count] = array("d", [now]) * count
+        if self.__trace is not None:
+            self.__trace.append(TraceRecord(now, "read", address, words))
+
+    def _trace_write(self, address, words):
+        """ Record written words in trace mode """
+        if self.__trace is not None:
+            self.__trace.append(TraceRecord(time.time(), "write", address, array("H", words)))
+
+    def _commit(self, frame, timestamp=None, stamps=None, history=True):
+        """ Publish frame (filled since the last _new_frame) as the new snapshot
+
+        history False keeps it out of the history (write read-backs)
+        """
+        if stamps is None:
+            stamps = self.__stamps
+        snapshot = AquareaSnapshot(DECODE_PLAN, frame, self.__unit, self.__byteorder, timestamp=timestamp, lazy=self.__lazy, stamps=stamps)
+        if history and self.__history is not None:
+            self.__history.append_snapshot(snapshot)
+        self.__set_snapshot(snapshot)
+        log.debug("snapshot = %s", self.__snapshot)
+
+    def _poll_result(self, blocks, timestamp):
+        """ PollResult of the BlockResults of a poll, accounted to the circuit breaker """
+        stale = tuple(entry.name for result in blocks if not result.ok for entry in DECODE_PLAN.block_of[result.address].entries
+                        if result.address <= entry.reg < result.address + result.count)
+        ok = all(result.ok for result in blocks)
+        if any(result.ok for result in blocks) or not blocks:
+            self.__breaker.success()
         else:
-            return value
+            self.__breaker.failure()
+        return PollResult(ok, timestamp, tuple(blocks), None, stale)
+
+    def _skipped_poll(self, reason, names=None):
+        """ PollResult of a poll that did not reach the bus """
+        log.debug("Poll skipped: %s", reason)
+        stale = tuple(DECODE_PLAN.by_reg[reg].name for reg in (resolve_registers(names) if names is not None else DECODE_PLAN.by_reg))
+        return PollResult(False, time.time(), (), reason, stale)
+
+    def _enqueue(self, reg, svalue):
+        """ Add an already scaled register value to the message queue """
+        # Add svalue in FIFO
+        REG = {"reg": reg, "value": svalue}
+        self.__mq.put(REG)
+        log.debug("Message Queue item: %s", REG)
+
+    def _take_writes(self):
+        """ Drain the message queue. Return [(address, values, words)] runs keeping the last value per register """
+        writes = {}
+        while (self.__mq.qsize() != 0):
+            REG = self.__mq.get()
+            writes[REG["reg"]] = REG["value"]
+        return [(address, values, encode_words(values, self.__byteorder)) for address, values in write_runs(writes)]
+
+    def _retry_policy(self, retry=None):
+        """ Per-call retry override, the policy of the instance when None """
+        return RetryPolicy.from_retry(retry, self.__retry)
+
+    def _reset_retry_stats(self):
+        self.__retry_stats = {"attempts": 0, "backoff": 0.0, "failures": 0}
+
+    def _account(self, result):
+        """ Add a RetryResult to the retry stats of the current call. Return result """
+        stats = self.__retry_stats
+        stats["attempts"] += result.attempts
+        stats["backoff"] += result.backoff
+        if not result.ok:
+            stats["failures"] += 1
+        return result
+
+    def _disable_multi_write(self):
+        log.warning("Device %s does not support write_multiple_registers, using write_register", self.__slave)
+        self.__multi_write = False
+
+    ''' ------------------------------------------------------------------------------------------------------------
+    Private methods 
+    ------------------------------------------------------------------------------------------------------------ '''
+
+    def __set_snapshot(self, snapshot):
+        """Internal method to replace the snapshot computing the changes at raw word level"""
+        previous = self.__snapshot
+        self.__snapshot = snapshot
+        changed = snapshot.diff(previous)
+        self.__changes = {entry.name: snapshot[entry.name] for entry in changed}
+        if self.__callbacks:
+            every = self.__callbacks.get(None, [])
+            for entry in changed:
+                callbacks = self.__callbacks.get(entry.reg)
+                if callbacks or every:
+                    old = previous[entry.name] if previous is not None else None
+                    for callback in (callbacks or []) + every:
+                        try:
+                            callback(entry.name, self.__changes[entry.name], old)
+                        except Exception:
+                            log.exception("Change callback for %s failed", entry.name)
 
     def __set_value(self, reg, value):
         """Internal method to send a register value"""
@@ -1014,19 +773,15 @@ class AquareaModbus:
             svalue = value * 30
         else:
             svalue = value
-        log.debug(f"reg = {reg}, value = {value}, svalue = {svalue}")
-        # Add svalue in FIFO
-        REG = {"reg": reg, "value": svalue}
-        self.__mq.put(REG)
-        log.debug("Message Queue item:")
-        log.debug(REG)
+        log.debug("reg = %s, value = %s, svalue = %s", reg, value, svalue)
+        self._enqueue(reg, svalue)
 
     def __set_gen_mode(self, name, mode):
         """Internal method for setting the generic mode (type in {operating_mode, climate_working_mode, tank, etc.}) with a string value"""
         if mode in COMMAND_MAP[name]["values"]:
             reg = COMMAND_MAP[name]["reg"]
             value = COMMAND_MAP[name]["values"][mode]
-            log.debug(f"reg = {reg}, mode = {mode}, value = {value}")
+            log.debug("reg = %s, mode = %s, value = %s", reg, mode, value)
             self.__set_value(reg, value)
 
     def __set_in_range_value(self, name, value):
@@ -1039,4 +794,209 @@ class AquareaModbus:
         else:
             raise ValueError(
                 f"Value for {name} has to be in range [{min_value},{max_value}]"
-            )
\ No newline at end of file
+            )
+
+
+class AquareaModbus(AquareaDevice):
+
+    def __init__(self, port='/dev/ttyUSB0', slave=1, stopbits=1, bytesize=8, parity='N', baudrate=9600, 
+                    timeout=3, write_timeout=2, byteorder=BIG, wordorder=BIG, lockwait=0, retry=None, unit=10, lazy=False, read_gap=None, multi_write=True, cached_if_busy=False, breaker=None, trace=0, history=0, client=None, lock=None):
+
+        if read_gap is None:
+            # Holes cheaper to read through than another transaction at baudrate
+            read_gap = break_even_gap(baudrate)
+        super().__init__(slave=slave, byteorder=byteorder, wordorder=wordorder, unit=unit, lazy=lazy, read_gap=read_gap, multi_write=multi_write, retry=retry, breaker=breaker, trace=trace, history=history)
+        self.__port = port
+        self.__stopbits = stopbits
+        self.__bytesize = bytesize
+        self.__parity = parity
+        self.__baudrate = baudrate
+        self.__timeout = timeout
+        self.__write_timeout = write_timeout
+        self.__is_connected = False
+        self.__lockwait = lockwait
+        self.__sport = None
+        # A pymodbus client (or a stand-in) to use instead of opening port
+        self.__client = client
+        log.debug("slave = %d, port = %s, stopbits = %d, bytesize = %d, parity = %s, baudrate = %d, timeout = %d, byteorder = %s, wordorder = %s, lockwait = %s, unit = %d", slave, self.__port, self.__stopbits, self.__bytesize, self.__parity, self.__baudrate, self.__timeout, self.byteorder, struct_order(wordorder), self.__lockwait, unit)
+        self.__pid = os.getpid()
+        self.__cached_if_busy = cached_if_busy
+        # Handles of one bus (see AquareaBus) share the client and its BusLock
+        self.__flock = lock if lock is not None else BusLock(port, lockwait)
+
+    @property
+    def port(self):
+        return self.__port
+
+    @property
+    def lock_stats(self):
+        """ Bus lock acquisitions and time spent waiting for it (see BusLock.stats) """
+        return self.__flock.stats
+
+    def connect(self, retry=None):
+        """ Open the serial port, retried as the retry policy (or the per-call retry override) says """
+        if self.__client is None:
+            self.__client = client_class()(method='rtu', port=self.__port, stopbits=self.__stopbits, bytesize=self.__bytesize, 
+                                                parity=self.__parity, baudrate=self.__baudrate, timeout=self.__timeout, writeTimeout=self.__write_timeout,
+                                                unit=self.slave)
+        self._reset_retry_stats()
+        with self.__flock:
+            result = self._account(self._retry_policy(retry).call(self.__client.connect, failed=lambda connected: not connected,
+                                                                    exceptions=retry_exceptions(), name="connect"))
+            self.__is_connected = bool(result.value)
+        return self.__is_connected
+
+    def close(self):
+        with self.__flock:
+            self.__client.close()
+        self.__is_connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self.__is_connected
+
+    def poll_data(self, names=None, max_gap=None, cached_if_busy=None, retry=None):
+        """ Read data from Modbus and pull into internal variables
+
+        names: register names and/or REGISTER_GROUPS keys to read (default all). Registers not
+        read keep their previous value. max_gap overrides the read_gap of the instance.
+        With cached_if_busy (default from the constructor) a bus held by another process is
+        not waited for: the current snapshot is kept. retry overrides the retry policy of
+        each read. A failed read leaves the following ones of the poll unattempted and the
+        registers read so far are published anyway; polls are skipped while the circuit
+        breaker is open. Return a PollResult.
+        """
+        if not self.__is_connected:
+            return self._skipped_poll("not connected", names)
+        if not self.breaker.allow():
+            return self._skipped_poll("circuit open", names)
+        try:
+            return self.__poll(names, max_gap, cached_if_busy, retry)
+        except BaseException:
+            self.breaker.abandon()
+            raise
+
+    def __poll(self, names, max_gap, cached_if_busy, retry):
+        """Internal poll_data on a circuit that let it through"""
+        if cached_if_busy is None:
+            cached_if_busy = self.__cached_if_busy
+        policy = self._retry_policy(retry)
+        self._reset_retry_stats()
+        if not self.__flock.acquire(blocking=not cached_if_busy):
+            # A half open probe that did not reach the bus is given back
+            self.breaker.abandon()
+            return self._skipped_poll("bus busy", names)
+        try:
+            # Registers that are not (or cannot be) read keep the previous words
+            frame = self._new_frame()
+            blocks = []
+            failed = False
+            for block, address, count in self.read_plan(names, max_gap):
+                if failed:
+                    blocks.append(BlockResult(address, count, False, "not attempted after a failed read", None, 0))
+                    continue
+                result = self.__read(policy, address, count)
+                rr = result.value
+                now = time.time()
+                if rr is None or rr.isError():
+                    log.error("Modbus Error: %s", rr)
+                    blocks.append(BlockResult(address, count, False, str(rr) if rr is not None else "no response", now, result.attempts))
+                    failed = True
+                    continue
+                log.debug("registers %d-%d = %s", address, address + count - 1, rr.registers)
+                self._store(frame, block, address, rr.registers, now)
+                blocks.append(BlockResult(address, count, True, None, now, result.attempts))
+            if any(result.ok for result in blocks):
+                self._commit(frame)
+        finally:
+            self.__flock.release()
+        return self._poll_result(blocks, time.time())
+
+    def send_cmd(self, verify=False, deadline=VERIFY_DEADLINE, retry=None):
+        """ Send message Queue to Modbus device
+
+        Only the last queued value of each register is sent, runs of adjacent registers
+        in a single write_multiple_registers when multi_write is enabled. Each write is
+        retried as the retry policy (or the per-call retry override) says, then given up.
+        With verify=True the written registers are read back (and merged into the snapshot)
+        until the device reports the new values or deadline seconds expire. Return
+        {name: WriteResult} in that case, None otherwise.
+        """
+        written = {}
+        policy = self._retry_policy(retry)
+        self._reset_retry_stats()
+        if self.__is_connected:
+            with self.__flock:
+                for idx, (address, values, words) in enumerate(self._take_writes(), 1):
+                    written.update(zip(range(address, address + len(words)), words))
+                    if self.multi_write and len(words) > 1:
+                        if self.__write_registers(policy, idx, address, values, words):
+                            continue
+                    for offset, (value, word) in enumerate(zip(values, words)):
+                        self.__write_register(policy, idx, address + offset, value, word)
+            log.info("No more commnad to send")
+        if verify:
+            return self.__verify(written, deadline, policy)
+
+    ''' ------------------------------------------------------------------------------------------------------------
+    Private methods 
+    ------------------------------------------------------------------------------------------------------------ '''
+
+    def __verify(self, written, deadline, policy):
+        """Internal method to read back written registers with growing intervals"""
+        verification = _Verification(written, deadline)
+        delay = verification.next_delay()
+        while delay is not None:
+            time.sleep(delay)
+            if not self.__is_connected:
+                verification.failed(0, 0, "not connected")
+                break
+            with self.__flock:
+                verification.update(self.__read_back(verification, verification.retry_policy(policy)))
+            delay = verification.next_delay()
+        return verification.report()
+
+    def __read_back(self, verification, policy):
+        """Internal method to read the pending registers into the snapshot. Return {reg: word} read"""
+        frame = self._new_frame()
+        observed = {}
+        for block, address, count in DECODE_PLAN.read_ranges(verification.pending, self.read_gap):
+            result = self.__read(policy, address, count)
+            rr = result.value
+            if not result.ok:
+                verification.failed(address, count, str(rr) if rr is not None else "no response")
+                continue
+            self._store(frame, block, address, rr.registers)
+            observed.update((reg, rr.registers[reg - address]) for reg in verification.pending if address <= reg < address + count)
+        if observed:
+            self._commit(frame, history=False)
+        return observed
+
+    def __read(self, policy, address, count):
+        """Internal method to read holding registers. Return a RetryResult"""
+        return self._account(policy.call(lambda: self.__client.read_holding_registers(address=address, count=count, unit=self.slave),
+                                            failed=lambda rr: rr.isError(), exceptions=retry_exceptions(), name="read %d-%d", name_args=(address, address + count - 1)))
+
+    def __write_register(self, policy, idx, reg, value, word):
+        """Internal method to send a single register (FC6). Return True when the device accepted it"""
+        log.debug("%d. Sending reg = %d, value = %s. payload = %d", idx, reg, value, word)
+        self._trace_write(reg, [word])
+        result = self._account(policy.call(lambda: self.__client.write_register(address=reg, value=word, unit=self.slave),
+                                            failed=lambda rq: rq.isError(), exceptions=retry_exceptions(), name="write %d", name_args=(reg,)))
+        if not result.ok:
+            log.error("Cannot send address=%s, value=%s, unit=%s. Giving up after %d attempts", reg, value, self.slave, result.attempts)
+        return result.ok
+
+    def __write_registers(self, policy, idx, address, values, words):
+        """Internal method to send adjacent registers (FC16). Return False when the device does not support FC16"""
+        log.debug("%d. Sending regs = %d-%d, values = %s. payload = %s", idx, address, address + len(words) - 1, values, words)
+        self._trace_write(address, words)
+        result = self._account(policy.call(lambda: self.__client.write_registers(address=address, values=words, unit=self.slave),
+                                            failed=lambda rq: rq.isError() and not _illegal_function(rq), exceptions=retry_exceptions(),
+                                            name="write %d-%d", name_args=(address, address + len(words) - 1)))
+        if result.value is not None and _illegal_function(result.value):
+            self._disable_multi_write()
+            return False
+        if not result.ok:
+            log.error("Cannot send address=%s, values=%s, unit=%s. Giving up after %d attempts", address, values, self.slave, result.attempts)
+        return True
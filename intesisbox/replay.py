@@ -0,0 +1,61 @@
+'''
+Offline replay of recorded PA-AW-MBS-1 frames through the poll decoding
+'''
+import logging
+import time
+from array import array
+
+from .pa_aw_mbs import DECODE_PLAN
+from .snapshot import AquareaSnapshot
+
+log = logging.getLogger(__name__)
+
+
+def frame_from_blocks(blocks, plan=DECODE_PLAN):
+    """ Concatenate the registers of one read_holding_registers response per plan block into a frame """
+    if len(blocks) != len(plan.blocks):
+        raise ValueError(f"{len(blocks)} blocks, {len(plan.blocks)} expected")
+    frame = array("H")
+    for block, registers in zip(plan.blocks, blocks):
+        if len(registers) != block.count:
+            raise ValueError(f"Block {block.address}: {len(registers)} registers, {block.count} expected")
+        frame.extend(registers)
+    return frame
+
+
+def replay(frames, speed=None, device=None, lazy=True, unit=10, byteorder=">", plan=DECODE_PLAN,
+            clock=time.monotonic, sleep=time.sleep):
+    """ Yield an AquareaSnapshot for each recorded frame, oldest first
+
+    frames is a FrameLogReader, a FrameHistory or any iterable of (timestamp, raw)
+    or (timestamp, raw, ok), raw being a frame or the list of the block responses.
+    speed None replays as fast as possible, otherwise speed recorded seconds pass
+    per wall clock second. With device (an AquareaDevice, e.g. AquareaDevice(lazy=True))
+    each frame is committed to it as a poll would, every register stamped with the
+    frame timestamp, so its changes, change callbacks and staleness follow the
+    recording, and its snapshot is yielded. Lazy snapshots decode a value
+    on first access, with the same DecodePlan as poll_data.
+    """
+    if hasattr(frames, "frames"):
+        frames = frames.frames()
+    frame_size = plan.frame_size
+    start = None
+    for record in frames:
+        timestamp, raw = record[0], record[1]
+        if len(raw) != frame_size:
+            raw = frame_from_blocks(raw, plan)
+        elif type(raw) is not array:
+            # Detached from the source, a memoryview into a frame log mapping in particular
+            raw = array("H", raw.tobytes()) if isinstance(raw, memoryview) else array("H", raw)
+        if speed is not None:
+            if start is None:
+                start = (timestamp, clock())
+            wait = start[1] + (timestamp - start[0]) / speed - clock()
+            if wait > 0:
+                sleep(wait)
+        if device is not None:
+            # Every word of the frame was read at timestamp, not when the device last polled
+            device._commit(raw, timestamp=timestamp, stamps=array("d", [timestamp]) * frame_size)
+            yield device.snapshot
+        else:
+            yield AquareaSnapshot(plan, raw, unit, byteorder, timestamp=timestamp, lazy=lazy)
@@ -0,0 +1,216 @@
+'''
+Bounded retry policy with exponential backoff for bus I/O
+'''
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+# Outcome of a retried operation: last value returned, attempts made,
+# seconds slept between attempts and whether the last attempt succeeded
+RetryResult = namedtuple("RetryResult", ["value", "attempts", "backoff", "ok"])
+
+
+class RetryPolicy:
+    """ Up to attempts tries of an operation, sleeping between them
+
+    The n-th backoff is delay * multiplier ** (n - 1), capped at max_delay and
+    spread by +/- jitter (a fraction) so that processes sharing a bus do not
+    retry in lockstep. deadline bounds the whole operation in seconds, backoff
+    included (None for no bound).
+    """
+
+    def __init__(self, attempts=6, delay=1.0, max_delay=30.0, multiplier=2.0, jitter=0.1, deadline=None):
+        if attempts < 1:
+            raise ValueError("attempts has to be at least 1")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter has to be in range [0,1)")
+        self.attempts = attempts
+        self.delay = delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def __repr__(self):
+        return (f"RetryPolicy(attempts={self.attempts}, delay={self.delay}, max_delay={self.max_delay}, "
+                f"multiplier={self.multiplier}, jitter={self.jitter}, deadline={self.deadline})")
+
+    @classmethod
+    def from_retry(cls, retry, default=None):
+        """ Policy for a retry argument: a RetryPolicy, a number of retries or None for default """
+        if retry is None:
+            return default if default is not None else cls()
+        if isinstance(retry, RetryPolicy):
+            return retry
+        return cls(attempts=int(retry) + 1)
+
+    def backoff(self, attempt):
+        """ Seconds to sleep after the attempt-th failure (1 based) """
+        delay = min(self.delay * self.multiplier ** (attempt - 1), self.max_delay)
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+    def call(self, operation, failed=None, exceptions=(OSError,), name="operation", name_args=()):
+        """ Run operation() until it succeeds, the attempts or the deadline run out. Return a RetryResult
+
+        failed(value) tells a returned value is a failure worth retrying, exceptions
+        are the exception types retried (the value is None after one of them).
+        name % name_args names the operation in the logs, formatted only when logged.
+        """
+        start = time.monotonic()
+        backoff = 0.0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                value = operation()
+                ok = failed is None or not failed(value)
+            except exceptions as e:
+                value = None
+                ok = False
+                log.error(name + " attempt %d failed: %r", *name_args, attempt, e)
+            if ok:
+                return RetryResult(value, attempt, backoff, True)
+            delay = self.__next_delay(attempt, start)
+            if delay is None:
+                log.error(name + " failed after %d attempts", *name_args, attempt)
+                return RetryResult(value, attempt, backoff, False)
+            time.sleep(delay)
+            backoff += delay
+
+    async def acall(self, operation, failed=None, exceptions=None, name="operation", name_args=()):
+        """ As call, with operation() returning an awaitable (exceptions default OSError and asyncio.TimeoutError) """
+        import asyncio
+        if exceptions is None:
+            exceptions = (OSError, asyncio.TimeoutError)
+        start = time.monotonic()
+        backoff = 0.0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                value = await operation()
+                ok = failed is None or not failed(value)
+            except exceptions as e:
+                value = None
+                ok = False
+                log.error(name + " attempt %d failed: %r", *name_args, attempt, e)
+            if ok:
+                return RetryResult(value, attempt, backoff, True)
+            delay = self.__next_delay(attempt, start)
+            if delay is None:
+                log.error(name + " failed after %d attempts", *name_args, attempt)
+                return RetryResult(value, attempt, backoff, False)
+            await asyncio.sleep(delay)
+            backoff += delay
+
+    def __next_delay(self, attempt, start):
+        """ Backoff before the next attempt, None to give up """
+        if attempt >= self.attempts:
+            return None
+        delay = self.backoff(attempt)
+        if self.deadline is not None:
+            remaining = self.deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                return None
+            delay = min(delay, remaining)
+        return delay
+
+
+class CircuitBreaker:
+    """ Stop polling a device that keeps failing, probing it again after a cooldown
+
+    After threshold consecutive failed polls the circuit opens: polls are skipped
+    for cooldown seconds, then a single probe is let through (half open) while the
+    other callers keep being refused. A failed probe opens the circuit again for
+    twice the previous cooldown (up to max_cooldown), a successful one closes it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=3, cooldown=30.0, max_cooldown=600.0, clock=time.monotonic):
+        if threshold < 1:
+            raise ValueError("threshold has to be at least 1")
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.__clock = clock
+        self.__failures = 0
+        self.__state = self.CLOSED
+        self.__open_for = cooldown
+        self.__opened_at = None
+        self.__probing = False
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f"CircuitBreaker(state={self.state}, failures={self.__failures})"
+
+    @property
+    def state(self):
+        if self.__state == self.OPEN and self.remaining() == 0:
+            return self.HALF_OPEN
+        return self.__state
+
+    @property
+    def failures(self):
+        """ Consecutive failed polls """
+        return self.__failures
+
+    def remaining(self, now=None):
+        """ Seconds until the next poll is allowed, 0 when it is allowed already """
+        if self.__state != self.OPEN:
+            return 0.0
+        if now is None:
+            now = self.__clock()
+        return max(0.0, self.__opened_at + self.__open_for - now)
+
+    def allow(self, now=None):
+        """ True when a poll may go to the bus
+
+        Once the cooldown is over only the first caller is let through, as the probe;
+        the others get False until it is accounted by success() or failure(), or
+        given back by abandon().
+        """
+        with self.__lock:
+            if self.__state == self.CLOSED:
+                return True
+            if self.__probing or self.remaining(now) > 0:
+                return False
+            self.__probing = True
+            return True
+
+    def abandon(self):
+        """ Give the probe back when its poll ended without reaching the device """
+        with self.__lock:
+            self.__probing = False
+
+    def success(self):
+        with self.__lock:
+            if self.__state != self.CLOSED:
+                log.info("Device answering again, circuit closed")
+            self.__failures = 0
+            self.__state = self.CLOSED
+            self.__open_for = self.cooldown
+            self.__probing = False
+
+    def failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.__probing:
+                # Failed probe
+                self.__probing = False
+                self.__open_for = min(self.__open_for * 2, self.max_cooldown)
+            elif self.__state == self.OPEN:
+                # Poll started before the circuit opened
+                return
+            elif self.__failures < self.threshold:
+                return
+            self.__state = self.OPEN
+            self.__opened_at = self.__clock()
+            log.warning("%d failed polls, circuit open for %s s", self.__failures, self.__open_for)
@@ -0,0 +1,151 @@
+'''
+Tiered poll scheduler: each register (or group) is refreshed at its own period
+'''
+import logging
+import time
+
+from .pa_aw_mbs import DECODE_PLAN, REGISTER_GROUPS
+
+log = logging.getLogger(__name__)
+
+# Registers due within this fraction of their period ride along a read
+# that passes close by, instead of needing a transaction of their own later
+PREFETCH = 0.5
+
+# Refresh periods in seconds. Registers in several groups use the shortest period.
+DEFAULT_INTERVALS = {
+    "telemetry":     10,
+    "general":       30,
+    "tank":          60,
+    "consumption":   60,
+    "maintenance":   60,
+    "climate":       300,
+    "unit_config":   3600,
+    "system_config": 3600,
+}
+
+
+class AquareaScheduler:
+    """ Poll an AquareaModbus issuing, at each tick, only the reads whose data is due
+
+    intervals maps REGISTER_GROUPS keys or register names to a refresh period in
+    seconds. A register name overrides the groups it belongs to, registers not
+    covered by intervals use default. When a poll does not reach the bus (not
+    connected, bus busy, circuit open) run() waits the shortest period before
+    the next tick, as everything is still due.
+    """
+
+    def __init__(self, aquarea, intervals=None, default=60, max_gap=None, clock=time.monotonic, sleep=time.sleep):
+        self.__aquarea = aquarea
+        self.__max_gap = max_gap
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__period = self.__resolve_periods(DEFAULT_INTERVALS if intervals is None else intervals, default)
+        self.__skipped = None
+        # Next due time per register, everything is due on the first tick
+        self.__due = dict.fromkeys(self.__period, 0.0)
+        self.__ticks = 0
+        self.__reads = 0
+        self.__words = 0
+
+    @staticmethod
+    def __resolve_periods(intervals, default):
+        period = {}
+        for name, seconds in intervals.items():
+            if name in REGISTER_GROUPS:
+                for reg in REGISTER_GROUPS[name]:
+                    if reg in DECODE_PLAN.by_reg:
+                        period[reg] = min(seconds, period.get(reg, seconds))
+            elif name not in DECODE_PLAN.by_name:
+                raise ValueError(f"Unknown register or group {name}")
+        for name, seconds in intervals.items():
+            if name in DECODE_PLAN.by_name:
+                period[DECODE_PLAN.by_name[name].reg] = seconds
+        for entry in DECODE_PLAN.entries:
+            period.setdefault(entry.reg, default)
+        return period
+
+    @property
+    def periods(self):
+        """ Refresh period by register name """
+        return {DECODE_PLAN.by_reg[reg].name: seconds for reg, seconds in self.__period.items()}
+
+    @property
+    def stats(self):
+        """ Ticks, read transactions and words read so far """
+        return {"ticks": self.__ticks, "reads": self.__reads, "words": self.__words}
+
+    def due(self, now=None):
+        """ Return the registers whose data is due at now """
+        if now is None:
+            now = self.__clock()
+        return sorted(reg for reg, due in self.__due.items() if due <= now)
+
+    def next_due(self, now=None):
+        """ Seconds until the next register is due (0 if something is due already) """
+        if now is None:
+            now = self.__clock()
+        return max(0.0, min(self.__due.values()) - now)
+
+    def tick(self, now=None):
+        """ Poll the due registers merged into minimal ranges. Return the refreshed registers
+
+        Registers of failed reads stay due
+        """
+        if now is None:
+            now = self.__clock()
+        regs = self.due(now)
+        self.__ticks += 1
+        self.__skipped = None
+        if not regs:
+            return []
+        names = [DECODE_PLAN.by_reg[reg].name for reg in regs]
+        reads = self.__aquarea.read_plan(names, self.__max_gap)
+        extra = self.__prefetch(reads, regs, now)
+        if extra:
+            names += [DECODE_PLAN.by_reg[reg].name for reg in extra]
+            reads = self.__aquarea.read_plan(names, self.__max_gap)
+        result = self.__aquarea.poll_data(names=names, max_gap=self.__max_gap)
+        self.__skipped = result.skipped
+        read_ok = {(block.address, block.count) for block in result.blocks if block.ok}
+        refreshed = []
+        for block, address, count in reads:
+            if (address, count) not in read_ok:
+                # Still due: retried at the next tick
+                continue
+            self.__reads += 1
+            self.__words += count
+            # Registers read through a hole are fresh as well
+            for entry in block.entries:
+                if address <= entry.reg < address + count:
+                    self.__due[entry.reg] = now + self.__period[entry.reg]
+                    refreshed.append(entry.reg)
+        log.debug("tick: due %s, reads %s", regs, [(address, count) for _, address, count in reads])
+        return refreshed
+
+    def __prefetch(self, reads, regs, now):
+        """ Registers soon due that can join one of reads without a new transaction """
+        gap = self.__max_gap if self.__max_gap is not None else self.__aquarea.read_gap
+        regs = set(regs)
+        extra = []
+        for block, address, count in reads:
+            for entry in block.entries:
+                reg = entry.reg
+                if reg in regs or not (address - gap - 1 <= reg <= address + count + gap):
+                    continue
+                if self.__due[reg] - now <= self.__period[reg] * PREFETCH:
+                    extra.append(reg)
+        return extra
+
+    def run(self, stop=None):
+        """ Tick forever (or until stop() returns True) sleeping until the next register is due """
+        while stop is None or not stop():
+            self.tick()
+            if self.__skipped is not None:
+                # Nothing was read and everything is still due: back off instead of spinning
+                delay = min(self.__period.values())
+                log.debug("Poll skipped (%s), next tick in %s s", self.__skipped, delay)
+            else:
+                delay = self.next_due()
+            # A device behind an open circuit breaker is not polled before its cooldown
+            self.__sleep(max(delay, self.__aquarea.breaker.remaining()))
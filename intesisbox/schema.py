@@ -0,0 +1,85 @@
+'''
+Declarative PA-AW-MBS-1 register schema and what is generated from it
+'''
+from collections import namedtuple
+
+# One register of the device:
+#   type      decoding and scaling: "int", "temp" (x unit), "min" (x 30) or "err" (ERROR_MAP code)
+#   values    {word: str} mapping read words to their names
+#   min, max  range accepted by the setter, in decoded units
+#   commands  {str: word} accepted by the setter, by default the inverse of values
+#             for writable registers; {} for a writable register without a setter
+Register = namedtuple("Register", ["reg", "name", "type", "desc", "access", "values", "min", "max", "commands"],
+                        defaults=(None, None, None, None))
+
+
+def register_map(registers):
+    """ Return the INTESISBOX_MAP of registers: {reg: {name, values, type, desc, access}} """
+    result = {}
+    for register in registers:
+        spec = {"name": register.name}
+        if register.values is not None:
+            spec["values"] = register.values
+        spec.update(type=register.type, desc=register.desc, access=register.access)
+        result[register.reg] = spec
+    return result
+
+
+def commands_of(register, write_flag):
+    """ {str: word} accepted by the setter of register, None when the register has none or a range """
+    if register.commands is not None:
+        return register.commands or None
+    if register.min is None and register.values is not None and register.access & write_flag:
+        return {value: word for word, value in register.values.items()}
+    return None
+
+
+def command_map(registers, write_flag):
+    """ Return the COMMAND_MAP of registers: {name: {reg, values or min/max, type}} """
+    result = {}
+    for register in registers:
+        spec = {"reg": register.reg}
+        commands = commands_of(register, write_flag)
+        if register.min is not None:
+            spec.update(min=register.min, max=register.max)
+        elif commands is not None:
+            spec["values"] = commands
+        else:
+            continue
+        spec["type"] = register.type
+        result[register.name] = spec
+    return result
+
+
+def docstring(register, read_flag, write_flag):
+    """ Property docstring of register, e.g. "[Operating Mode] 1: Heat, 3: Tank [4-R/W]" """
+    access = "/".join(flag for mask, flag in ((read_flag, "R"), (write_flag, "W")) if register.access & mask)
+    if register.min is not None:
+        detail = f" {register.min} to {register.max}"
+    elif register.values:
+        detail = " " + ", ".join(f"0x{word:02X}: {value}" if word > 9 else f"{word}: {value}" for word, value in register.values.items())
+    else:
+        detail = ""
+    return f"[{register.desc}]{detail} [{register.reg}-{access}]"
+
+
+def accessors(registers, plan, read_flag, write_flag):
+    """ Class decorator adding a property per register that the class does not define itself
+
+    Readable registers (the ones in plan) get a getter from cls._getter(index) and
+    registers with a command a setter from cls._setter(name); registers with neither
+    are left out.
+    """
+    def decorate(cls):
+        for register in registers:
+            name = register.name
+            if name in vars(cls):
+                continue
+            entry = plan.by_name.get(name)
+            fget = cls._getter(entry.index) if entry is not None else None
+            has_command = register.min is not None or commands_of(register, write_flag) is not None
+            fset = cls._setter(name) if has_command else None
+            if fget is not None or fset is not None:
+                setattr(cls, name, property(fget, fset, doc=docstring(register, read_flag, write_flag)))
+        return cls
+    return decorate
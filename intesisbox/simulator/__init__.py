@@ -0,0 +1,6 @@
+'''
+PA-AW-MBS-1 simulator: the INTESISBOX_MAP register layout served over Modbus RTU
+on a pseudo-terminal pair and over Modbus TCP, for load and latency tests
+'''
+from .device import SimulatedDevice
+from .server import RtuSimulator, TcpSimulator, frame_time
@@ -0,0 +1,44 @@
+'''
+python -m intesisbox.simulator --slaves 1 2 --link /tmp/aquarea --tcp-port 5020
+'''
+import argparse
+import logging
+import time
+
+from . import RtuSimulator, SimulatedDevice, TcpSimulator
+
+
+def init_argparse() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="PA-AW-MBS-1 simulator over Modbus RTU (pty) and TCP", add_help=True)
+    parser.add_argument("--slaves", type=int, nargs="+", default=[1], help="Slave IDs to simulate (default 1)")
+    parser.add_argument("--baud", type=int, default=9600, help="Simulated baudrate (default 9600)")
+    parser.add_argument("--turnaround", type=float, default=0.02, help="Device response latency in s (default 0.02)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Simulated seconds per second (default 1)")
+    parser.add_argument("--link", help="Symlink to create to the pty (e.g. /tmp/aquarea)")
+    parser.add_argument("--tcp-port", type=int, help="Also serve Modbus TCP on this port, as an RTU gateway")
+    parser.add_argument("--seed", type=int, help="Random seed of the dynamics")
+    return parser
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = init_argparse().parse_args()
+    devices = {slave: SimulatedDevice(speed=args.speed, seed=args.seed) for slave in args.slaves}
+    rtu = RtuSimulator(devices, baudrate=args.baud, turnaround=args.turnaround, link=args.link).start()
+    tcp = None
+    if args.tcp_port is not None:
+        tcp = TcpSimulator(devices, host="0.0.0.0", port=args.tcp_port, baudrate=args.baud, turnaround=args.turnaround).start()
+    print(f"RTU: {rtu.port}" + (f", TCP: {tcp.port}" if tcp is not None else ""), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rtu.stop()
+        if tcp is not None:
+            tcp.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+'''
+Simulated PA-AW-MBS-1 register image with simple heat pump dynamics
+'''
+import math
+import random
+import threading
+import time
+
+from ..pa_aw_mbs import INTESISBOX_MAP, INTESIS_NULL, READ, WRITE
+
+# Initial register values by name, in engineering units (temperatures in degrees)
+INITIAL = {
+    "system": 1,
+    "otudoor_temp": 6.0,
+    "water_out_temp": 33.0,
+    "water_in_temp": 29.0,
+    "mode": 2,
+    "config_mode": 1,
+    "working": 0,
+    "heat_low_outdoor_set_temperature": -5.0,
+    "heat_high_outdoor_set_temperature": 15.0,
+    "heat_low_water_set_temperature": 40.0,
+    "heat_high_water_set_temperature": 30.0,
+    "heat_temperature_max": 20.0,
+    "heater_capacity": 91,
+    "heater_max_capacity": 9,
+    "cool_setpoint_temp": 10.0,
+    "heat_setpoint_temp": 35.0,
+    "tank_mode": 1,
+    "tank_water_temp": 44.0,
+    "tank_setpoint_temp": 48.0,
+    "heat_interval": 30,
+    "operation_interval": 4,
+    "booster_delay": 60,
+    "tank_ster_temp": 65.0,
+    "tank_ster_time": 10,
+    "pump_speed": 4,
+    "room_thermostat": 85,
+    "tank_connection": 170,
+    "solar_priority": 85,
+    "heating_priority": 85,
+    "cooling_priority": 85,
+    "sterilization": 85,
+    "base_pan_heater": 85,
+    "anti_freezing": 170,
+    "booster_heater": 170,
+    "cool_mode_selection": 85,
+    "base_pan_heater_selection": 85,
+    "thermoshift_heat_eco": 2.0,
+    "thermoshift_heat_powerful": 2.0,
+    "thermoshift_tank_eco": 5.0,
+    "thermoshift_tank_powerful": 5.0,
+    "led": 1,
+}
+
+# Compressor target frequency (Hz) by working mode, and its ramp in Hz per second
+COMPRESSOR_HZ = {0: 55, 1: 40, 2: 75}
+COMPRESSOR_RAMP = 1.0
+# Electric power drawn per compressor Hz, in W
+WATT_PER_HZ = 20.0
+# Time constants (s) of water and tank temperatures approaching their targets
+WATER_TAU = 600.0
+TANK_TAU = 3600.0
+
+# Modes heating the building, the tank or cooling (INTESISBOX_MAP "mode" values)
+HEAT_MODES = (1, 2)
+TANK_MODES = (2, 3, 4)
+COOL_MODES = (4, 5)
+
+
+class SimulatedDevice:
+    """ Register image of one PA-AW-MBS-1 evolving with the (optionally accelerated) clock
+
+    Unmapped and write only registers read as INTESIS_NULL. speed is the simulated
+    seconds per real second. Dynamics are computed lazily, on each access.
+    """
+
+    def __init__(self, unit=10, speed=1.0, seed=None, clock=time.monotonic):
+        self.unit = unit
+        self.speed = speed
+        self.__rnd = random.Random(seed)
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__last = clock()
+        self.__elapsed = 0.0
+        # Engineering values of the mapped registers
+        self.__values = {}
+        for reg, spec in INTESISBOX_MAP.items():
+            if spec["access"] & READ:
+                self.__values[reg] = INITIAL.get(spec["name"], 0)
+        self.__regs = {spec["name"]: reg for reg, spec in INTESISBOX_MAP.items()}
+        self.__outdoor = self.__get("otudoor_temp")
+        # Fractional energy (Wh) and running hours, the registers hold the integer part
+        self.__energy = {"heat_wh": 0.0, "cool_wh": 0.0, "tank_wh": 0.0}
+        self.__hours = 0.0
+        # Compressor frequency (Hz) as a float, the register holds the integer part
+        self.__hz = 0.0
+        self.reads = 0
+        self.writes = 0
+
+    def read(self, address, count):
+        """ Return count register words from address """
+        with self.__lock:
+            self.__advance()
+            self.reads += 1
+            return [self.__word(reg) for reg in range(address, address + count)]
+
+    def write(self, address, values):
+        """ Write values from address. Return False (nothing written) if a register is not writable """
+        with self.__lock:
+            regs = range(address, address + len(values))
+            if not all(reg in INTESISBOX_MAP and INTESISBOX_MAP[reg]["access"] & WRITE for reg in regs):
+                return False
+            self.__advance()
+            self.writes += 1
+            for reg, word in zip(regs, values):
+                if INTESISBOX_MAP[reg]["access"] & READ:
+                    self.__values[reg] = self.__decode(reg, word)
+            return True
+
+    def value(self, name):
+        """ Current engineering value of name """
+        with self.__lock:
+            self.__advance()
+            return self.__get(name)
+
+    def __word(self, reg):
+        value = self.__values.get(reg)
+        if value is None:
+            return INTESIS_NULL
+        if INTESISBOX_MAP[reg]["type"] == "temp":
+            return int(round(value * self.unit)) & 0xFFFF
+        # "min" registers hold the raw word (minutes / 30) like the device
+        return int(value) & 0xFFFF
+
+    def __decode(self, reg, word):
+        word = word - 0x10000 if word & 0x8000 else word
+        if INTESISBOX_MAP[reg]["type"] == "temp":
+            return word / self.unit
+        return word
+
+    def __get(self, name):
+        return self.__values[self.__regs[name]]
+
+    def __set(self, name, value):
+        self.__values[self.__regs[name]] = value
+
+    def __advance(self):
+        """ Move the dynamics to the current clock """
+        now = self.__clock()
+        dt = (now - self.__last) * self.speed
+        self.__last = now
+        if dt <= 0:
+            return
+        self.__elapsed += dt
+        on = self.__get("system") == 1
+        mode = self.__get("mode")
+
+        # Outdoor temperature: daily sine plus a bounded random walk
+        self.__outdoor += self.__rnd.gauss(0, 0.02 * math.sqrt(dt))
+        self.__outdoor = min(max(self.__outdoor, -10.0), 20.0)
+        outdoor = self.__outdoor + 4 * math.sin(2 * math.pi * self.__elapsed / 86400)
+        self.__set("otudoor_temp", outdoor)
+
+        # Compressor ramps towards the frequency of the working mode
+        target = COMPRESSOR_HZ.get(self.__get("working"), COMPRESSOR_HZ[0]) if on and mode else 0
+        if self.__get("quiet") == 1:
+            target = min(target, 35)
+        hz = self.__hz
+        step = COMPRESSOR_RAMP * dt
+        hz = min(hz + step, target) if hz < target else max(hz - step, target)
+        self.__hz = hz
+        self.__set("compressor", int(hz))
+        running = hz > 0
+
+        # Water and tank temperatures approach their targets
+        cooling = mode in COOL_MODES
+        if running and mode in HEAT_MODES + COOL_MODES:
+            water_target = self.__get("cool_setpoint_temp") if cooling else self.__get("heat_setpoint_temp")
+        else:
+            water_target = outdoor + 15
+        out = self.__approach(self.__get("water_out_temp"), water_target, WATER_TAU, dt)
+        self.__set("water_out_temp", out)
+        delta = 5.0 * hz / COMPRESSOR_HZ[0]
+        self.__set("water_in_temp", out + delta if cooling else out - delta)
+        tank = self.__get("tank_water_temp")
+        if running and mode in TANK_MODES:
+            tank = self.__approach(tank, self.__get("tank_setpoint_temp"), TANK_TAU, dt)
+        else:
+            tank = self.__approach(tank, outdoor + 10, TANK_TAU * 10, dt)
+        self.__set("tank_water_temp", tank)
+        self.__set("defrost", 1 if running and outdoor < 2 and int(self.__elapsed / 1800) % 4 == 0 else 0)
+
+        # Energy counters (47-49) and compressor hours
+        if running:
+            wh = hz * WATT_PER_HZ * dt / 3600
+            if mode in TANK_MODES:
+                self.__energy["tank_wh"] += wh / 2 if mode in (2, 4) else wh
+            if mode in HEAT_MODES:
+                self.__energy["heat_wh"] += wh / 2 if mode == 2 else wh
+            if mode in COOL_MODES:
+                self.__energy["cool_wh"] += wh / 2 if mode == 4 else wh
+            self.__hours += dt / 3600
+        for name, energy in self.__energy.items():
+            self.__set(name, int(energy) & 0xFFFF)
+        self.__set("compressor_hour", int(self.__hours) & 0xFFFF)
+
+    @staticmethod
+    def __approach(value, target, tau, dt):
+        return target + (value - target) * math.exp(-dt / tau)
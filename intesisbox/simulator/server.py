@@ -0,0 +1,264 @@
+'''
+Modbus RTU (pseudo-terminal) and Modbus TCP front ends of SimulatedDevice
+'''
+import logging
+import os
+import select
+import socketserver
+import struct
+import threading
+import time
+import tty
+
+log = logging.getLogger(__name__)
+
+READ_HOLDING_REGISTERS = 0x03
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+
+# Bits per character on the wire: start, 8 data, parity or second stop, stop
+CHAR_BITS = 11
+
+
+def crc16(data):
+    """ Modbus RTU CRC, to be appended little endian """
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def frame_time(size, baudrate):
+    """ Seconds to transmit size bytes plus the 3.5 character end of frame silence """
+    return (size + 3.5) * CHAR_BITS / baudrate
+
+
+def handle_pdu(device, pdu):
+    """ Serve a request PDU on device. Return the response PDU """
+    fc = pdu[0]
+    try:
+        if fc == READ_HOLDING_REGISTERS:
+            address, count = struct.unpack(">HH", pdu[1:5])
+            if not 1 <= count <= 125:
+                return bytes((fc | 0x80, ILLEGAL_DATA_VALUE))
+            words = device.read(address, count)
+            return struct.pack(f">BB{count}H", fc, 2 * count, *words)
+        if fc == WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack(">HH", pdu[1:5])
+            if not device.write(address, [value]):
+                return bytes((fc | 0x80, ILLEGAL_DATA_ADDRESS))
+            return pdu[:5]
+        if fc == WRITE_MULTIPLE_REGISTERS:
+            address, count, size = struct.unpack(">HHB", pdu[1:6])
+            if not 1 <= count <= 123 or size != 2 * count:
+                return bytes((fc | 0x80, ILLEGAL_DATA_VALUE))
+            if not device.write(address, list(struct.unpack(f">{count}H", pdu[6:6 + size]))):
+                return bytes((fc | 0x80, ILLEGAL_DATA_ADDRESS))
+            return pdu[:5]
+    except struct.error:
+        return bytes((fc | 0x80, ILLEGAL_DATA_VALUE))
+    return bytes((fc | 0x80, ILLEGAL_FUNCTION))
+
+
+def _rtu_size(buffer):
+    """ Size of the RTU request at the start of buffer, None while unknown """
+    if len(buffer) < 2:
+        return None
+    fc = buffer[1]
+    if fc in (READ_HOLDING_REGISTERS, WRITE_SINGLE_REGISTER):
+        return 8
+    if fc == WRITE_MULTIPLE_REGISTERS:
+        return 9 + buffer[6] if len(buffer) >= 7 else None
+    # Every other function the device may get is a fixed 8 byte request
+    return 8
+
+
+class RtuSimulator:
+    """ Serve devices ({slave: SimulatedDevice}) over Modbus RTU on a pseudo-terminal
+
+    Open port (the pty slave side) with AquareaModbus(port=...). Each response waits
+    for the time the request and the response would take on the wire at baudrate,
+    plus the device turnaround. Requests for other slaves are ignored as on a
+    shared bus, broadcasts (slave 0) are applied without response.
+    """
+
+    def __init__(self, devices, baudrate=9600, turnaround=0.02, link=None):
+        self.devices = devices
+        self.baudrate = baudrate
+        self.turnaround = turnaround
+        self.link = link
+        self.requests = 0
+        self.__master = None
+        self.__slave = None
+        self.__thread = None
+        self.__running = False
+
+    @property
+    def port(self):
+        """ Serial device to open, the link when set """
+        if self.link is not None:
+            return self.link
+        return os.ttyname(self.__slave) if self.__slave is not None else None
+
+    def start(self):
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        if self.link is not None:
+            if os.path.lexists(self.link):
+                os.unlink(self.link)
+            os.symlink(os.ttyname(self.__slave), self.link)
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__serve, name="rtu-simulator", daemon=True)
+        self.__thread.start()
+        log.info("RTU simulator on %s, %d baud, slaves %s", self.port, self.baudrate, sorted(self.devices))
+        return self
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+        for fd in (self.__master, self.__slave):
+            if fd is not None:
+                os.close(fd)
+        self.__master = self.__slave = None
+        if self.link is not None and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __serve(self):
+        buffer = b""
+        silence = frame_time(0, self.baudrate)
+        while self.__running:
+            ready, _, _ = select.select([self.__master], [], [], silence if buffer else 0.1)
+            if not ready:
+                # An inter-frame silence ends whatever was received
+                if buffer:
+                    log.debug("Dropping incomplete frame %s", buffer.hex())
+                buffer = b""
+                continue
+            try:
+                buffer += os.read(self.__master, 512)
+            except OSError:
+                break
+            while True:
+                size = _rtu_size(buffer)
+                if size is None or len(buffer) < size:
+                    break
+                frame, buffer = buffer[:size], buffer[size:]
+                self.__handle(frame)
+
+    def __handle(self, frame):
+        if crc16(frame[:-2]) != struct.unpack("<H", frame[-2:])[0]:
+            log.debug("Bad CRC %s", frame.hex())
+            return
+        self.requests += 1
+        slave, pdu = frame[0], frame[1:-2]
+        if slave == 0:
+            for device in self.devices.values():
+                handle_pdu(device, pdu)
+            return
+        device = self.devices.get(slave)
+        if device is None:
+            return
+        response = bytes((slave,)) + handle_pdu(device, pdu)
+        response += struct.pack("<H", crc16(response))
+        time.sleep(frame_time(len(frame), self.baudrate) + self.turnaround + frame_time(len(response), self.baudrate))
+        os.write(self.__master, response)
+
+
+class TcpSimulator:
+    """ Serve devices ({unit: SimulatedDevice}) over Modbus TCP
+
+    With baudrate set it behaves as a TCP to RTU gateway: requests are serialized
+    and delayed by the RTU wire time plus turnaround. An unknown unit id is served
+    by the only device when there is a single one, as many gateways do.
+    """
+
+    def __init__(self, devices, host="127.0.0.1", port=5020, baudrate=None, turnaround=0.0):
+        self.devices = devices
+        self.host = host
+        self.baudrate = baudrate
+        self.turnaround = turnaround
+        self.requests = 0
+        self.__port = port
+        self.__server = None
+        self.__thread = None
+        self.__bus = threading.Lock()
+
+    @property
+    def port(self):
+        return self.__server.server_address[1] if self.__server is not None else self.__port
+
+    def start(self):
+        simulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    header = self.__recv(7)
+                    if header is None:
+                        return
+                    tid, pid, length, unit = struct.unpack(">HHHB", header)
+                    pdu = self.__recv(length - 1)
+                    if pdu is None:
+                        return
+                    response = simulator._handle(unit, pdu)
+                    if response is not None:
+                        self.request.sendall(struct.pack(">HHHB", tid, pid, len(response) + 1, unit) + response)
+
+            def __recv(self, size):
+                data = b""
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        return None
+                    data += chunk
+                return data
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.__server = socketserver.ThreadingTCPServer((self.host, self.__port), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="tcp-simulator", daemon=True)
+        self.__thread.start()
+        log.info("TCP simulator on %s:%s, units %s", self.host, self.port, sorted(self.devices))
+        return self
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__thread.join()
+        self.__server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, unit, pdu):
+        """ Response PDU for unit, None when no device answers """
+        device = self.devices.get(unit)
+        if device is None and len(self.devices) == 1:
+            device = next(iter(self.devices.values()))
+        if device is None:
+            return None
+        self.requests += 1
+        if self.baudrate is None:
+            return handle_pdu(device, pdu)
+        # Behind a gateway the RTU line carries one request at a time
+        with self.__bus:
+            response = handle_pdu(device, pdu)
+            time.sleep(frame_time(len(pdu) + 3, self.baudrate) + self.turnaround + frame_time(len(response) + 3, self.baudrate))
+        return response
@@ -0,0 +1,332 @@
+'''
+Immutable snapshot of one PA-AW-MBS-1 poll
+'''
+import math
+import struct
+import sys
+import time
+import weakref
+from array import array
+
+from .decoder import layout_crc
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Marks a value not decoded yet in a lazy snapshot
+_PENDING = object()
+
+# to_bytes header: magic, version, flags, byteorder, unit, block layout crc, timestamp
+BYTES_HEADER = struct.Struct("<4sBBcHId")
+BYTES_MAGIC = b"AQSN"
+BYTES_VERSION = 1
+# Flag: per-word read times follow the words
+HAS_STAMPS = 1
+
+# Encoded fragments kept per register, the cache starts over beyond
+FRAGMENT_CACHE = 256
+
+_LITTLE = sys.byteorder == "little"
+
+
+def _msgpack_map(count):
+    if count < 16:
+        return bytes((0x80 | count,))
+    if count < 0x10000:
+        return struct.pack(">BH", 0xde, count)
+    return struct.pack(">BI", 0xdf, count)
+
+
+class _Tables:
+    """ Encoded names and descriptions of the entries of a plan, and fragments by raw word, built once """
+
+    def __init__(self, plan):
+        import json
+        self.plan = plan
+        entries = plan.entries
+        self.json_keys = [json.dumps(entry.name) + ":" for entry in entries]
+        self.json_heads = [key + '{"value":' for key in self.json_keys]
+        self.json_tails = [',"desc":' + json.dumps(entry.desc) + "}" for entry in entries]
+        self.crc = layout_crc(plan)
+        self.__msgpack = None
+        # Encoded "name": value fragments by raw word, one dict per entry, by (format, desc, unit, byteorder)
+        self.__fragments = {}
+
+    def fragments(self, fmt, desc, unit, byteorder):
+        key = (fmt, desc, unit, byteorder)
+        caches = self.__fragments.get(key)
+        if caches is None:
+            caches = self.__fragments[key] = [{} for _ in self.plan.entries]
+        return caches
+
+    def encode(self, fmt, desc, entry, mvalue):
+        """ Encoded name and mapped value (and desc) of entry """
+        index = entry.index
+        if fmt == "json":
+            value = _json_value(mvalue)
+            return self.json_heads[index] + value + self.json_tails[index] if desc else self.json_keys[index] + value
+        keys, heads, tails = self.msgpack()
+        value = msgpack.packb(mvalue)
+        return heads[index] + value + tails[index] if desc else keys[index] + value
+
+    def msgpack(self):
+        """ (keys, heads, tails) as json_*, MessagePack encoded """
+        if self.__msgpack is None:
+            if msgpack is None:
+                raise ImportError("to_msgpack needs the msgpack package")
+            packb = msgpack.packb
+            keys = [packb(entry.name) for entry in self.plan.entries]
+            heads = [key + b"\x82" + packb("value") for key in keys]
+            tails = [packb("desc") + packb(entry.desc) for entry in self.plan.entries]
+            self.__msgpack = (keys, heads, tails)
+        return self.__msgpack
+
+
+_tables = weakref.WeakKeyDictionary()
+
+
+def _tables_of(plan):
+    tables = _tables.get(plan)
+    if tables is None:
+        tables = _tables[plan] = _Tables(plan)
+    return tables
+
+
+def _json_value(value):
+    if value is None:
+        return "null"
+    if type(value) is int:
+        return str(value)
+    if type(value) is float and math.isfinite(value):
+        return repr(value)
+    import json
+    return json.dumps(value)
+
+
+class AquareaSnapshot:
+    """ Raw frame words plus decoded and mapped values, indexed by DecodePlan entry
+
+    A lazy snapshot keeps only the raw words and decodes (then memoizes) each
+    value the first time it is read.
+    """
+    __slots__ = ("plan", "timestamp", "raw", "stamps", "unit", "byteorder", "_values", "_mvalues")
+
+    def __init__(self, plan, raw, unit=10, byteorder=">", timestamp=None, lazy=False, stamps=None):
+        if lazy:
+            values = [_PENDING] * len(plan.entries)
+            mvalues = [_PENDING] * len(plan.entries)
+        else:
+            values, mvalues = plan.decode_frame(raw, unit, byteorder)
+        _set = object.__setattr__
+        _set(self, "plan", plan)
+        _set(self, "timestamp", time.time() if timestamp is None else timestamp)
+        # array('H') holding every polled word, blocks concatenated
+        _set(self, "raw", raw)
+        # array('d') with the time each word was last read (0 never), None when all were read at timestamp
+        _set(self, "stamps", stamps)
+        _set(self, "unit", unit)
+        _set(self, "byteorder", byteorder)
+        _set(self, "_values", values)
+        _set(self, "_mvalues", mvalues)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, name):
+        """ Mapped value of name (i.e. "On" rather than 1) """
+        index = self.plan.by_name[name].index
+        mvalue = self._mvalues[index]
+        if mvalue is _PENDING:
+            mvalue = self.__decode(index)[1]
+        return mvalue
+
+    def __contains__(self, name):
+        return name in self.plan.by_name
+
+    def __iter__(self):
+        return iter(self.plan.by_name)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"AquareaSnapshot(timestamp={self.timestamp}, values={len(self._values)})"
+
+    def get(self, name, default=None):
+        """ Mapped value of name, default when name is not a readable register """
+        entry = self.plan.by_name.get(name)
+        if entry is None:
+            return default
+        mvalue = self._mvalues[entry.index]
+        if mvalue is _PENDING:
+            mvalue = self.__decode(entry.index)[1]
+        return mvalue
+
+    def at(self, index):
+        """ Mapped value of the plan entry at index """
+        mvalue = self._mvalues[index]
+        if mvalue is _PENDING:
+            mvalue = self.__decode(index)[1]
+        return mvalue
+
+    def value(self, name):
+        """ Decoded numeric value of name, before value map translation """
+        entry = self.plan.by_name.get(name)
+        if entry is None:
+            return None
+        value = self._values[entry.index]
+        if value is _PENDING:
+            value = self.__decode(entry.index)[0]
+        return value
+
+    def raw_word(self, name):
+        """ Raw (unsigned) register word of name """
+        return self.raw[self.plan.by_name[name].position]
+
+    def read_at(self, name):
+        """ Time the word of name was last read from the device, None if never """
+        if self.stamps is None:
+            return self.timestamp
+        stamp = self.stamps[self.plan.by_name[name].position]
+        return stamp if stamp else None
+
+    def age(self, name, now=None):
+        """ Seconds since the word of name was last read, None if never """
+        stamp = self.read_at(name)
+        if stamp is None:
+            return None
+        return (time.time() if now is None else now) - stamp
+
+    def is_stale(self, name, max_age, now=None):
+        """ True when the word of name was never read or is older than max_age seconds """
+        age = self.age(name, now)
+        return age is None or age > max_age
+
+    def diff(self, previous):
+        """ Return the plan entries whose raw word differs from previous (all of them if previous is None) """
+        if previous is None:
+            return list(self.plan.entries)
+        if previous.raw == self.raw:
+            return []
+        pick = self.plan.pick
+        return [entry for entry, old, new in zip(self.plan.entries, pick(previous.raw), pick(self.raw)) if old != new]
+
+    def __fragments(self, fmt, desc, previous):
+        """ Encoded name and value of what to serialize: changed since previous, or all the non-null values
+
+        Fragments are cached by raw word, a register seen with the same word is not decoded again.
+        """
+        tables = _tables_of(self.plan)
+        caches = tables.fragments(fmt, desc, self.unit, self.byteorder)
+        raw = self.raw
+        # The null marker as stored in the frame with this byte order
+        null = self.plan.device_word(self.plan.null, self.byteorder)
+        decode = self.plan.decode_raw
+        fragments = []
+        for entry in self.plan.entries if previous is None else self.diff(previous):
+            word = raw[entry.position]
+            if word == null and previous is None:
+                continue
+            cache = caches[entry.index]
+            fragment = cache.get(word)
+            if fragment is None:
+                fragment = tables.encode(fmt, desc, entry, decode(entry, word, self.unit, self.byteorder)[1])
+                if len(cache) >= FRAGMENT_CACHE:
+                    cache.clear()
+                cache[word] = fragment
+            fragments.append(fragment)
+        return fragments
+
+    def to_json(self, previous=None, desc=True):
+        """ JSON of valid_values() (of {name: value} with desc=False)
+
+        With previous only the values changed since it are written, null ones included.
+        """
+        return "{" + ",".join(self.__fragments("json", desc, previous)) + "}"
+
+    def to_msgpack(self, previous=None, desc=True):
+        """ MessagePack of what to_json() writes, needs the msgpack package """
+        fragments = self.__fragments("msgpack", desc, previous)
+        return _msgpack_map(len(fragments)) + b"".join(fragments)
+
+    def to_bytes(self):
+        """ Raw words, timestamp and read times as compact bytes, see from_bytes() """
+        words = self.raw if type(self.raw) is array else array("H", self.raw)
+        stamps = self.stamps
+        if not _LITTLE:
+            words = array("H", words)
+            words.byteswap()
+        data = BYTES_HEADER.pack(BYTES_MAGIC, BYTES_VERSION, HAS_STAMPS if stamps is not None else 0,
+                                    self.byteorder.encode(), self.unit, _tables_of(self.plan).crc, self.timestamp) + words.tobytes()
+        if stamps is not None:
+            if not _LITTLE:
+                stamps = array("d", stamps)
+                stamps.byteswap()
+            data += stamps.tobytes()
+        return data
+
+    @classmethod
+    def from_bytes(cls, data, plan=None, lazy=True):
+        """ Snapshot of the to_bytes() data, decoded with plan (default the PA-AW-MBS-1 one) """
+        if plan is None:
+            from .pa_aw_mbs import DECODE_PLAN as plan
+        data = memoryview(data)
+        if len(data) < BYTES_HEADER.size:
+            raise ValueError("Truncated snapshot data")
+        magic, version, flags, byteorder, unit, crc, timestamp = BYTES_HEADER.unpack_from(data)
+        if magic != BYTES_MAGIC or version != BYTES_VERSION:
+            raise ValueError(f"Not a version {BYTES_VERSION} snapshot")
+        if crc != _tables_of(plan).crc:
+            raise ValueError("Snapshot of a different register layout")
+        size = 2 * plan.frame_size
+        expected = BYTES_HEADER.size + size + (4 * size if flags & HAS_STAMPS else 0)
+        if len(data) != expected:
+            raise ValueError(f"Snapshot data of {len(data)} bytes, {expected} expected")
+        raw = array("H")
+        raw.frombytes(data[BYTES_HEADER.size:BYTES_HEADER.size + size])
+        stamps = None
+        if flags & HAS_STAMPS:
+            stamps = array("d")
+            stamps.frombytes(data[BYTES_HEADER.size + size:])
+        if not _LITTLE:
+            raw.byteswap()
+            if stamps is not None:
+                stamps.byteswap()
+        return cls(plan, raw, unit, byteorder.decode(), timestamp=timestamp, lazy=lazy, stamps=stamps)
+
+    @property
+    def is_lazy(self):
+        return isinstance(self._values, list)
+
+    def items(self):
+        """ Iterate over (name, mapped value) pairs """
+        self.__decode_all()
+        return zip(self.plan.by_name, self._mvalues)
+
+    def valid_values(self):
+        """ Return {name: {"value": mapped value, "desc": description}} for not null values """
+        self.__decode_all()
+        result = {}
+        for entry, mvalue in zip(self.plan.entries, self._mvalues):
+            if mvalue is not None:
+                result[entry.name] = {"value": mvalue, "desc": entry.desc}
+        return result
+
+    def __decode(self, index):
+        """ Decode and memoize a single value of a lazy snapshot """
+        entry = self.plan.entries[index]
+        value, mvalue = self.plan.decode_raw(entry, self.raw[entry.position], self.unit, self.byteorder)
+        self._values[index] = value
+        self._mvalues[index] = mvalue
+        return value, mvalue
+
+    def __decode_all(self):
+        if self.is_lazy and _PENDING in self._values:
+            values, mvalues = self.plan.decode_frame(self.raw, self.unit, self.byteorder)
+            self._values[:] = values
+            self._mvalues[:] = mvalues
@@ -8,6 +8,7 @@ setup(name='pyModbusIntesisBox',
       author='Gianfranco Di Prinzio',
       author_email='gianfrdp@inwind.it',
       license='MIT',
-      packages=['intesisbox'],
+      packages=['intesisbox', 'intesisbox.simulator'],
+      extras_require={'msgpack': ['msgpack'], 'asyncio': ['pymodbus>=3.0,<3.10']},
       classifiers=['Development Status :: 3 - Alpha', 'Programming Language :: Python :: 3.7', 'Topic :: Scientific/Engineering :: Interface Engine/Protocol Translator']
 )
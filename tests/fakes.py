@@ -0,0 +1,115 @@
+'''
+In-process PA-AW-MBS-1 stand-in for the tests: answers from a register image
+'''
+import asyncio
+from array import array
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, INTESIS_NULL
+
+
+def swap(word):
+    return ((word & 0xFF) << 8) | (word >> 8)
+
+
+def frame(words, byteorder=">"):
+    """ Null frame with words {name: device word}, stored as byteorder sends them """
+    store = swap if byteorder == "<" else (lambda word: word)
+    raw = array("H", [store(INTESIS_NULL)]) * DECODE_PLAN.frame_size
+    for name, word in words.items():
+        raw[DECODE_PLAN.by_name[name].position] = store(word)
+    return raw
+
+
+class Response:
+    def __init__(self, registers=None, error=False, exception_code=None):
+        self.registers = registers
+        self.error = error
+        if exception_code is not None:
+            self.exception_code = exception_code
+
+    def isError(self):
+        return self.error
+
+
+class FakeClient:
+    """ Synchronous pymodbus client stand-in, every mapped register set to its address """
+
+    def __init__(self):
+        self.registers = {entry.reg: entry.reg for entry in DECODE_PLAN.entries}
+        self.reads = []
+        # Every request answered with an error response while set
+        self.fail = False
+        # write_registers (FC16) answered with IllegalFunction when False
+        self.fc16 = True
+        # (function code, address, words) of every write request
+        self.writes = []
+
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.reads.append((address, count))
+        if self.fail:
+            return Response(error=True)
+        return Response([self.registers.get(reg, INTESIS_NULL) for reg in range(address, address + count)])
+
+    def write_register(self, address, value, unit=1, **kwargs):
+        self.writes.append((6, address, [value]))
+        if self.fail:
+            return Response(error=True)
+        self.registers[address] = value
+        return Response()
+
+    def write_registers(self, address, values, unit=1, **kwargs):
+        self.writes.append((16, address, list(values)))
+        if not self.fc16:
+            return Response(error=True, exception_code=1)
+        if self.fail:
+            return Response(error=True)
+        self.registers.update(zip(range(address, address + len(values)), values))
+        return Response()
+
+
+class AsyncFakeClient:
+    """ pymodbus (>= 3) async client stand-in over a FakeClient, each request taking delay seconds """
+
+    def __init__(self, delay=0):
+        self.sync = FakeClient()
+        self.delay = delay
+
+    async def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    async def read_holding_registers(self, address, count=1, slave=1):
+        await asyncio.sleep(self.delay)
+        return self.sync.read_holding_registers(address, count, slave)
+
+    async def write_register(self, address, value, slave=1):
+        await asyncio.sleep(self.delay)
+        return self.sync.write_register(address, value, slave)
+
+    async def write_registers(self, address, values, slave=1):
+        await asyncio.sleep(self.delay)
+        return self.sync.write_registers(address, values, slave)
+
+
+class NoLock:
+    """ BusLock stand-in, no lock file """
+
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.aio import AsyncAquareaModbus
+from intesisbox.pa_aw_mbs import BusBusyError, CircuitBreaker
+
+from fakes import AsyncFakeClient
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class AsyncAquareaTest(unittest.TestCase):
+
+    def device(self, client=None, **kwargs):
+        self.client = client or AsyncFakeClient()
+        return AsyncAquareaModbus(port="test", client=self.client, retry=0, **kwargs)
+
+    def test_poll_and_send(self):
+        async def scenario():
+            aquarea = self.device()
+            self.assertTrue(await aquarea.connect())
+            result = await aquarea.poll_data()
+            self.assertTrue(result.ok)
+            self.assertEqual(self.client.sync.reads, [(0, 91), (1000, 8)])
+            self.assertEqual(aquarea.tank_setpoint_temp, 3.3)
+            aquarea.tank_setpoint_temp = 45
+            aquarea.heat_interval = 10
+            self.assertIsNone(await aquarea.send_cmd())
+            self.assertEqual(self.client.sync.writes, [(16, 33, [450, 10])])
+            await aquarea.poll_data(names="tank")
+            self.assertEqual(aquarea.tank_setpoint_temp, 45)
+        run(scenario())
+
+    def test_send_with_verify(self):
+        async def scenario():
+            aquarea = self.device()
+            await aquarea.connect()
+            aquarea.tank_setpoint_temp = 45
+            results = await aquarea.send_cmd(verify=True, deadline=1)
+            self.assertTrue(results["tank_setpoint_temp"].ok)
+            self.assertEqual(self.client.sync.reads, [(33, 1)])
+            self.assertEqual(aquarea.tank_setpoint_temp, 45)
+        run(scenario())
+
+    def test_not_connected(self):
+        async def scenario():
+            aquarea = self.device()
+            result = await aquarea.poll_data()
+            self.assertEqual(result.skipped, "not connected")
+            self.assertEqual(self.client.sync.reads, [])
+        run(scenario())
+
+    def test_failed_read_stops_the_poll(self):
+        async def scenario():
+            aquarea = self.device()
+            await aquarea.connect()
+            self.client.sync.fail = True
+            result = await aquarea.poll_data()
+            self.assertFalse(result.ok)
+            self.assertEqual([block.error for block in result.blocks][1], "not attempted after a failed read")
+            self.assertIn("tank_setpoint_temp", result.stale)
+            self.assertIsNone(aquarea.snapshot)
+        run(scenario())
+
+    def test_timeout_keeps_the_completed_reads(self):
+        async def scenario():
+            aquarea = self.device(AsyncFakeClient(delay=0.2))
+            await aquarea.connect()
+            result = await aquarea.poll_data(timeout=0.3)
+            self.assertFalse(result.ok)
+            self.assertEqual([block.ok for block in result.blocks], [True, False])
+            self.assertEqual(result.blocks[1].error, "cancelled")
+            self.assertEqual(aquarea.tank_setpoint_temp, 3.3)
+        run(scenario())
+
+    def test_lockwait(self):
+        async def scenario():
+            aquarea = self.device(AsyncFakeClient(delay=0.2), lockwait=0.05)
+            await aquarea.connect()
+            first = asyncio.ensure_future(aquarea.poll_data())
+            await asyncio.sleep(0.01)
+            with self.assertRaises(BusBusyError):
+                await aquarea.poll_data()
+            self.assertTrue((await first).ok)
+        run(scenario())
+
+    def test_breaker_skips_polls_of_a_failing_device(self):
+        async def scenario():
+            aquarea = self.device(breaker=CircuitBreaker(threshold=1, cooldown=60))
+            await aquarea.connect()
+            self.client.sync.fail = True
+            self.assertIsNone((await aquarea.poll_data()).skipped)
+            self.assertEqual(aquarea.breaker.state, CircuitBreaker.OPEN)
+            reads = len(self.client.sync.reads)
+            self.assertEqual((await aquarea.poll_data()).skipped, "circuit open")
+            self.assertEqual(len(self.client.sync.reads), reads)
+        run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+@unittest.skipIf(importlib.util.find_spec("pymodbus") is None, "pymodbus not installed")
+class SuiteSmokeTest(unittest.TestCase):
+
+    def run_suite(self, *args):
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+        return subprocess.run([sys.executable, os.path.join(ROOT, "benchmarks", "suite.py"), "--number", "10", "--repeat", "1", "--commands", "3"] + list(args),
+                              env=env, capture_output=True, text=True, check=True, timeout=120)
+
+    def test_json_report_and_baseline(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, "run.json")
+        self.run_suite("--output", output)
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(set(report["meta"]), {"timestamp", "python", "pymodbus", "platform", "commit"})
+        results = report["results"]
+        self.assertEqual(set(results), {"poll_e2e", "decode", "send_cmd", "get_all_valid_values", "properties", "rtu_tcp", "replay", "serialize"})
+        for name, data in results.items():
+            if "skipped" not in data:
+                self.assertGreater(data["per_op_us"], 0, name)
+        self.assertEqual(results["send_cmd"]["commands"], 3)
+
+        compared = self.run_suite("--only", "poll_e2e", "decode", "--baseline", output)
+        self.assertEqual(set(json.loads(compared.stdout)["results"]), {"poll_e2e", "decode"})
+        self.assertIn("poll_e2e", compared.stderr)
+        self.assertIn("decode", compared.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.bus import AquareaBus
+
+from fakes import FakeClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AquareaBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.client = FakeClient()
+        self.bus = AquareaBus(port="test-bus", client=self.client, silence=0, clock=self.clock)
+        self.house = self.bus.device(2, interval=10)
+        self.garage = self.bus.device(3, interval=10)
+        self.bus.connect()
+
+    def test_queued_commands_go_first(self):
+        self.garage.tank_setpoint_temp = 45
+        self.assertEqual(self.bus.step()[:2], (3, "send"))
+        self.assertEqual(self.client.registers[33], 450)
+        self.assertEqual({self.bus.step()[0], self.bus.step()[0]}, {2, 3})
+        self.assertIsNone(self.bus.step())
+
+    def test_polls_follow_interval_and_weight(self):
+        served = []
+        for tick in range(3):
+            self.clock.now = tick * 10
+            while (step := self.bus.step()) is not None:
+                served.append(step[0])
+        self.assertEqual(sorted(served), [2, 2, 2, 3, 3, 3])
+        self.assertEqual(self.bus.stats(30)[2]["polls"], 3)
+
+    def test_disconnected_slave_does_not_starve_the_others(self):
+        self.house.tank_setpoint_temp = 45
+        self.house.close()
+        steps = [self.bus.step() for _ in range(3)]
+        self.assertEqual(sorted((slave, op) for slave, op, result in steps[:2]), [(2, "poll"), (3, "poll")])
+        self.assertTrue(steps[1][2].ok or steps[0][2].ok)
+        self.assertIsNone(steps[2])
+        self.assertEqual(self.house.qsize, 1)
+        self.assertGreater(self.bus.next_due(), 0)
+
+
+class SlowClient(FakeClient):
+    """ Each read takes a second of clock """
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.clock.now += 1
+        return super().read_holding_registers(address, count, unit, **kwargs)
+
+
+class AquareaBusWeightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.bus = AquareaBus(port="test-bus", client=SlowClient(self.clock), silence=0, clock=self.clock)
+
+    def serve(self, steps):
+        served = []
+        for _ in range(steps):
+            served.append(self.bus.step()[0])
+        return served
+
+    def test_saturated_bus_is_shared_by_weight(self):
+        self.bus.device(2, interval=0, weight=2, names="mode")
+        self.bus.device(3, interval=0, weight=1, names="mode")
+        self.bus.connect()
+        served = self.serve(30)
+        self.assertEqual((served.count(2), served.count(3)), (20, 10))
+        stats = self.bus.stats()
+        self.assertEqual((stats[2]["bus_time"], stats[3]["bus_time"]), (20, 10))
+
+    def test_equal_weights_alternate(self):
+        self.bus.device(2, interval=0, names="mode")
+        self.bus.device(3, interval=0, names="mode")
+        self.bus.connect()
+        served = self.serve(6)
+        self.assertEqual(sorted(served[0:2]), [2, 3])
+        self.assertEqual(sorted(served[2:4]), [2, 3])
+
+    def test_late_comer_starts_level(self):
+        self.bus.device(2, interval=0, names="mode")
+        self.bus.connect()
+        self.serve(10)
+        self.bus.device(3, interval=0, names="mode").connect()
+        served = self.serve(10)
+        self.assertEqual((served.count(2), served.count(3)), (5, 5))
+
+    def test_invalid_devices(self):
+        self.bus.device(2)
+        with self.assertRaises(ValueError):
+            self.bus.device(2)
+        with self.assertRaises(ValueError):
+            self.bus.device(3, weight=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from intesisbox.pa_aw_mbs import BusBusyError, BusLock, bus_lock
+
+
+class BusLockPathTest(unittest.TestCase):
+
+    def test_symlinked_port_shares_the_lock_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        link = os.path.join(directory, "usb-serial-port0")
+        os.symlink(os.devnull, link)
+        self.assertEqual(bus_lock(link).path, bus_lock(os.devnull).path)
+
+
+class BusLockStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.port = os.path.join(directory, "ttyTEST")
+        # Lock files live in /run/lock, created by the first bus_lock of the port
+        self.addCleanup(os.unlink, bus_lock(self.port).path)
+
+    def hold(self, lock, release):
+        """ Take lock in another thread until release is set """
+        held = threading.Event()
+
+        def run():
+            with lock:
+                held.set()
+                release.wait(5)
+        thread = threading.Thread(target=run)
+        thread.start()
+        held.wait(5)
+        return thread
+
+    def test_acquisitions_are_counted(self):
+        lock = BusLock(self.port)
+        for _ in range(3):
+            with lock:
+                pass
+        stats = lock.stats
+        self.assertEqual((stats["acquired"], stats["busy"], stats["timeouts"]), (3, 0, 0))
+        self.assertGreaterEqual(stats["wait_max"], stats["wait_last"])
+
+    def test_busy_and_timeout(self):
+        lock = BusLock(self.port, lockwait=0.1)
+        release = threading.Event()
+        thread = self.hold(lock, release)
+        self.assertFalse(lock.acquire(blocking=False))
+        with self.assertRaises(BusBusyError):
+            lock.acquire()
+        release.set()
+        thread.join(5)
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+        stats = lock.stats
+        self.assertEqual((stats["acquired"], stats["busy"], stats["timeouts"]), (2, 1, 1))
+
+    def test_wait_is_measured(self):
+        lock = BusLock(self.port)
+        release = threading.Event()
+        thread = self.hold(lock, release)
+        threading.Timer(0.1, release.set).start()
+        with lock:
+            pass
+        thread.join(5)
+        self.assertGreaterEqual(lock.stats["wait_last"], 0.09)
+        self.assertEqual(lock.stats["wait_max"], lock.stats["wait_last"])
+
+    def test_other_process_holds_the_bus(self):
+        code = ("import sys, time\n"
+                "from intesisbox.pa_aw_mbs import bus_lock\n"
+                "lock = bus_lock(sys.argv[1])\n"
+                "lock.acquire_write_lock()\n"
+                "print('held', flush=True)\n"
+                "sys.stdin.readline()\n")
+        holder = subprocess.Popen([sys.executable, "-c", code, self.port], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            self.assertEqual(holder.stdout.readline().strip(), "held")
+            lock = BusLock(self.port, lockwait=0.1)
+            self.assertFalse(lock.acquire(blocking=False))
+            with self.assertRaises(BusBusyError):
+                lock.acquire()
+        finally:
+            holder.communicate("\n", timeout=5)
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
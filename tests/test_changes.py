@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, AquareaModbus
+
+from fakes import FakeClient, NoLock
+
+
+class ChangesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock(), retry=0)
+        self.aquarea.connect()
+        self.calls = []
+
+    def record(self, name, value, old):
+        self.calls.append((name, value, old))
+
+    def test_first_poll_reports_every_register(self):
+        self.aquarea.poll_data()
+        self.assertEqual(set(self.aquarea.changes), {entry.name for entry in DECODE_PLAN.entries})
+
+    def test_changes_hold_only_changed_registers(self):
+        self.aquarea.poll_data()
+        self.aquarea.poll_data()
+        self.assertEqual(self.aquarea.changes, {})
+        self.client.registers[33] = 480
+        self.client.registers[4] = 1
+        self.aquarea.poll_data()
+        self.assertEqual(self.aquarea.changes, {"tank_setpoint_temp": 48.0, "mode": "Heat"})
+
+    def test_snapshot_diff(self):
+        self.aquarea.poll_data()
+        previous = self.aquarea.snapshot
+        self.assertEqual(len(previous.diff(None)), len(DECODE_PLAN.entries))
+        self.client.registers[32] = 420
+        self.aquarea.poll_data()
+        self.assertEqual([entry.name for entry in self.aquarea.snapshot.diff(previous)], ["tank_water_temp"])
+        self.assertEqual(self.aquarea.snapshot.diff(self.aquarea.snapshot), [])
+
+    def test_callback_by_name(self):
+        self.aquarea.poll_data()
+        self.aquarea.on_change("tank_setpoint_temp", self.record)
+        self.client.registers[33] = 480
+        self.client.registers[32] = 420
+        self.aquarea.poll_data()
+        self.assertEqual(self.calls, [("tank_setpoint_temp", 48.0, 3.3)])
+
+    def test_callback_by_group(self):
+        self.aquarea.poll_data()
+        self.aquarea.on_change("tank", self.record)
+        self.client.registers[33] = 480
+        self.client.registers[4] = 1
+        self.aquarea.poll_data()
+        self.assertEqual([call[0] for call in self.calls], ["tank_setpoint_temp"])
+
+    def test_callback_for_every_register(self):
+        self.aquarea.on_change(None, self.record)
+        self.aquarea.poll_data()
+        self.assertEqual(len(self.calls), len(DECODE_PLAN.entries))
+        self.assertTrue(all(old is None for _, _, old in self.calls))
+        del self.calls[:]
+        self.client.registers[4] = 1
+        self.aquarea.poll_data()
+        self.assertEqual(self.calls, [("mode", "Heat", "Cool_Tank")])
+
+    def test_failing_callback_is_logged(self):
+        def fail(name, value, old):
+            raise RuntimeError("callback")
+        self.aquarea.on_change("mode", fail)
+        self.aquarea.on_change("mode", self.record)
+        with self.assertLogs("intesisbox.pa_aw_mbs", "ERROR") as logs:
+            self.aquarea.poll_data()
+        self.assertIn("Change callback for mode failed", logs.output[0])
+        self.assertEqual(self.calls, [("mode", "Cool_Tank", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.daemon import AquareaClient, AquareaDaemon, AquareaDaemonError
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient, NoLock
+
+
+class DaemonPollTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock())
+        self.aquarea.connect()
+        self.daemon = AquareaDaemon(self.aquarea, socket_path=os.path.join(tempfile.mkdtemp(), "aquarea.sock"), max_age=60)
+
+    def test_full_poll_after_selective_poll_reads_the_missing_registers(self):
+        first = self.daemon.handle({"op": "poll", "names": ["telemetry"]})
+        self.assertIsNotNone(first["result"])
+        self.assertIsNone(self.aquarea.mode)
+
+        second = self.daemon.handle({"op": "poll", "names": None})
+        self.assertIsNotNone(second["result"])
+        self.assertEqual(self.aquarea.snapshot.value("mode"), 4)
+        self.assertEqual(self.aquarea.snapshot.value("tank_setpoint_temp"), 3.3)
+        # The telemetry registers read by the first poll were not stale
+        self.assertNotIn("tank_water_temp", second["result"].stale)
+
+    def test_fresh_registers_are_served_from_cache(self):
+        self.daemon.handle({"op": "poll", "names": None})
+        reads = len(self.client.reads)
+        reply = self.daemon.handle({"op": "poll", "names": ["mode"]})
+        self.assertIsNone(reply["result"])
+        self.assertEqual(len(self.client.reads), reads)
+
+    def test_stale_registers_are_polled_again(self):
+        self.daemon.handle({"op": "poll", "names": None})
+        reply = self.daemon.handle({"op": "poll", "names": ["mode"], "max_age": -1})
+        self.assertIsNotNone(reply["result"])
+
+
+class DaemonSendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock())
+        self.aquarea.connect()
+        self.daemon = AquareaDaemon(self.aquarea, socket_path=os.path.join(tempfile.mkdtemp(), "aquarea.sock"))
+
+    def test_valid_writes_are_sent(self):
+        self.daemon.handle({"op": "send", "writes": [[33, 480], [4, 3]]})
+        self.assertEqual(self.client.registers[33], 480)
+        self.assertEqual(self.client.registers[4], 3)
+
+    def test_invalid_writes_are_rejected_before_the_bus(self):
+        for writes in ([[33, 990]], [[4, 9]], [[1, 10]], [[33, 480], [4, 0]]):
+            with self.assertRaises(ValueError):
+                self.daemon.handle({"op": "send", "writes": writes})
+        self.assertEqual(self.client.registers[33], 33)
+        self.assertEqual(self.aquarea.qsize, 0)
+
+
+class DaemonSocketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock(), retry=0)
+        aquarea.connect()
+        path = os.path.join(tempfile.mkdtemp(), "aquarea.sock")
+        self.daemon = AquareaDaemon(aquarea, socket_path=path, max_age=60)
+        self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.thread.start()
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+        self.aquarea = AquareaClient(socket_path=path, timeout=5)
+
+    def tearDown(self):
+        self.aquarea.close()
+        self.daemon.shutdown()
+        self.thread.join(5)
+
+    def test_poll_then_cached(self):
+        result = self.aquarea.poll_data()
+        self.assertTrue(result.ok)
+        self.assertIsNone(result.skipped)
+        self.assertEqual(self.aquarea.tank_setpoint_temp, 3.3)
+        self.assertEqual(self.aquarea.mode, "Cool_Tank")
+        reads = len(self.client.reads)
+        self.assertEqual(self.aquarea.poll_data(names="tank").skipped, "cached")
+        self.assertEqual(len(self.client.reads), reads)
+
+    def test_send_with_verify(self):
+        self.aquarea.connect()
+        self.aquarea.tank_setpoint_temp = 45
+        self.aquarea.mode = "Heat"
+        results = self.aquarea.send_cmd(verify=True, deadline=1)
+        self.assertTrue(results["tank_setpoint_temp"].ok)
+        self.assertEqual(results["mode"].observed, 1)
+        self.assertEqual(self.client.registers[33], 450)
+        self.aquarea.poll_data(names=["mode"], max_age=-1)
+        self.assertEqual(self.aquarea.mode, "Heat")
+
+    def test_errors_are_raised_on_the_client(self):
+        # Queued past the setter range check, rejected by the daemon
+        self.aquarea._enqueue(33, 990)
+        with self.assertRaises(AquareaDaemonError):
+            self.aquarea.send_cmd()
+        self.client.fail = True
+        with self.assertRaises(AquareaDaemonError):
+            self.aquarea.poll_data()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, ERROR_MAP, INTESISBOX_MAP, INTESIS_NULL
+
+try:
+    from pymodbus.constants import Endian
+    from pymodbus.payload import BinaryPayloadDecoder
+except ImportError:
+    BinaryPayloadDecoder = None
+
+
+def baseline_decode(entry, word, unit, byteorder):
+    """ (value, mapped value) of word as the per-register BinaryPayloadDecoder path decoded it """
+    order = Endian.Big if byteorder == ">" else Endian.Little
+    if BinaryPayloadDecoder.fromRegisters([word], byteorder=order, wordorder=Endian.Big).decode_16bit_uint() == INTESIS_NULL:
+        return None, None
+    value = BinaryPayloadDecoder.fromRegisters([word], byteorder=order, wordorder=Endian.Big).decode_16bit_int()
+    spec = INTESISBOX_MAP[entry.reg]
+    kind = spec["type"]
+    if kind == "temp":
+        value = float(value / unit)
+    elif kind == "min":
+        value = value * 30
+    elif kind == "err":
+        value = f"{ERROR_MAP[value]['code']}: {ERROR_MAP[value]['desc']}" if value in ERROR_MAP else "0: Unknown " + str(value)
+    values = spec.get("values")
+    return value, values.get(value, value) if values else value
+
+
+def random_frame(rnd):
+    """ Frame of mapped values, nulls, error codes and arbitrary words """
+    frame = DECODE_PLAN.null_frame()
+    for entry in DECODE_PLAN.entries:
+        spec = INTESISBOX_MAP[entry.reg]
+        pick = rnd.random()
+        if pick < 0.1:
+            continue
+        if "values" in spec and pick < 0.6:
+            word = rnd.choice(list(spec["values"]))
+        elif spec["type"] == "err" and pick < 0.6:
+            word = rnd.choice(list(ERROR_MAP))
+        else:
+            word = rnd.randrange(0x10000)
+        frame[entry.position] = word & 0xFFFF
+    return frame
+
+
+@unittest.skipIf(BinaryPayloadDecoder is None, "pymodbus payload decoder not available")
+class DecodePlanBaselineTest(unittest.TestCase):
+
+    def test_decode_frame_matches_the_baseline_decoder(self):
+        rnd = random.Random(1)
+        for byteorder in (">", "<"):
+            for unit in (10, 1):
+                for _ in range(20):
+                    frame = random_frame(rnd)
+                    values, mvalues = DECODE_PLAN.decode_frame(frame, unit, byteorder)
+                    for entry, value, mvalue in zip(DECODE_PLAN.entries, values, mvalues):
+                        self.assertEqual((value, mvalue), baseline_decode(entry, frame[entry.position], unit, byteorder), entry.name)
+
+    def test_decode_block_and_raw_agree_with_decode_frame(self):
+        frame = random_frame(random.Random(2))
+        values, mvalues = DECODE_PLAN.decode_frame(frame)
+        decoded = {}
+        for block in DECODE_PLAN.blocks:
+            registers = frame[block.base:block.base + block.count]
+            decoded.update((entry.name, (value, mvalue)) for entry, value, mvalue in DECODE_PLAN.decode_block(block, registers))
+        for entry, value, mvalue in zip(DECODE_PLAN.entries, values, mvalues):
+            self.assertEqual(decoded[entry.name], (value, mvalue))
+            self.assertEqual(DECODE_PLAN.decode_raw(entry, frame[entry.position]), (value, mvalue))
+
+    def test_blocks_cover_the_readable_map(self):
+        self.assertEqual([(block.address, block.count) for block in DECODE_PLAN.blocks], [(0, 91), (1000, 8)])
+        self.assertEqual(DECODE_PLAN.frame_size, 99)
+
+
+def reads(registers, **kwargs):
+    return [(address, count) for block, address, count in DECODE_PLAN.read_ranges(registers, **kwargs)]
+
+
+class ReadRangesTest(unittest.TestCase):
+
+    def test_holes_up_to_max_gap_are_read_through(self):
+        self.assertEqual(reads([0, 3, 10], max_gap=6), [(0, 11)])
+        self.assertEqual(reads([0, 3, 10], max_gap=2), [(0, 4), (10, 1)])
+
+    def test_max_gap_is_respected_whatever_the_read_count(self):
+        self.assertEqual(reads([0, 45, 90], max_gap=0), [(0, 1), (45, 1), (90, 1)])
+        self.assertEqual(reads([0, 45, 90, 1000], max_gap=0), [(0, 1), (45, 1), (90, 1), (1000, 1)])
+
+    def test_reads_do_not_cross_blocks_or_max_count(self):
+        self.assertEqual(reads([90, 1000], max_gap=2000), [(90, 1), (1000, 1)])
+        self.assertEqual(reads([0, 5, 10], max_gap=10, max_count=8), [(0, 6), (10, 1)])
+
+    def test_unknown_register(self):
+        with self.assertRaises(ValueError):
+            reads([500])
+
+
+if __name__ == "__main__":
+    unittest.main()
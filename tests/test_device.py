@@ -0,0 +1,59 @@
+import enum
+import importlib.util
+import os
+import subprocess
+import sys
+import unittest
+
+from intesisbox import pa_aw_mbs
+from intesisbox.pa_aw_mbs import AquareaDevice, BIG, LITTLE
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+class Endian(str, enum.Enum):
+    """ pymodbus >= 3.5 Endian """
+    AUTO = "@"
+    BIG = ">"
+    LITTLE = "<"
+
+
+class ByteOrderTest(unittest.TestCase):
+
+    def test_pymodbus_endian_values_are_translated(self):
+        for order, expected in ((">", BIG), ("<", LITTLE), (Endian.BIG, BIG), (Endian.LITTLE, LITTLE)):
+            device = AquareaDevice(byteorder=order, wordorder=order)
+            self.assertEqual(device.byteorder, expected)
+            self.assertIs(type(device.byteorder), str)
+
+    def test_unknown_order_is_rejected(self):
+        for order in (Endian.AUTO, "big-endian", None):
+            with self.assertRaises(ValueError):
+                AquareaDevice(byteorder=order)
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def loaded(self, code, modules):
+        """ Those of modules that running code in a fresh interpreter imports """
+        report = f"\nimport sys\nprint(' '.join(name for name in {modules!r} if name in sys.modules))"
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+        out = subprocess.run([sys.executable, "-c", code + report], env=env, capture_output=True, text=True, check=True).stdout
+        return out.split()
+
+    def test_import_does_not_load_pymodbus(self):
+        heavy = ("pymodbus", "serial", "fasteners", "asyncio")
+        self.assertEqual(self.loaded("import intesisbox.pa_aw_mbs, intesisbox.daemon, intesisbox.snapshot", heavy), [])
+        self.assertEqual(self.loaded("import intesisbox.aio", heavy), ["asyncio"])
+
+    @unittest.skipIf(importlib.util.find_spec("pymodbus") is None, "pymodbus not installed")
+    def test_former_module_names_resolve_on_access(self):
+        from pymodbus.exceptions import ModbusException
+        self.assertIn(ModbusException, pa_aw_mbs.RETRY_EXCEPTIONS)
+        self.assertIs(pa_aw_mbs.ModbusClient, pa_aw_mbs.client_class())
+        with self.assertRaises(AttributeError):
+            pa_aw_mbs.no_such_name
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.exporter import CONTENT_TYPE, AquareaExporter, MetricsRenderer
+from intesisbox.pa_aw_mbs import DECODE_PLAN, AquareaModbus
+from intesisbox.snapshot import AquareaSnapshot
+
+from fakes import FakeClient, NoLock, frame
+
+
+def samples(body):
+    return dict(line.rsplit(" ", 1) for line in body.decode().splitlines() if not line.startswith("#"))
+
+
+class MetricsRendererTest(unittest.TestCase):
+
+    def test_error_codes_and_nulls_in_both_byte_orders(self):
+        renderer = MetricsRenderer(DECODE_PLAN, "aquarea", {"slave": 2})
+        for byteorder in (">", "<"):
+            snapshot = AquareaSnapshot(DECODE_PLAN, frame({"error": 20, "tank_water_temp": 481}, byteorder), 10, byteorder)
+            self.assertEqual(samples(renderer.render(snapshot)),
+                             {'aquarea_error{slave="2"}': "20", 'aquarea_tank_water_temp{slave="2"}': "48.1"})
+
+    def test_unchanged_snapshot_is_not_rendered_again(self):
+        renderer = MetricsRenderer(DECODE_PLAN)
+        snapshot = AquareaSnapshot(DECODE_PLAN, frame({"mode": 1}), 10)
+        body = renderer.render(snapshot)
+        self.assertIn(b"# TYPE aquarea_mode gauge\naquarea_mode 1\n", body)
+        self.assertIs(renderer.render(AquareaSnapshot(DECODE_PLAN, frame({"mode": 1}), 10)), body)
+        self.assertEqual(renderer.renders, 1)
+
+
+class AquareaExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", slave=2, client=self.client, lock=NoLock(), retry=0)
+        self.aquarea.connect()
+
+    def test_metrics_after_polls(self):
+        exporter = AquareaExporter(self.aquarea, interval=None, clock=lambda: 0)
+        self.assertEqual(samples(exporter.metrics()), {'aquarea_up{slave="2"}': "0", 'aquarea_polls_total{slave="2"}': "0",
+                                                       'aquarea_poll_failures_total{slave="2"}': "0", 'aquarea_metrics_renders_total{slave="2"}': "0"})
+        exporter.poll()
+        metrics = samples(exporter.metrics(now=self.aquarea.snapshot.timestamp + 5))
+        self.assertEqual(metrics['aquarea_tank_setpoint_temp{slave="2"}'], "3.3")
+        self.assertEqual(metrics['aquarea_up{slave="2"}'], "1")
+        self.assertEqual(metrics['aquarea_snapshot_age_seconds{slave="2"}'], "5.0")
+        self.assertEqual(metrics['aquarea_stale_registers{slave="2"}'], "0")
+        self.client.fail = True
+        exporter.poll()
+        metrics = samples(exporter.metrics())
+        self.assertEqual((metrics['aquarea_up{slave="2"}'], metrics['aquarea_polls_total{slave="2"}'], metrics['aquarea_poll_failures_total{slave="2"}']),
+                         ("0", "2", "1"))
+        # The last snapshot is still exported
+        self.assertEqual(metrics['aquarea_tank_setpoint_temp{slave="2"}'], "3.3")
+
+    def test_http_scrape(self):
+        with AquareaExporter(self.aquarea, interval=60, port=0) as exporter:
+            url = f"http://127.0.0.1:{exporter.port}"
+            # First poll of the poll thread
+            for _ in range(100):
+                if exporter.polls:
+                    break
+                time.sleep(0.01)
+            with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+                self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE)
+                body = response.read()
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url + "/other", timeout=5)
+        self.assertEqual(exporter.polls, 1)
+        self.assertEqual(exporter.scrapes, 1)
+        self.assertEqual(samples(body)['aquarea_mode{slave="2"}'], "4")
+        self.assertEqual(self.client.reads, [(0, 91), (1000, 8)])
+
+
+if __name__ == "__main__":
+    unittest.main()
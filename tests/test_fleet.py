@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.fleet import AquareaFleet
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient, NoLock
+
+
+class SlowClient(FakeClient):
+    """ Each read takes delay seconds, recording the thread that made it """
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.threads = set()
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return super().read_holding_registers(address, count, unit, **kwargs)
+
+
+class AquareaFleetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = AquareaFleet()
+        self.clients = {}
+
+    def add(self, name, port, bus=None, client=None):
+        self.clients[name] = client or SlowClient(0.2)
+        return self.fleet.add(name, AquareaModbus(port=port, client=self.clients[name], lock=NoLock(), retry=0), bus=bus)
+
+    def test_buses_default_to_the_port(self):
+        self.add("house", "/dev/ttyA")
+        self.add("garage", "/dev/ttyA")
+        self.add("barn", "/dev/ttyB")
+        self.add("shed", "/dev/ttyB", bus="gateway")
+        self.assertEqual(self.fleet.buses, {"/dev/ttyA": ["house", "garage"], "/dev/ttyB": ["barn"], "gateway": ["shed"]})
+        with self.assertRaises(ValueError):
+            self.add("house", "/dev/ttyC")
+
+    def test_buses_are_polled_in_parallel(self):
+        self.add("house", "/dev/ttyA")
+        self.add("garage", "/dev/ttyA")
+        self.add("barn", "/dev/ttyB")
+        self.assertEqual(self.fleet.connect(), {"house": True, "garage": True, "barn": True})
+        result = self.fleet.poll(names="mode")
+        self.assertEqual(set(result.results), {"house", "garage", "barn"})
+        self.assertTrue(all(poll.ok for poll in result.results.values()))
+        self.assertEqual(result.errors, {})
+        self.assertEqual(result.buses["/dev/ttyA"]["devices"], 2)
+        self.assertEqual(result.buses["/dev/ttyA"]["ok"], 2)
+        # Devices of a bus one after the other, buses side by side
+        self.assertGreaterEqual(result.buses["/dev/ttyA"]["seconds"], 0.4)
+        self.assertLess(result.seconds, 0.55)
+        self.assertEqual(self.clients["house"].threads, self.clients["garage"].threads)
+        self.assertNotEqual(self.clients["house"].threads, self.clients["barn"].threads)
+        self.assertEqual(self.fleet.devices["barn"].mode, "Cool_Tank")
+
+    def test_failures_stay_on_their_device(self):
+        self.add("house", "/dev/ttyA", client=FakeClient())
+        self.add("barn", "/dev/ttyB", client=FakeClient())
+        self.fleet.connect()
+        self.clients["house"].fail = True
+        self.clients["barn"].read_holding_registers = None
+        result = self.fleet.poll()
+        self.assertFalse(result.results["house"].ok)
+        self.assertEqual(result.buses["/dev/ttyA"]["ok"], 0)
+        self.assertIsInstance(result.errors["barn"], TypeError)
+        self.assertNotIn("barn", result.results)
+
+    def test_empty_fleet(self):
+        result = self.fleet.poll()
+        self.assertEqual((result.results, result.errors, result.buses), ({}, {}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
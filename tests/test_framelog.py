@@ -0,0 +1,118 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.framelog import FrameLogReader, FrameLogWriter, record_size
+from intesisbox.pa_aw_mbs import DECODE_PLAN, AquareaModbus
+
+from fakes import FakeClient, NoLock, frame
+
+
+class FrameLogSegmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, timestamps, segment_records=2):
+        with FrameLogWriter(self.directory, segment_records=segment_records) as writer:
+            for timestamp in timestamps:
+                writer.append(array("H", [int(timestamp)]) * DECODE_PLAN.frame_size, timestamp)
+        return FrameLogReader(self.directory)
+
+    def test_duplicate_timestamp_across_segment_boundary(self):
+        with self.write([1.0, 2.0, 2.0, 3.0]) as reader:
+            self.assertEqual([t for t, raw, ok in reader.frames(2.0, 3.0)], [2.0, 2.0, 3.0])
+            self.assertEqual(list(reader.times(2.0, 2.0)), [2.0, 2.0])
+            self.assertEqual(list(reader.column("mode", 2.0)[0]), [2.0, 2.0, 3.0])
+
+    def test_duplicate_timestamp_over_several_segments(self):
+        with self.write([1.0, 2.0, 2.0, 2.0, 2.0, 3.0]) as reader:
+            self.assertEqual(list(reader.times(2.0)), [2.0, 2.0, 2.0, 2.0, 3.0])
+
+    def test_range_within_segments(self):
+        with self.write([1.0, 2.0, 3.0, 4.0, 5.0]) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(list(reader.times(1.5, 4.0)), [2.0, 3.0, 4.0])
+            self.assertEqual(list(reader.times(end=1.0)), [1.0])
+
+
+class FrameLogWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "*.frames")))
+
+    def test_round_trip(self):
+        with FrameLogWriter(self.directory, segment_records=3, index_every=2) as writer:
+            for idx in range(7):
+                writer.append(frame({"tank_water_temp": 400 + idx, "mode": 1}), 100.0 + idx, ok=idx != 3)
+        self.assertEqual(len(self.segments()), 3)
+        with FrameLogReader(self.directory) as reader:
+            self.assertEqual((len(reader), reader.start, reader.end), (7, 100.0, 106.0))
+            self.assertEqual([ok for _, _, ok in reader.frames()], [True, True, True, False, True, True, True])
+            times, words = reader.column("tank_water_temp", 102, 105)
+            self.assertEqual((list(times), list(words)), ([102, 103, 104, 105], [402, 403, 404, 405]))
+            snapshots = list(reader.snapshots(start=105))
+            self.assertEqual([(snapshot.timestamp, snapshot["tank_water_temp"], snapshot["mode"]) for snapshot in snapshots],
+                             [(105, 40.5, "Heat"), (106, 40.6, "Heat")])
+
+    def test_resume_continues_the_last_segment(self):
+        with FrameLogWriter(self.directory, segment_records=4) as writer:
+            for idx in range(2):
+                writer.append(frame({}), float(idx))
+        with FrameLogWriter(self.directory, segment_records=4) as writer:
+            # Earlier than the last record on disk: clamped
+            with self.assertLogs("intesisbox.framelog", "WARNING"):
+                writer.append(frame({}), 0.5)
+            writer.append(frame({}), 2.0)
+            writer.append(frame({}), 3.0)
+        self.assertEqual(len(self.segments()), 2)
+        with FrameLogReader(self.directory) as reader:
+            self.assertEqual(list(reader.times()), [0.0, 1.0, 1.0, 2.0, 3.0])
+
+    def test_torn_record_is_dropped(self):
+        with FrameLogWriter(self.directory) as writer:
+            for idx in range(3):
+                writer.append(frame({"mode": idx}), float(idx))
+        path = self.segments()[0]
+        with open(path, "ab") as f:
+            f.write(bytes(record_size(DECODE_PLAN) // 2))
+        with FrameLogReader(self.directory) as reader:
+            self.assertEqual(len(reader), 3)
+        with FrameLogWriter(self.directory) as writer:
+            writer.append(frame({"mode": 3}), 3.0)
+        with FrameLogReader(self.directory) as reader:
+            self.assertEqual(list(reader.column("mode")[1]), [0, 1, 2, 3])
+
+    def test_append_poll(self):
+        client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=client, lock=NoLock(), retry=0)
+        with FrameLogWriter(self.directory) as writer:
+            self.assertFalse(writer.append_poll(aquarea, aquarea.poll_data()))
+            aquarea.connect()
+            self.assertTrue(writer.append_poll(aquarea, aquarea.poll_data()))
+            client.fail = True
+            self.assertFalse(writer.append_poll(aquarea, aquarea.poll_data()))
+        with FrameLogReader(self.directory) as reader:
+            self.assertEqual(len(reader), 1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            FrameLogWriter(self.directory, segment_records=0)
+        with FrameLogWriter(self.directory) as writer:
+            with self.assertRaises(ValueError):
+                writer.append(array("H", [0]), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
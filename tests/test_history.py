@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.history import FrameHistory
+from intesisbox.pa_aw_mbs import DECODE_PLAN, AquareaModbus
+
+from fakes import FakeClient, NoLock, frame
+
+
+class FrameHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history = FrameHistory(DECODE_PLAN, capacity=4)
+        for idx in range(6):
+            self.history.append(frame({"tank_water_temp": 400 + idx, "mode": idx % 2 + 1}), 10.0 * idx)
+
+    def test_ring_overwrites_the_oldest(self):
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(list(self.history.times()), [20, 30, 40, 50])
+        timestamp, raw = self.history.latest()
+        self.assertEqual(timestamp, 50)
+        self.assertEqual(raw[DECODE_PLAN.by_name["tank_water_temp"].position], 405)
+        self.assertEqual(self.history.nbytes, 4 * (2 * DECODE_PLAN.frame_size + 8))
+
+    def test_column(self):
+        times, words = self.history.column("tank_water_temp", 25, 50)
+        self.assertEqual((list(times), list(words)), ([30, 40, 50], [403, 404, 405]))
+        self.assertEqual(list(self.history.column("tank_water_temp", 60)[1]), [])
+
+    def test_values(self):
+        times, values = self.history.values("tank_water_temp", end=30)
+        self.assertEqual((list(times), values), ([20, 30], [40.2, 40.3]))
+        self.assertEqual(self.history.values("mode")[1], [1, 2, 1, 2])
+        # Null words decode to None
+        self.assertEqual(self.history.values("tank_setpoint_temp")[1], [None] * 4)
+
+    def test_snapshots(self):
+        snapshots = list(self.history.snapshots(30, 40))
+        self.assertEqual([snapshot.timestamp for snapshot in snapshots], [30, 40])
+        self.assertEqual([snapshot["tank_water_temp"] for snapshot in snapshots], [40.3, 40.4])
+
+    def test_timestamps_never_go_backwards(self):
+        with self.assertLogs("intesisbox.history", "WARNING"):
+            self.history.append(frame({}), 5.0)
+        self.assertEqual(list(self.history.times())[-2:], [50, 50])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            FrameHistory(DECODE_PLAN, capacity=0)
+        with self.assertRaises(ValueError):
+            self.history.append(frame({})[:-1], 60.0)
+
+    def test_clear(self):
+        self.history.clear()
+        self.assertEqual(len(self.history), 0)
+        self.assertIsNone(self.history.latest())
+
+
+class DeviceHistoryTest(unittest.TestCase):
+
+    def test_polls_are_recorded(self):
+        client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=client, lock=NoLock(), retry=0, history=3)
+        aquarea.connect()
+        self.assertEqual(len(aquarea.history), 0)
+        for word in (400, 410, 420, 430):
+            client.registers[32] = word
+            aquarea.poll_data()
+        self.assertEqual(aquarea.history.values("tank_water_temp")[1], [41.0, 42.0, 43.0])
+
+    def test_off_by_default(self):
+        self.assertIsNone(AquareaModbus(port="test", client=FakeClient(), lock=NoLock()).history)
+
+
+if __name__ == "__main__":
+    unittest.main()
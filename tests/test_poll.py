@@ -0,0 +1,135 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus, resolve_registers
+from intesisbox.retry import CircuitBreaker
+
+from fakes import FakeClient, NoLock, Response
+
+
+class SelectivePollTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock())
+        self.aquarea.connect()
+
+    def test_full_poll_reads_one_range_per_block(self):
+        self.aquarea.poll_data()
+        self.assertEqual(self.client.reads, [(0, 91), (1000, 8)])
+
+    def test_groups_and_names_are_merged_into_ranges(self):
+        self.assertEqual(resolve_registers(["general", "tank_water_temp"]), {0, 1, 2, 3, 4, 32})
+        self.aquarea.poll_data(names=["general", "tank_water_temp"])
+        self.assertEqual(self.client.reads, [(0, 5), (32, 1)])
+        self.client.reads.clear()
+        self.aquarea.poll_data(names=["general", "tank_water_temp"], max_gap=27)
+        self.assertEqual(self.client.reads, [(0, 33)])
+
+    def test_registers_not_read_keep_their_value(self):
+        self.aquarea.poll_data()
+        self.client.registers[4] = 1
+        self.client.registers[33] = 480
+        self.aquarea.poll_data(names="mode")
+        self.assertEqual(self.aquarea.mode, "Heat")
+        self.assertEqual(self.aquarea.tank_setpoint_temp, 3.3)
+        self.assertEqual(self.aquarea.read_plan(["mode"])[0][1:], (4, 1))
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            self.aquarea.poll_data(names=["no_such_register"])
+
+
+class BlockFailingClient(FakeClient):
+    """ Fails the reads starting at one of the addresses of failing """
+
+    def __init__(self, *failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        if address in self.failing:
+            self.reads.append((address, count))
+            return Response(error=True)
+        return super().read_holding_registers(address, count, unit, **kwargs)
+
+
+class BusyLock(NoLock):
+    """ Bus held by another process """
+
+    def acquire(self, blocking=True):
+        return False
+
+
+class PollResultTest(unittest.TestCase):
+
+    def device(self, client, **kwargs):
+        aquarea = AquareaModbus(port="test", client=client, retry=0, **dict({"lock": NoLock()}, **kwargs))
+        aquarea.connect()
+        return aquarea
+
+    def test_success(self):
+        result = self.device(FakeClient()).poll_data()
+        self.assertTrue(result.ok)
+        self.assertIsNone(result.skipped)
+        self.assertEqual(result.stale, ())
+        self.assertEqual([(block.address, block.count, block.ok, block.attempts) for block in result.blocks], [(0, 91, True, 1), (1000, 8, True, 1)])
+
+    def test_partial_poll_publishes_the_blocks_read(self):
+        aquarea = self.device(BlockFailingClient(1000))
+        result = aquarea.poll_data()
+        self.assertFalse(result.ok)
+        self.assertEqual([block.ok for block in result.blocks], [True, False])
+        self.assertEqual(aquarea.tank_setpoint_temp, 3.3)
+        self.assertTrue(result.stale)
+        self.assertNotIn("tank_setpoint_temp", result.stale)
+        self.assertEqual(aquarea.breaker.failures, 0)
+
+    def test_failed_read_leaves_the_following_ones_unattempted(self):
+        client = BlockFailingClient(0)
+        aquarea = self.device(client)
+        result = aquarea.poll_data()
+        self.assertEqual(client.reads, [(0, 91)])
+        self.assertEqual(result.blocks[1].error, "not attempted after a failed read")
+        self.assertIn("tank_setpoint_temp", result.stale)
+        self.assertIsNone(aquarea.snapshot)
+        self.assertEqual(aquarea.breaker.failures, 1)
+
+    def test_not_connected(self):
+        aquarea = AquareaModbus(port="test", client=FakeClient(), lock=NoLock())
+        result = aquarea.poll_data(names="mode")
+        self.assertEqual((result.ok, result.skipped, result.stale), (False, "not connected", ("mode",)))
+
+    def test_busy_bus_keeps_the_cached_snapshot(self):
+        aquarea = self.device(FakeClient(), lock=BusyLock(), cached_if_busy=True)
+        self.assertEqual(aquarea.poll_data().skipped, "bus busy")
+
+    def test_open_circuit_skips_polls(self):
+        client = FakeClient()
+        aquarea = self.device(client, breaker=CircuitBreaker(threshold=2, cooldown=60))
+        client.fail = True
+        aquarea.poll_data()
+        aquarea.poll_data()
+        self.assertEqual(aquarea.breaker.state, CircuitBreaker.OPEN)
+        reads = len(client.reads)
+        self.assertEqual(aquarea.poll_data().skipped, "circuit open")
+        self.assertEqual(len(client.reads), reads)
+
+    def test_exception_gives_the_probe_back(self):
+        client = FakeClient()
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        aquarea = self.device(client, breaker=breaker)
+        client.fail = True
+        aquarea.poll_data()
+        client.read_holding_registers = None
+        with self.assertRaises(TypeError):
+            aquarea.poll_data()
+        # Not left probing: the next poll is let through
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
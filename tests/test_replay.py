@@ -0,0 +1,110 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.framelog import FrameLogReader, FrameLogWriter
+from intesisbox.history import FrameHistory
+from intesisbox.pa_aw_mbs import AquareaDevice, DECODE_PLAN
+from intesisbox.replay import frame_from_blocks, replay
+
+from fakes import frame
+
+
+class Clock:
+    """ Clock advanced by the sleeps it is given """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def blocks_of(raw):
+    """ Block responses of a frame """
+    return [list(raw[block.base:block.base + block.count]) for block in DECODE_PLAN.blocks]
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = [(100.0 + 10 * idx, frame({"tank_water_temp": 400 + idx})) for idx in range(3)]
+
+    def test_snapshots(self):
+        snapshots = list(replay(self.frames))
+        self.assertEqual([snapshot.timestamp for snapshot in snapshots], [100, 110, 120])
+        self.assertEqual([snapshot["tank_water_temp"] for snapshot in snapshots], [40.0, 40.1, 40.2])
+
+    def test_block_responses(self):
+        records = [(timestamp, blocks_of(raw), True) for timestamp, raw in self.frames]
+        self.assertEqual([snapshot["tank_water_temp"] for snapshot in replay(records)], [40.0, 40.1, 40.2])
+
+    def test_frame_from_blocks(self):
+        raw = self.frames[0][1]
+        self.assertEqual(frame_from_blocks(blocks_of(raw)), raw)
+        with self.assertRaises(ValueError):
+            frame_from_blocks(blocks_of(raw)[:1])
+        with self.assertRaises(ValueError):
+            frame_from_blocks([[0], blocks_of(raw)[1]])
+
+    def test_speed_paces_the_replay(self):
+        clock = Clock()
+        list(replay(self.frames, speed=5, clock=clock, sleep=clock.sleep))
+        self.assertEqual(clock.sleeps, [2.0, 2.0])
+        clock = Clock()
+        list(replay(self.frames, clock=clock, sleep=clock.sleep))
+        self.assertEqual(clock.sleeps, [])
+
+    def test_sources(self):
+        history = FrameHistory(DECODE_PLAN, capacity=8)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with FrameLogWriter(directory) as writer:
+            for timestamp, raw in self.frames:
+                history.append(raw, timestamp)
+                writer.append(raw, timestamp)
+        self.assertEqual([snapshot["tank_water_temp"] for snapshot in replay(history)], [40.0, 40.1, 40.2])
+        with FrameLogReader(directory) as reader:
+            snapshots = list(replay(reader))
+        # Detached from the mapping, still readable after the reader is closed
+        self.assertEqual([snapshot["tank_water_temp"] for snapshot in snapshots], [40.0, 40.1, 40.2])
+
+    def test_device_changes_and_callbacks(self):
+        device = AquareaDevice(lazy=True)
+        calls = []
+        device.on_change("tank_water_temp", lambda name, value, old: calls.append((value, old)))
+        frames = self.frames + [(130.0, self.frames[-1][1])]
+        for snapshot in replay(frames, device=device):
+            self.assertIs(snapshot, device.snapshot)
+        self.assertEqual(calls, [(40.0, None), (40.1, 40.0), (40.2, 40.1)])
+        self.assertEqual(device.changes, {})
+
+
+class ReplayDeviceTest(unittest.TestCase):
+
+    def test_registers_are_stamped_with_the_replayed_timestamp(self):
+        device = AquareaDevice(lazy=True)
+        # A poll before the replay
+        frame = device._new_frame()
+        for block in DECODE_PLAN.blocks:
+            device._store(frame, block, block.address, [1] * block.count, 100.0)
+        device._commit(frame, timestamp=100.0)
+        frames = [(1000.0, array("H", [2]) * DECODE_PLAN.frame_size), (1010.0, array("H", [3]) * DECODE_PLAN.frame_size)]
+        for (timestamp, raw), snapshot in zip(frames, replay(frames, device=device)):
+            self.assertEqual(snapshot.timestamp, timestamp)
+            self.assertEqual(snapshot.read_at("mode"), timestamp)
+            self.assertFalse(snapshot.is_stale("tank_water_temp", 60, now=timestamp + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus
+from intesisbox.retry import CircuitBreaker, RetryPolicy
+
+from fakes import FakeClient, NoLock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(threshold=2, cooldown=10, max_cooldown=40, clock=self.clock)
+        self.breaker.failure()
+        self.breaker.failure()
+
+    def test_opens_after_threshold(self):
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.remaining(), 10)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_doubles_the_cooldown(self):
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.remaining(), 20)
+        self.clock.now = 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_abandoned_probe_is_given_back(self):
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.abandon()
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+
+class Flaky:
+    """ Operation failing (raising OSError or returning None) the first failures calls """
+
+    def __init__(self, failures, exception=True):
+        self.failures = failures
+        self.exception = exception
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.exception:
+                raise OSError("flaky")
+            return None
+        return self.calls
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def policy(self, **kwargs):
+        return RetryPolicy(**dict({"delay": 0.01, "max_delay": 0.02, "jitter": 0}, **kwargs))
+
+    def test_retries_until_success(self):
+        result = self.policy(attempts=4).call(Flaky(2))
+        self.assertEqual((result.value, result.attempts, result.ok), (3, 3, True))
+        self.assertAlmostEqual(result.backoff, 0.03)
+
+    def test_gives_up_after_attempts(self):
+        operation = Flaky(10, exception=False)
+        with self.assertLogs("intesisbox.retry", "ERROR") as logs:
+            result = self.policy(attempts=3).call(operation, failed=lambda value: value is None, name="read %d-%d", name_args=(0, 90))
+        self.assertEqual((result.value, result.attempts, result.ok), (None, 3, False))
+        self.assertEqual(operation.calls, 3)
+        self.assertIn("read 0-90 failed after 3 attempts", logs.output[-1])
+
+    def test_other_exceptions_are_raised(self):
+        with self.assertRaises(OSError):
+            self.policy().call(Flaky(1), exceptions=(ValueError,))
+
+    def test_backoff(self):
+        policy = RetryPolicy(delay=1, max_delay=5, multiplier=2, jitter=0)
+        self.assertEqual([policy.backoff(attempt) for attempt in range(1, 6)], [1, 2, 4, 5, 5])
+        policy = RetryPolicy(delay=1, jitter=0.1)
+        for _ in range(20):
+            self.assertTrue(0.9 <= policy.backoff(1) <= 1.1)
+
+    def test_deadline_bounds_the_backoff(self):
+        result = RetryPolicy(attempts=10, delay=0.05, jitter=0, deadline=0.12).call(Flaky(10))
+        self.assertFalse(result.ok)
+        self.assertLess(result.attempts, 10)
+        self.assertLessEqual(result.backoff, 0.12 + 1e-6)
+
+    def test_acall(self):
+        flaky = Flaky(1)
+
+        async def operation():
+            return flaky()
+        result = asyncio.run(self.policy().acall(operation))
+        self.assertEqual((result.value, result.attempts, result.ok), (2, 2, True))
+
+    def test_from_retry(self):
+        default = RetryPolicy(attempts=2)
+        self.assertIs(RetryPolicy.from_retry(None, default), default)
+        self.assertEqual(RetryPolicy.from_retry(None).attempts, 6)
+        self.assertEqual(RetryPolicy.from_retry(0).attempts, 1)
+        self.assertEqual(RetryPolicy.from_retry(3).attempts, 4)
+        self.assertIs(RetryPolicy.from_retry(default), default)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(attempts=0)
+        with self.assertRaises(ValueError):
+            RetryPolicy(jitter=1)
+
+    def test_device_retry_stats(self):
+        client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=client, lock=NoLock(), retry=self.policy(attempts=2), breaker=CircuitBreaker(threshold=5))
+        aquarea.connect()
+        client.fail = True
+        result = aquarea.poll_data()
+        self.assertFalse(result.ok)
+        self.assertEqual(result.blocks[0].attempts, 2)
+        self.assertEqual(aquarea.retry_stats, {"attempts": 2, "backoff": 0.01, "failures": 1})
+        client.fail = False
+        aquarea.poll_data(retry=0)
+        self.assertEqual(aquarea.retry_stats, {"attempts": 2, "backoff": 0.0, "failures": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus
+from intesisbox.scheduler import AquareaScheduler
+
+from fakes import FakeClient, NoLock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SchedulerTiersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.client = FakeClient()
+        self.aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock(), retry=0)
+        self.aquarea.connect()
+        self.scheduler = AquareaScheduler(self.aquarea, intervals={"general": 30, "telemetry": 10, "tank": 60, "tank_water_temp": 5}, default=3600, clock=self.clock)
+
+    def test_periods(self):
+        periods = self.scheduler.periods
+        # A register name overrides its groups, the shortest group wins
+        self.assertEqual(periods["tank_water_temp"], 5)
+        self.assertEqual(periods["otudoor_temp"], 10)
+        self.assertEqual(periods["system"], 30)
+        self.assertEqual(periods["tank_setpoint_temp"], 60)
+        self.assertEqual(periods["operation_interval"], 60)
+        self.assertEqual(periods["error"], 3600)
+        with self.assertRaises(ValueError):
+            AquareaScheduler(self.aquarea, intervals={"no_such_group": 1})
+
+    def test_ticks_read_only_what_is_due(self):
+        self.scheduler.tick()
+        self.assertEqual(self.client.reads, [(0, 91), (1000, 8)])
+        self.client.reads.clear()
+        self.clock.now = 5
+        self.assertEqual(self.scheduler.due(), [32])
+        self.scheduler.tick()
+        self.assertEqual(self.client.reads, [(32, 1)])
+        self.client.reads.clear()
+        self.clock.now = 10
+        self.scheduler.tick()
+        self.assertEqual(self.client.reads, [(1, 3), (32, 1), (57, 4)])
+        self.assertEqual(self.scheduler.next_due(), 5)
+        self.assertEqual(self.scheduler.stats["reads"], 6)
+
+    def test_failed_reads_stay_due(self):
+        self.scheduler.tick()
+        self.clock.now = 5
+        self.client.fail = True
+        self.assertEqual(self.scheduler.tick(), [])
+        self.assertEqual(self.scheduler.due(), [32])
+        self.client.fail = False
+        self.assertEqual(self.scheduler.tick(), [32])
+        self.assertEqual(self.scheduler.due(), [])
+
+
+class SchedulerRunTest(unittest.TestCase):
+
+    def test_skipped_polls_back_off(self):
+        aquarea = AquareaModbus(port="test", client=FakeClient(), lock=NoLock())
+        sleeps = []
+        scheduler = AquareaScheduler(aquarea, intervals={"telemetry": 10}, default=60, sleep=sleeps.append)
+        scheduler.run(stop=lambda: len(sleeps) >= 3)
+        self.assertEqual(sleeps, [10, 10, 10])
+
+
+if __name__ == "__main__":
+    unittest.main()
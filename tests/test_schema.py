@@ -0,0 +1,104 @@
+import unittest
+
+from intesisbox.pa_aw_mbs import COMMAND_MAP, DECODE_PLAN, INTESISBOX_MAP, READ, READ_WRITE, REGISTERS, WRITE, AquareaDevice
+from intesisbox.schema import Register, accessors, command_map, commands_of, docstring, register_map
+
+SCHEMA = (
+    Register(0, "power", "int", "Power", READ_WRITE, values={0: "Off", 1: "On"}),
+    Register(1, "outdoor", "temp", "Outdoor", READ),
+    Register(2, "setpoint", "temp", "Setpoint", READ_WRITE, min=40, max=75),
+    Register(3, "capacity", "int", "Capacity", READ_WRITE, values={0x55: "0 KW", 0x58: "3 KW"}, commands={}),
+    Register(4, "mode", "int", "Mode", READ_WRITE, values={0: "None", 1: "Heat"}, commands={"Heat": 1}),
+    Register(5, "reset", "int", "Reset", WRITE, min=0, max=1),
+)
+
+
+class Plan:
+    """ DecodePlan stand-in: the readable registers by name """
+
+    class Entry:
+        def __init__(self, index):
+            self.index = index
+
+    def __init__(self, registers):
+        self.by_name = {register.name: self.Entry(idx) for idx, register in enumerate(registers) if register.access & READ}
+
+
+class SchemaTest(unittest.TestCase):
+
+    def test_register_map(self):
+        result = register_map(SCHEMA)
+        self.assertEqual(result[0], {"name": "power", "values": {0: "Off", 1: "On"}, "type": "int", "desc": "Power", "access": READ_WRITE})
+        self.assertEqual(result[1], {"name": "outdoor", "type": "temp", "desc": "Outdoor", "access": READ})
+        self.assertEqual(list(result), [0, 1, 2, 3, 4, 5])
+
+    def test_command_map(self):
+        self.assertEqual(command_map(SCHEMA, WRITE), {
+            "power": {"reg": 0, "values": {"Off": 0, "On": 1}, "type": "int"},
+            "setpoint": {"reg": 2, "min": 40, "max": 75, "type": "temp"},
+            "mode": {"reg": 4, "values": {"Heat": 1}, "type": "int"},
+            "reset": {"reg": 5, "min": 0, "max": 1, "type": "int"},
+        })
+        self.assertIsNone(commands_of(SCHEMA[3], WRITE))
+
+    def test_docstring(self):
+        self.assertEqual(docstring(SCHEMA[0], READ, WRITE), "[Power] 0: Off, 1: On [0-R/W]")
+        self.assertEqual(docstring(SCHEMA[1], READ, WRITE), "[Outdoor] [1-R]")
+        self.assertEqual(docstring(SCHEMA[2], READ, WRITE), "[Setpoint] 40 to 75 [2-R/W]")
+        self.assertEqual(docstring(SCHEMA[3], READ, WRITE), "[Capacity] 0x55: 0 KW, 0x58: 3 KW [3-R/W]")
+        self.assertEqual(docstring(SCHEMA[5], READ, WRITE), "[Reset] 0 to 1 [5-W]")
+
+    def test_accessors(self):
+        @accessors(SCHEMA, Plan(SCHEMA), READ, WRITE)
+        class Device:
+            @classmethod
+            def _getter(cls, index):
+                return lambda self: ("get", index)
+
+            @classmethod
+            def _setter(cls, name):
+                def fset(self, value):
+                    self.set = (name, value)
+                return fset
+
+            @property
+            def outdoor(self):
+                return "own"
+
+        device = Device()
+        self.assertEqual((device.power, device.outdoor, device.setpoint), (("get", 0), "own", ("get", 2)))
+        device.mode = "Heat"
+        self.assertEqual(device.set, ("mode", "Heat"))
+        self.assertIsNone(Device.capacity.fset)
+        self.assertIsNone(Device.reset.fget)
+        self.assertEqual(Device.setpoint.__doc__, "[Setpoint] 40 to 75 [2-R/W]")
+
+
+class GeneratedMapsTest(unittest.TestCase):
+    """ The maps generated from REGISTERS keep the entries they had as literals """
+
+    def test_maps(self):
+        self.assertEqual(INTESISBOX_MAP[4], {"name": "mode", "values": {0: "None", 1: "Heat", 2: "Heat_Tank", 3: "Tank", 4: "Cool_Tank", 5: "Cool"},
+                                             "type": "int", "desc": "Operating Mode", "access": READ_WRITE})
+        self.assertEqual(COMMAND_MAP["mode"], {"reg": 4, "values": {"Heat": 1, "Heat_Tank": 2, "Tank": 3, "Cool_Tank": 4, "Cool": 5}, "type": "int"})
+        self.assertEqual(COMMAND_MAP["tank_setpoint_temp"], {"reg": 33, "min": 40, "max": 75, "type": "temp"})
+        self.assertNotIn("heater_capacity", COMMAND_MAP)
+        self.assertEqual(len(INTESISBOX_MAP), len(REGISTERS))
+
+    def test_properties(self):
+        for register in REGISTERS:
+            prop = getattr(AquareaDevice, register.name, None)
+            if not isinstance(prop, property):
+                # Defined by hand, e.g. the error_reset_1() methods
+                self.assertTrue(callable(prop), register.name)
+                continue
+            if register.name in DECODE_PLAN.by_name:
+                self.assertIsNotNone(prop.fget, register.name)
+            if register.name in COMMAND_MAP:
+                self.assertIsNotNone(prop.fset, register.name)
+        self.assertEqual(AquareaDevice.tank_setpoint_temp.__doc__, "[Tank Water Setpoint Temp (°C)] 40 to 75 [33-R/W]")
+        self.assertIsNone(AquareaDevice.heater_capacity.fset)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.decoder import write_runs
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient, NoLock
+
+
+class SendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.aquarea = self.device()
+
+    def device(self, **kwargs):
+        aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock(), retry=0, **kwargs)
+        aquarea.connect()
+        return aquarea
+
+    def test_last_write_wins_and_adjacent_registers_share_a_write(self):
+        self.aquarea.tank_setpoint_temp = 45
+        self.aquarea.heat_interval = 10
+        self.aquarea.operation_interval = 2
+        self.aquarea.tank_setpoint_temp = 50
+        self.aquarea.mode = "Tank"
+        self.aquarea.send_cmd()
+        self.assertEqual(self.client.writes, [(6, 4, [3]), (16, 33, [500, 10, 60])])
+        self.assertEqual(self.aquarea.qsize, 0)
+
+    def test_negative_values_are_sent_as_words(self):
+        self.aquarea.heater_setpoint_temp = -5
+        self.aquarea.send_cmd()
+        self.assertEqual(self.client.writes, [(6, 20, [0xFFCE])])
+
+    def test_fc16_falls_back_to_fc6(self):
+        self.client.fc16 = False
+        self.aquarea.tank_setpoint_temp = 45
+        self.aquarea.heat_interval = 10
+        self.aquarea.send_cmd()
+        self.assertEqual(self.client.writes, [(16, 33, [450, 10]), (6, 33, [450]), (6, 34, [10])])
+        self.assertFalse(self.aquarea.multi_write)
+        self.client.writes.clear()
+        self.aquarea.tank_setpoint_temp = 46
+        self.aquarea.heat_interval = 11
+        self.aquarea.send_cmd()
+        self.assertEqual(self.client.writes, [(6, 33, [460]), (6, 34, [11])])
+
+    def test_multi_write_disabled(self):
+        aquarea = self.device(multi_write=False)
+        aquarea.tank_setpoint_temp = 45
+        aquarea.heat_interval = 10
+        aquarea.send_cmd()
+        self.assertEqual(self.client.writes, [(6, 33, [450]), (6, 34, [10])])
+
+    def test_write_runs(self):
+        self.assertEqual(write_runs({5: 1, 3: 2, 4: 3, 9: 4}), [(3, [2, 3, 1]), (9, [4])])
+        self.assertEqual(write_runs({1: 0, 2: 0, 3: 0}, max_count=2), [(1, [0, 0]), (3, [0])])
+
+    def test_setter_validation(self):
+        with self.assertRaises(ValueError):
+            self.aquarea.tank_setpoint_temp = 90
+        # Unknown modes are ignored, not queued
+        self.aquarea.mode = "Dry"
+        self.assertEqual(self.aquarea.qsize, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
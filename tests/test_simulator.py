@@ -0,0 +1,119 @@
+import importlib.util
+import os
+import socket
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import DECODE_PLAN, INTESIS_NULL, AquareaModbus
+from intesisbox.simulator import RtuSimulator, SimulatedDevice, TcpSimulator, frame_time
+from intesisbox.simulator.server import crc16, handle_pdu
+
+from fakes import NoLock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SimulatedDeviceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.device = SimulatedDevice(seed=1, clock=self.clock)
+
+    def test_initial_words(self):
+        tank = DECODE_PLAN.by_name["tank_setpoint_temp"].reg
+        self.assertEqual(self.device.read(tank, 3), [480, 30, 4])
+        # Unmapped registers read as null
+        self.assertEqual(self.device.read(5, 1), [INTESIS_NULL])
+
+    def test_write(self):
+        self.assertTrue(self.device.write(33, [450, 10]))
+        self.assertEqual(self.device.value("tank_setpoint_temp"), 45.0)
+        self.assertEqual(self.device.read(33, 2), [450, 10])
+        self.assertTrue(self.device.write(23, [0xFFCE]))
+        self.assertEqual(self.device.value("cool_setpoint_temp"), -5.0)
+        # Read only registers are not written, nor the writable ones of the same request
+        self.assertFalse(self.device.write(32, [450, 450]))
+        self.assertEqual(self.device.value("tank_setpoint_temp"), 45.0)
+
+    def test_tank_heats_up_in_tank_mode(self):
+        self.device.write(4, [3])
+        start = self.device.value("tank_water_temp")
+        self.clock.now = 120
+        self.assertGreater(self.device.value("compressor"), 0)
+        self.clock.now = 4 * 3600
+        self.assertGreater(self.device.value("tank_water_temp"), start)
+        self.assertLessEqual(self.device.value("tank_water_temp"), 48.0)
+
+    def test_compressor_stops_when_off(self):
+        self.clock.now = 600
+        self.assertGreater(self.device.value("compressor"), 0)
+        self.device.write(0, [0])
+        self.clock.now = 1200
+        self.assertEqual(self.device.value("compressor"), 0)
+
+
+class ProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.device = SimulatedDevice(seed=1)
+
+    def test_crc16(self):
+        self.assertEqual(struct.pack("<H", crc16(bytes.fromhex("01030000000a"))), bytes.fromhex("c5cd"))
+
+    def test_frame_time(self):
+        self.assertAlmostEqual(frame_time(8, 9600), 11.5 * 11 / 9600)
+
+    def test_handle_pdu(self):
+        self.assertEqual(handle_pdu(self.device, struct.pack(">BHH", 3, 33, 2)), struct.pack(">BBHH", 3, 4, 480, 30))
+        self.assertEqual(handle_pdu(self.device, struct.pack(">BHH", 6, 33, 450)), struct.pack(">BHH", 6, 33, 450))
+        self.assertEqual(handle_pdu(self.device, struct.pack(">BHHBHH", 16, 33, 2, 4, 460, 20)), struct.pack(">BHH", 16, 33, 2))
+        self.assertEqual(self.device.read(33, 2), [460, 20])
+
+    def test_exceptions(self):
+        self.assertEqual(handle_pdu(self.device, struct.pack(">BHH", 3, 0, 126)), bytes((0x83, 3)))
+        self.assertEqual(handle_pdu(self.device, struct.pack(">BHH", 6, 32, 1)), bytes((0x86, 2)))
+        self.assertEqual(handle_pdu(self.device, bytes((4, 0, 0, 0, 1))), bytes((0x84, 1)))
+        self.assertEqual(handle_pdu(self.device, bytes((3, 0))), bytes((0x83, 3)))
+
+
+class TcpSimulatorTest(unittest.TestCase):
+
+    def test_read_over_tcp(self):
+        with TcpSimulator({1: SimulatedDevice(seed=1)}, port=0) as simulator:
+            with socket.create_connection(("127.0.0.1", simulator.port), timeout=5) as sock:
+                sock.sendall(struct.pack(">HHHBBHH", 7, 0, 6, 1, 3, 33, 2))
+                reply = b""
+                while len(reply) < 13:
+                    reply += sock.recv(64)
+            self.assertEqual(reply, struct.pack(">HHHBBBHH", 7, 0, 7, 1, 3, 4, 480, 30))
+            self.assertEqual(simulator.requests, 1)
+
+
+@unittest.skipIf(importlib.util.find_spec("pymodbus") is None or importlib.util.find_spec("serial") is None, "pymodbus or pyserial not installed")
+class RtuSimulatorTest(unittest.TestCase):
+
+    def test_poll_and_send_over_a_pty(self):
+        with RtuSimulator({1: SimulatedDevice(seed=1)}, baudrate=115200, turnaround=0) as simulator:
+            aquarea = AquareaModbus(port=simulator.port, baudrate=115200, timeout=1, lock=NoLock(), retry=0)
+            self.assertTrue(aquarea.connect())
+            try:
+                self.assertTrue(aquarea.poll_data().ok)
+                self.assertEqual(aquarea.tank_setpoint_temp, 48.0)
+                aquarea.tank_setpoint_temp = 45
+                aquarea.send_cmd()
+                self.assertEqual(simulator.devices[1].value("tank_setpoint_temp"), 45.0)
+            finally:
+                aquarea.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
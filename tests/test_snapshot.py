@@ -0,0 +1,151 @@
+import importlib.util
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus, DECODE_PLAN
+from intesisbox.snapshot import AquareaSnapshot
+
+from fakes import FakeClient, NoLock, frame
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = AquareaSnapshot(DECODE_PLAN, frame({"mode": 3, "tank_water_temp": 0xFFEC, "error": 20}), 10, timestamp=5.0)
+
+    def test_mapped_and_numeric_values(self):
+        self.assertEqual(self.snapshot["mode"], "Tank")
+        self.assertEqual(self.snapshot.value("mode"), 3)
+        self.assertEqual(self.snapshot["tank_water_temp"], -2.0)
+        self.assertEqual(self.snapshot.raw_word("tank_water_temp"), 0xFFEC)
+        self.assertEqual(self.snapshot["error"], "H90: Indoor / outdoor abnormal communication")
+        self.assertIsNone(self.snapshot["system"])
+        self.assertEqual(self.snapshot.get("no_such_register", "-"), "-")
+        self.assertIsNone(self.snapshot.value("no_such_register"))
+        self.assertIn("mode", self.snapshot)
+        self.assertEqual(len(self.snapshot), len(DECODE_PLAN.entries))
+
+    def test_valid_values_leave_out_nulls(self):
+        self.assertEqual(set(self.snapshot.valid_values()), {"mode", "tank_water_temp", "error"})
+        self.assertEqual(self.snapshot.valid_values()["mode"], {"value": "Tank", "desc": DECODE_PLAN.by_name["mode"].desc})
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.snapshot.timestamp = 6.0
+        with self.assertRaises(AttributeError):
+            del self.snapshot.raw
+
+    def test_each_poll_publishes_a_new_snapshot(self):
+        client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=client, lock=NoLock())
+        aquarea.connect()
+        self.assertIsNone(aquarea.snapshot)
+        self.assertEqual(aquarea.get_all_valid_values(), {})
+        aquarea.poll_data()
+        first = aquarea.snapshot
+        client.registers[4] = 1
+        aquarea.poll_data()
+        self.assertIsNot(aquarea.snapshot, first)
+        self.assertEqual(first["mode"], "Cool_Tank")
+        self.assertEqual(aquarea.mode, "Heat")
+
+
+class LazySnapshotTest(unittest.TestCase):
+
+    def test_lazy_values_equal_eager_ones(self):
+        raw = frame({"mode": 2, "tank_water_temp": 481, "error": 13, "operation_interval": 7})
+        eager = AquareaSnapshot(DECODE_PLAN, raw, 10)
+        lazy = AquareaSnapshot(DECODE_PLAN, raw, 10, lazy=True)
+        self.assertTrue(lazy.is_lazy)
+        for name in DECODE_PLAN.by_name:
+            self.assertEqual((lazy.value(name), lazy[name]), (eager.value(name), eager[name]), name)
+        self.assertEqual(dict(lazy.items()), dict(eager.items()))
+        self.assertEqual(AquareaSnapshot(DECODE_PLAN, raw, 10, lazy=True).valid_values(), eager.valid_values())
+
+    def test_values_are_decoded_on_first_access(self):
+        lazy = AquareaSnapshot(DECODE_PLAN, frame({"mode": 2}), 10, lazy=True)
+        index = DECODE_PLAN.by_name["mode"].index
+        self.assertNotEqual(lazy._mvalues[index], "Heat_Tank")
+        self.assertEqual(lazy["mode"], "Heat_Tank")
+        self.assertEqual(lazy._mvalues[index], "Heat_Tank")
+
+    def test_lazy_device(self):
+        aquarea = AquareaModbus(port="test", client=FakeClient(), lock=NoLock(), lazy=True)
+        aquarea.connect()
+        aquarea.poll_data()
+        self.assertTrue(aquarea.snapshot.is_lazy)
+        self.assertEqual(aquarea.mode, "Cool_Tank")
+        self.assertEqual(aquarea.tank_setpoint_temp, 3.3)
+
+
+class SnapshotEncodeTest(unittest.TestCase):
+
+    def test_json_leaves_out_null_registers(self):
+        for byteorder in (">", "<"):
+            snapshot = AquareaSnapshot(DECODE_PLAN, frame({"mode": 4, "tank_water_temp": 481}, byteorder), 10, byteorder)
+            self.assertEqual(json.loads(snapshot.to_json(desc=False)), {"mode": "Cool_Tank", "tank_water_temp": 48.1})
+
+    def test_little_endian_word_0x8000_is_not_null(self):
+        raw = frame({}, "<")
+        raw[DECODE_PLAN.by_name["tank_water_temp"].position] = 0x8000
+        snapshot = AquareaSnapshot(DECODE_PLAN, raw, 10, "<")
+        self.assertEqual(json.loads(snapshot.to_json(desc=False)), {"tank_water_temp": 12.8})
+
+    def test_json_equals_valid_values(self):
+        aquarea = AquareaModbus(port="test", client=FakeClient(), lock=NoLock(), retry=0)
+        aquarea.connect()
+        aquarea.poll_data()
+        snapshot = aquarea.snapshot
+        self.assertEqual(json.loads(snapshot.to_json()), snapshot.valid_values())
+        # Cached fragments give the same text again
+        self.assertEqual(snapshot.to_json(), json.dumps(snapshot.valid_values(), separators=(",", ":")))
+
+    def test_json_with_previous_writes_the_changes(self):
+        previous = AquareaSnapshot(DECODE_PLAN, frame({"mode": 1, "tank_water_temp": 481, "defrost": 0}), 10)
+        snapshot = AquareaSnapshot(DECODE_PLAN, frame({"mode": 3, "tank_water_temp": 481}), 10)
+        self.assertEqual(json.loads(snapshot.to_json(previous, desc=False)), {"mode": "Tank", "defrost": None})
+        self.assertEqual(snapshot.to_json(snapshot), "{}")
+
+    def test_bytes_round_trip(self):
+        for byteorder in (">", "<"):
+            raw = frame({"mode": 4, "tank_water_temp": 481, "heater_setpoint_temp": 0xFFCE}, byteorder)
+            snapshot = AquareaSnapshot(DECODE_PLAN, raw, 10, byteorder, timestamp=1234.5)
+            copy = AquareaSnapshot.from_bytes(snapshot.to_bytes())
+            self.assertEqual((copy.raw, copy.timestamp, copy.byteorder, copy.unit, copy.stamps), (raw, 1234.5, byteorder, 10, None))
+            self.assertEqual(copy.valid_values(), snapshot.valid_values())
+            self.assertEqual(copy["heater_setpoint_temp"], -5.0)
+
+    def test_bytes_round_trip_with_read_times(self):
+        aquarea = AquareaModbus(port="test", client=FakeClient(), lock=NoLock(), retry=0)
+        aquarea.connect()
+        aquarea.poll_data()
+        snapshot = aquarea.snapshot
+        data = snapshot.to_bytes()
+        self.assertEqual(len(data), len(AquareaSnapshot(DECODE_PLAN, snapshot.raw, 10).to_bytes()) + 8 * DECODE_PLAN.frame_size)
+        copy = AquareaSnapshot.from_bytes(data, lazy=False)
+        self.assertEqual(copy.stamps, snapshot.stamps)
+        self.assertEqual(copy.read_at("mode"), snapshot.read_at("mode"))
+        self.assertEqual(copy.to_json(), snapshot.to_json())
+
+    def test_invalid_bytes(self):
+        data = AquareaSnapshot(DECODE_PLAN, frame({}), 10).to_bytes()
+        for bad in (data[:10], b"XXXX" + data[4:], data + b"\0\0", data[:-2]):
+            with self.assertRaises(ValueError):
+                AquareaSnapshot.from_bytes(bad)
+
+    @unittest.skipIf(importlib.util.find_spec("msgpack") is None, "msgpack not installed")
+    def test_msgpack_equals_json(self):
+        import msgpack
+        previous = AquareaSnapshot(DECODE_PLAN, frame({"mode": 1, "defrost": 0}), 10)
+        snapshot = AquareaSnapshot(DECODE_PLAN, frame({"mode": 3, "tank_water_temp": 481}), 10)
+        for desc in (True, False):
+            self.assertEqual(msgpack.unpackb(snapshot.to_msgpack(desc=desc)), json.loads(snapshot.to_json(desc=desc)))
+            self.assertEqual(msgpack.unpackb(snapshot.to_msgpack(previous, desc)), json.loads(snapshot.to_json(previous, desc)))
+
+
+if __name__ == "__main__":
+    unittest.main()
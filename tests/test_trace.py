@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient, NoLock
+
+
+class TraceTest(unittest.TestCase):
+
+    def device(self, **kwargs):
+        self.client = FakeClient()
+        aquarea = AquareaModbus(port="test", client=self.client, lock=NoLock(), retry=0, **kwargs)
+        aquarea.connect()
+        return aquarea
+
+    def test_off_by_default(self):
+        aquarea = self.device()
+        aquarea.poll_data()
+        self.assertEqual(aquarea.trace, [])
+
+    def test_reads_and_writes_are_recorded(self):
+        aquarea = self.device(trace=8)
+        aquarea.poll_data()
+        aquarea.tank_setpoint_temp = 45
+        aquarea.heat_interval = 10
+        aquarea.mode = "Heat"
+        aquarea.send_cmd()
+        self.assertEqual([(record.op, record.address, len(record.words)) for record in aquarea.trace],
+                         [("read", 0, 91), ("read", 1000, 8), ("write", 4, 1), ("write", 33, 2)])
+        self.assertEqual(list(aquarea.trace[-1].words), [450, 10])
+        self.assertEqual(aquarea.trace[0].words[33], 33)
+
+    def test_ring_keeps_the_last_records(self):
+        aquarea = self.device(trace=3)
+        aquarea.poll_data()
+        first = aquarea.trace
+        aquarea.poll_data(names="mode")
+        aquarea.poll_data(names="tank_setpoint_temp")
+        self.assertEqual([record.address for record in aquarea.trace], [1000, 4, 33])
+        self.assertLessEqual(first[-1].timestamp, aquarea.trace[-1].timestamp)
+
+    def test_debug_logs_are_formatted_when_enabled(self):
+        aquarea = self.device()
+        with self.assertLogs("intesisbox.pa_aw_mbs", "DEBUG") as logs:
+            aquarea.poll_data(names="mode")
+        self.assertIn("registers 4-4 = [4]", "\n".join(logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
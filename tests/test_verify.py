@@ -0,0 +1,107 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intesisbox.pa_aw_mbs import AquareaModbus
+
+from fakes import FakeClient, NoLock, Response
+
+
+class LateClient(FakeClient):
+    """ Applies each write only after `lag` further reads, never when lag is None """
+
+    def __init__(self, lag):
+        super().__init__()
+        self.lag = lag
+        self.pending = []
+
+    def read_holding_registers(self, address, count=1, unit=1, **kwargs):
+        for item in list(self.pending):
+            item[0] -= 1
+            if item[0] < 0:
+                self.pending.remove(item)
+                self.registers.update(item[1])
+        return super().read_holding_registers(address, count, unit, **kwargs)
+
+    def write_registers(self, address, values, unit=1, **kwargs):
+        self.writes.append((16, address, list(values)))
+        if self.lag is not None:
+            self.pending.append([self.lag, dict(zip(range(address, address + len(values)), values))])
+        return Response()
+
+
+class VerifyTest(unittest.TestCase):
+
+    def device(self, client):
+        aquarea = AquareaModbus(port="test", client=client, lock=NoLock(), retry=0, history=4)
+        aquarea.connect()
+        return aquarea
+
+    def test_settled_write_reports_observed_word(self):
+        client = FakeClient()
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        aquarea.heat_interval = 10
+        results = aquarea.send_cmd(verify=True, deadline=1)
+        self.assertEqual(set(results), {"tank_setpoint_temp", "heat_interval"})
+        result = results["tank_setpoint_temp"]
+        self.assertTrue(result.ok)
+        self.assertEqual((result.reg, result.expected, result.observed), (33, 450, 450))
+        self.assertIsNone(result.error)
+        self.assertGreaterEqual(result.settle_time, 0.2)
+        # Only the written registers are read back, merged into the snapshot but not the history
+        self.assertEqual(client.reads, [(33, 2)])
+        self.assertEqual(aquarea.tank_setpoint_temp, 45)
+        self.assertEqual(len(aquarea.history), 0)
+
+    def test_read_back_covers_only_written_registers(self):
+        client = FakeClient()
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        aquarea.send_cmd(verify=True, deadline=1)
+        self.assertEqual(client.reads, [(33, 1)])
+
+    def test_late_device_settles_on_a_later_read_back(self):
+        client = LateClient(lag=1)
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        aquarea.heat_interval = 10
+        results = aquarea.send_cmd(verify=True, deadline=1)
+        self.assertTrue(results["heat_interval"].ok)
+        self.assertEqual(len(client.reads), 2)
+        self.assertGreaterEqual(results["heat_interval"].settle_time, 0.6)
+
+    def test_deadline_expires(self):
+        client = LateClient(lag=None)
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        aquarea.heat_interval = 10
+        results = aquarea.send_cmd(verify=True, deadline=0.5)
+        result = results["tank_setpoint_temp"]
+        self.assertIs(result.ok, False)
+        self.assertEqual((result.expected, result.observed), (450, 33))
+        self.assertIsNone(result.settle_time)
+        self.assertEqual(len(client.reads), 1)
+
+    def test_failed_read_back_is_reported(self):
+        client = FakeClient()
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        client.fail = True
+        results = aquarea.send_cmd(verify=True, deadline=0.5)
+        result = results["tank_setpoint_temp"]
+        self.assertIs(result.ok, False)
+        self.assertIsNotNone(result.error)
+
+    def test_without_verify_nothing_is_read(self):
+        client = FakeClient()
+        aquarea = self.device(client)
+        aquarea.tank_setpoint_temp = 45
+        self.assertIsNone(aquarea.send_cmd())
+        self.assertEqual(client.reads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()